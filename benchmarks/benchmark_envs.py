@@ -0,0 +1,358 @@
+# coding=utf-8
+"""
+Throughput, latency, and memory benchmarks for gym_acnsim environments.
+
+Each benchmark case runs a number of episodes of an environment built
+from a randomly generated simulation of a given network and episode
+length, timing every reset and step. The action is fixed (zero, i.e.
+the middle of each EVSE's range under the default action space) so that
+only the environment is measured. Memory is measured separately, with
+tracemalloc, as the memory retained by a freshly built and reset
+environment.
+
+Usage:
+    python benchmarks/benchmark_envs.py --output results.json
+    python benchmarks/benchmark_envs.py --output new.json \\
+        --baseline results.json --threshold 0.1
+
+When a baseline is given, the script exits with status 1 if any case
+present in both files regressed by more than the threshold (a relative
+drop in steps per second, or a relative increase in p99 step latency or
+memory).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import acnportal
+import gym
+import numpy as np
+import pytz
+from acnportal.acnsim import (
+    Battery,
+    EV,
+    EventQueue,
+    PluginEvent,
+    Simulator,
+    sites,
+)
+from acnportal.acnsim.network import ChargingNetwork
+
+from gym_acnportal.gym_acnsim import GymTrainingInterface
+from gym_acnportal.gym_acnsim.envs import (
+    BaseSimEnv,
+    make_default_sim_env,
+    make_rebuilding_default_sim_env,
+)
+
+PERIOD: int = 5
+VOLTAGE: float = 208
+MAX_RATE: float = 32
+START: datetime = pytz.timezone("America/Los_Angeles").localize(datetime(2018, 9, 5))
+
+
+def _simple_acn(num_evses: int) -> Callable[[], ChargingNetwork]:
+    """ Return a function building a single-constraint network of
+    num_evses EVSEs whose capacity is half their total maximum rate.
+    """
+
+    # noinspection PyMissingOrEmptyDocstring
+    def network_function() -> ChargingNetwork:
+        return sites.simple_acn(
+            [f"EVSE-{i:03d}" for i in range(num_evses)],
+            voltage=VOLTAGE,
+            aggregate_cap=num_evses * MAX_RATE * VOLTAGE / 1000 / 2,
+        )
+
+    return network_function
+
+
+NETWORKS: Dict[str, Callable[[], ChargingNetwork]] = {
+    "simple-2": _simple_acn(2),
+    "simple-50": _simple_acn(50),
+    "simple-500": _simple_acn(500),
+    "caltech": sites.caltech_acn,
+    "jpl": sites.jpl_acn,
+}
+
+
+def random_events(
+    station_ids: List[str], episode_length: int, rng: np.random.Generator
+) -> EventQueue:
+    """ Return an event queue of back-to-back random sessions at each
+    station over episode_length periods. Each session requests half the
+    energy it could receive charging at the maximum rate.
+    """
+    events: List[PluginEvent] = []
+    for station_id in station_ids:
+        arrival: int = int(rng.integers(0, 12))
+        session: int = 0
+        while arrival < episode_length - 1:
+            departure: int = min(arrival + int(rng.integers(6, 48)), episode_length)
+            requested_energy: float = (
+                (departure - arrival) * PERIOD / 60 * MAX_RATE * VOLTAGE / 1000 / 2
+            )
+            ev = EV(
+                arrival,
+                departure,
+                requested_energy,
+                station_id,
+                f"{station_id}-{session}",
+                Battery(100, 0, 100),
+            )
+            events.append(PluginEvent(arrival, ev))
+            arrival = departure + int(rng.integers(1, 24))
+            session += 1
+    return EventQueue(events)
+
+
+def interface_generating_function(
+    network: str, episode_length: int
+) -> Callable[[np.random.Generator], GymTrainingInterface]:
+    """ Return a function generating an interface to a random
+    simulation of the named network lasting episode_length periods.
+    """
+
+    # noinspection PyMissingOrEmptyDocstring
+    def generate_interface(rng: np.random.Generator) -> GymTrainingInterface:
+        charging_network: ChargingNetwork = NETWORKS[network]()
+        simulator: Simulator = Simulator(
+            charging_network,
+            None,
+            random_events(charging_network.station_ids, episode_length, rng),
+            START,
+            period=PERIOD,
+            verbose=False,
+            interface_type=GymTrainingInterface,
+        )
+        return GymTrainingInterface(simulator)
+
+    return generate_interface
+
+
+def make_env(env: str, network: str, episode_length: int, seed: int) -> BaseSimEnv:
+    """ Build the named environment ("default" or "rebuilding") on
+    random simulations of the named network. Infeasible actions are
+    clipped, so that every step advances the simulation.
+    """
+    generate_interface = interface_generating_function(network, episode_length)
+    if env == "default":
+        return make_default_sim_env(
+            generate_interface(np.random.default_rng(seed)),
+            infeasibility_mode="clip",
+        )
+    if env == "rebuilding":
+        return make_rebuilding_default_sim_env(
+            generate_interface, seed=seed, infeasibility_mode="clip"
+        )
+    raise ValueError(f"Unknown environment {env}.")
+
+
+def _percentiles_us(latencies_ns: List[int]) -> Tuple[float, float]:
+    """ Return the p50 and p99 of latencies_ns, in microseconds. """
+    p50, p99 = np.percentile(np.array(latencies_ns), [50, 99]) / 1000
+    return float(p50), float(p99)
+
+
+def measure_memory(env: str, network: str, episode_length: int, seed: int) -> int:
+    """ Return the memory (bytes) retained by a freshly built and reset
+    environment.
+    """
+    tracemalloc.start()
+    try:
+        before: int = tracemalloc.get_traced_memory()[0]
+        benchmark_env: BaseSimEnv = make_env(env, network, episode_length, seed)
+        benchmark_env.reset()
+        retained: int = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del benchmark_env
+    return retained
+
+
+def run_case(
+    env: str, network: str, episode_length: int, episodes: int, seed: int
+) -> Dict[str, Any]:
+    """ Run one benchmark case.
+
+    Args:
+        env (str): "default" (make_default_sim_env; each reset restores
+            the same simulation) or "rebuilding"
+            (make_rebuilding_default_sim_env; each reset builds a new
+            simulation).
+        network (str): Key of NETWORKS.
+        episode_length (int): Number of periods over which sessions are
+            generated.
+        episodes (int): Number of episodes to run.
+        seed (int): Seed of the generated simulations.
+
+    Returns:
+        Dict[str, Any]: Results of the case.
+    """
+    benchmark_env: BaseSimEnv = make_env(env, network, episode_length, seed)
+    action: np.ndarray = np.zeros(benchmark_env.action_space.shape)
+    reset_latencies: List[int] = []
+    step_latencies: List[int] = []
+    for _ in range(episodes):
+        start: int = time.perf_counter_ns()
+        benchmark_env.reset()
+        reset_latencies.append(time.perf_counter_ns() - start)
+        done: bool = False
+        while not done:
+            start = time.perf_counter_ns()
+            _, _, done, _ = benchmark_env.step(action)
+            step_latencies.append(time.perf_counter_ns() - start)
+
+    step_p50, step_p99 = _percentiles_us(step_latencies)
+    reset_p50, reset_p99 = _percentiles_us(reset_latencies)
+    return {
+        "name": f"{env}/{network}/{episode_length}",
+        "env": env,
+        "network": network,
+        "num_evses": len(benchmark_env.interface.station_ids),
+        "episode_length": episode_length,
+        "episodes": episodes,
+        "steps": len(step_latencies),
+        "steps_per_second": len(step_latencies) / (sum(step_latencies) / 1e9),
+        "step_p50_us": step_p50,
+        "step_p99_us": step_p99,
+        "resets_per_second": episodes / (sum(reset_latencies) / 1e9),
+        "reset_p50_us": reset_p50,
+        "reset_p99_us": reset_p99,
+        "memory_bytes": measure_memory(env, network, episode_length, seed),
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float
+) -> List[str]:
+    """ Compare results against baseline results.
+
+    Args:
+        results (List[Dict[str, Any]]): Results of run_case.
+        baseline (List[Dict[str, Any]]): Baseline results of run_case.
+            Cases not present in results are ignored.
+        threshold (float): Relative change above which a case is
+            considered to have regressed.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    baseline_cases: Dict[str, Dict[str, Any]] = {
+        case["name"]: case for case in baseline
+    }
+    regressions: List[str] = []
+    for case in results:
+        baseline_case: Optional[Dict[str, Any]] = baseline_cases.get(case["name"])
+        if baseline_case is None:
+            continue
+        for key, higher_is_better in (
+            ("steps_per_second", True),
+            ("step_p99_us", False),
+            ("memory_bytes", False),
+        ):
+            change: float = case[key] / baseline_case[key] - 1
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{case['name']}: {key} {baseline_case[key]:.4g} -> "
+                    f"{case[key]:.4g} ({change:+.1%})"
+                )
+    return regressions
+
+
+def write_results(path: str, results: List[Dict[str, Any]]) -> None:
+    """ Write results, with the metadata of this run, to a JSON file.
+
+    Args:
+        path (str): File to which results are written.
+        results (List[Dict[str, Any]]): Results of run_case.
+
+    Returns:
+        None
+    """
+    with open(path, "w") as f:
+        json.dump({"metadata": _metadata(), "results": results}, f, indent=2)
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """ Load results written by write_results.
+
+    Args:
+        path (str): File from which results are read.
+
+    Returns:
+        List[Dict[str, Any]]: Results of run_case.
+    """
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def _metadata() -> Dict[str, str]:
+    """ Return the versions and platform the benchmarks were run on. """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "gym": gym.__version__,
+        "acnportal": getattr(acnportal, "__version__", "unknown"),
+        "time": datetime.now().isoformat(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """ Run the benchmarks from the command line. """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--envs", nargs="+", default=["default", "rebuilding"], metavar="ENV"
+    )
+    parser.add_argument(
+        "--networks",
+        nargs="+",
+        default=list(NETWORKS),
+        choices=list(NETWORKS),
+        metavar="NETWORK",
+    )
+    parser.add_argument(
+        "--episode-lengths", nargs="+", type=int, default=[96, 288], metavar="PERIODS"
+    )
+    parser.add_argument("--episodes", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to which results are written.")
+    parser.add_argument("--baseline", help="Results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for env in args.envs:
+        for network in args.networks:
+            for episode_length in args.episode_lengths:
+                case: Dict[str, Any] = run_case(
+                    env, network, episode_length, args.episodes, args.seed
+                )
+                print(
+                    f"{case['name']:<32}{case['steps_per_second']:>10.1f} steps/s"
+                    f"{case['step_p50_us']:>10.0f} us p50"
+                    f"{case['step_p99_us']:>10.0f} us p99"
+                    f"{case['memory_bytes'] / 2 ** 20:>8.2f} MiB"
+                )
+                results.append(case)
+
+    if args.output is not None:
+        write_results(args.output, results)
+
+    if args.baseline is None:
+        return 0
+    baseline: List[Dict[str, Any]] = load_results(args.baseline)
+    regressions: List[str] = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
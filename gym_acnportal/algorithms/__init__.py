@@ -3,3 +3,6 @@
 Algorithms used for deploying trained RL models.
 """
 from .gym_algorithm import GymBaseAlgorithm, GymTrainedAlgorithm, SimRLModelWrapper
+from .batched_inference import InferenceBroker, BrokeredModelWrapper
+from .evaluation import EvaluationRunner
+from .dataset_export import DatasetExporter, TransitionRecordingAlgorithm, load_dataset
@@ -0,0 +1,266 @@
+# coding=utf-8
+"""
+Batched inference for many GymTrainedAlgorithms sharing one trained
+model, e.g. when evaluating a policy over many sites or scenarios
+with simulations running in concurrent threads.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Dict, List, Any, Tuple
+
+import numpy as np
+
+from .gym_algorithm import GymTrainedAlgorithm, SimRLModelWrapper
+
+
+class InferenceBroker:
+    """ Coalesces predictions requested by many GymTrainedAlgorithms
+    into batches evaluated by a single call to the shared model's
+    predict_batch method.
+
+    Requests are collected by a dispatcher thread. A batch is evaluated
+    once max_batch_size requests are waiting or max_wait seconds have
+    passed since the first request of the batch arrived, whichever is
+    first. Each algorithm's simulation should run in its own thread, as
+    GymTrainedAlgorithm.schedule blocks until its batch is evaluated.
+
+    Example:
+        broker = InferenceBroker(model_wrapper, max_batch_size=64)
+        for algorithm in algorithms:
+            broker.register(algorithm)
+        # Run each algorithm's Simulator in its own thread.
+        broker.close()
+
+    Args:
+        model (SimRLModelWrapper): Model shared by all registered
+            algorithms. Override SimRLModelWrapper.predict_batch to
+            evaluate a batch of observations at once.
+        max_batch_size (int): Maximum number of observations per call
+            to predict_batch.
+        max_wait (float): Maximum time in seconds a request waits for
+            other requests to join its batch.
+    """
+
+    model: SimRLModelWrapper
+    max_batch_size: int
+    max_wait: float
+    _requests: "queue.Queue[Optional[Tuple[Tuple, Future]]]"
+    _dispatcher: threading.Thread
+    _lock: threading.Lock
+    _closed: bool
+    _num_batches: int
+    _num_predictions: int
+
+    def __init__(
+        self,
+        model: SimRLModelWrapper,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(
+                f"max_batch_size must be at least 1. Got {max_batch_size}."
+            )
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._num_batches = 0
+        self._num_predictions = 0
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="InferenceBroker", daemon=True
+        )
+        self._dispatcher.start()
+
+    def __enter__(self) -> "InferenceBroker":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """ Return counters describing the batches evaluated so far.
+
+        Returns:
+            Dict[str, float]: Dict with keys num_batches,
+                num_predictions, and mean_batch_size.
+        """
+        return {
+            "num_batches": self._num_batches,
+            "num_predictions": self._num_predictions,
+            "mean_batch_size": (
+                self._num_predictions / self._num_batches if self._num_batches else 0
+            ),
+        }
+
+    def register(self, algorithm: GymTrainedAlgorithm) -> "BrokeredModelWrapper":
+        """ Register an algorithm with this broker. This registers a
+        model with the algorithm whose predictions are made by this
+        broker.
+
+        Args:
+            algorithm (GymTrainedAlgorithm): Algorithm to register.
+
+        Returns:
+            BrokeredModelWrapper: The model registered with algorithm.
+        """
+        model_wrapper: BrokeredModelWrapper = BrokeredModelWrapper(self)
+        algorithm.register_model(model_wrapper)
+        return model_wrapper
+
+    def submit(
+        self,
+        observation: object,
+        reward: Optional[float],
+        done: bool,
+        info: Optional[Dict[Any, Any]] = None,
+    ) -> Future:
+        """ Request a prediction from the shared model.
+
+        Args:
+            See SimRLModelWrapper.predict.
+
+        Returns:
+            Future: Future resolving to the predicted action.
+
+        Raises:
+            RuntimeError: If the broker has been closed.
+        """
+        future: Future = Future()
+        # Holding the lock ensures no request is queued after close's
+        # sentinel, where the dispatcher would never see it.
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit a prediction to a closed broker.")
+            self._requests.put(((observation, reward, done, info), future))
+        return future
+
+    def close(self) -> None:
+        """ Stop the dispatcher thread after evaluating all pending
+        requests. Futures of requests that were not evaluated, e.g.
+        because the dispatcher thread failed, are failed with a
+        RuntimeError.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._requests.put(None)
+        self._dispatcher.join()
+        closed_error: RuntimeError = RuntimeError(
+            "The broker was closed before the prediction was made."
+        )
+        while True:
+            try:
+                request: Optional[Tuple[Tuple, Future]] = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and request[1].set_running_or_notify_cancel():
+                request[1].set_exception(closed_error)
+
+    def _dispatch(self) -> None:
+        """ Collect requests into batches and evaluate them until the
+        broker is closed.
+        """
+        closing: bool = False
+        while not closing:
+            request: Optional[Tuple[Tuple, Future]] = self._requests.get()
+            if request is None:
+                break
+            batch: List[Tuple[Tuple, Future]] = [request]
+            deadline: float = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout: float = deadline - time.monotonic()
+                try:
+                    request = (
+                        self._requests.get(timeout=timeout)
+                        if timeout > 0
+                        else self._requests.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+            self._evaluate(batch)
+
+    def _evaluate(self, batch: List[Tuple[Tuple, Future]]) -> None:
+        """ Evaluate a batch of requests and resolve their futures. """
+        # Requests whose futures were cancelled are dropped.
+        batch = [
+            (args, future)
+            for args, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        futures: List[Future] = [future for _, future in batch]
+        observations, rewards, dones, infos = (
+            list(column) for column in zip(*(args for args, _ in batch))
+        )
+        try:
+            actions: List[np.ndarray] = list(
+                self.model.predict_batch(observations, rewards, dones, infos)
+            )
+            if len(actions) != len(futures):
+                raise ValueError(
+                    f"predict_batch returned {len(actions)} actions for "
+                    f"{len(futures)} observations."
+                )
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        self._num_batches += 1
+        self._num_predictions += len(futures)
+        for future, action in zip(futures, actions):
+            future.set_result(action)
+
+
+class BrokeredModelWrapper(SimRLModelWrapper):
+    """ Model wrapper whose predictions are made by an InferenceBroker.
+    predict blocks until the batch containing its observation has been
+    evaluated.
+
+    Args:
+        broker (InferenceBroker): Broker making predictions.
+    """
+
+    broker: InferenceBroker
+
+    def __init__(self, broker: InferenceBroker) -> None:
+        super().__init__(broker.model)
+        self.broker = broker
+
+    def predict(
+        self,
+        observation: object,
+        reward: float,
+        done: bool,
+        info: Dict[Any, Any] = None,
+    ) -> np.ndarray:
+        """ Implements SimRLModelWrapper.predict. """
+        return self.broker.submit(observation, reward, done, info).result()
+
+    def predict_batch(
+        self,
+        observations: List[object],
+        rewards: List[float],
+        dones: List[bool],
+        infos: List[Dict[Any, Any]],
+    ) -> List[np.ndarray]:
+        """ Implements SimRLModelWrapper.predict_batch. """
+        futures: List[Future] = [
+            self.broker.submit(*args)
+            for args in zip(observations, rewards, dones, infos)
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,363 @@
+# coding=utf-8
+"""
+Export of offline RL datasets from Simulations scheduled by classical
+algorithms, e.g. acnportal's sorting algorithms.
+"""
+import os
+import time
+from copy import deepcopy
+from typing import Optional, Dict, List, Any, Callable, Iterator, Sequence, Union
+
+import numpy as np
+from acnportal.acnsim import Simulator, EV
+from acnportal.algorithms import BaseAlgorithm
+
+from gym_acnportal.gym_acnsim.envs import (
+    CustomSimEnv,
+    TrajectoryReader,
+    TrajectoryWriter,
+    make_default_sim_env,
+)
+from .gym_algorithm import GymBaseAlgorithm
+from .scenarios import (
+    Scenario,
+    attach_algorithm,
+    build_simulator,
+    episode_scenarios,
+    run_episodes,
+)
+
+
+class TransitionRecordingAlgorithm(GymBaseAlgorithm):
+    """ Algorithm that schedules a Simulation with another algorithm,
+    recording each decision as a transition of a gym environment.
+
+    Each time the Simulator calls schedule, the environment's state is
+    updated (the reward is that of the previous action, as in
+    BaseSimEnv.step), the wrapped algorithm's schedule is converted to
+    an action with the environment's action object (see
+    SimAction.get_action), and the timestep is recorded with a
+    TrajectoryWriter. Call finish after the Simulation is run to record
+    the final observation and close the recording.
+
+    Args:
+        algorithm (BaseAlgorithm): Algorithm producing the schedules.
+            It is registered with this algorithm's interface.
+        directory (str): Directory in which to write the recording.
+        chunk_size (int): See TrajectoryWriter.
+        max_recompute (int): See BaseAlgorithm. Default 1, so that a
+            transition is recorded every period.
+    """
+
+    _env: Optional[CustomSimEnv]
+    algorithm: BaseAlgorithm
+    directory: str
+    chunk_size: int
+    writer: Optional[TrajectoryWriter]
+
+    def __init__(
+        self,
+        algorithm: BaseAlgorithm,
+        directory: str,
+        chunk_size: int = 4096,
+        max_recompute: int = 1,
+    ) -> None:
+        super().__init__(max_recompute=max_recompute)
+        self.algorithm = algorithm
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.writer = None
+
+    def __deepcopy__(
+        self, memodict: Optional[Dict] = None
+    ) -> "TransitionRecordingAlgorithm":
+        return type(self)(
+            deepcopy(self.algorithm, memodict),
+            self.directory,
+            chunk_size=self.chunk_size,
+            max_recompute=self.max_recompute,
+        )
+
+    def register_interface(self, interface: Any) -> None:
+        """ NOTE: Registering an interface sets the environment's
+        interface to GymTrainedInterface. The interface is also
+        registered with the wrapped algorithm.
+        """
+        super().register_interface(interface)
+        self.algorithm.register_interface(self.interface)
+
+    def schedule(self, active_evs: List[EV]) -> Dict[str, List[float]]:
+        """ Creates a schedule of charging rates for each EVSE in the
+        network using the wrapped algorithm, recording the transition.
+
+        Implements BaseAlgorithm.schedule().
+        """
+        if not isinstance(self.env, CustomSimEnv):
+            raise TypeError(
+                "TransitionRecordingAlgorithm requires an environment of type "
+                "CustomSimEnv to convert schedules to actions."
+            )
+        self._record(done=False)
+        self.env.store_previous_state()
+        schedule: Dict[str, List[float]] = self.algorithm.run()
+        self.env.action = self.env.action_object.get_action(
+            self.env.interface, schedule
+        )
+        self.env.schedule = schedule
+        return schedule
+
+    def finish(self) -> int:
+        """ Record the final observation of the Simulation and close the
+        recording.
+
+        Returns:
+            int: Number of transitions recorded.
+        """
+        if self.writer is None:
+            return 0
+        self._record(done=True)
+        self.writer.close()
+        return self.writer.num_rows - 1
+
+    def _record(self, done: bool) -> None:
+        """ Update the environment's state and record it. """
+        self.env.update_state()
+        first: bool = self.writer is None
+        if first:
+            self.writer = TrajectoryWriter(
+                self.directory,
+                self.env.observation_space,
+                self.env.action_space,
+                chunk_size=self.chunk_size,
+            )
+        self.writer.record(
+            self.env.observation,
+            None if first else self.env.action,
+            0.0 if first else self.env.reward,
+            done,
+            first,
+        )
+
+
+def _episode_directory(directory: str, episode: int) -> str:
+    """ Return the directory of an episode's recording. """
+    return os.path.join(directory, f"episode-{episode:06d}")
+
+
+def _export_episode(
+    episode: int,
+    scenario: Scenario,
+    algorithm_factory: Callable[[], BaseAlgorithm],
+    env_factory: Callable[[], CustomSimEnv],
+    directory: str,
+    chunk_size: int,
+) -> Dict[str, Any]:
+    """ Run one episode, recording its transitions.
+
+    Args:
+        episode (int): Index of the episode.
+        scenario (Scenario): Scenario to run. A Simulator is run
+            in place.
+        algorithm_factory (Callable[[], BaseAlgorithm]): See
+            DatasetExporter.
+        env_factory (Callable[[], CustomSimEnv]): See DatasetExporter.
+        directory (str): See DatasetExporter.
+        chunk_size (int): See DatasetExporter.
+
+    Returns:
+        Dict[str, Any]: Row of results with keys episode, directory
+            (of the episode's recording), transitions (the number of
+            transitions recorded), and wall_time (seconds taken to run
+            and record the simulation).
+    """
+    simulator: Simulator = build_simulator(scenario)
+    episode_directory: str = _episode_directory(directory, episode)
+    algorithm: TransitionRecordingAlgorithm = TransitionRecordingAlgorithm(
+        algorithm_factory(), episode_directory, chunk_size=chunk_size
+    )
+    algorithm.register_env(env_factory())
+    attach_algorithm(simulator, algorithm)
+
+    start: float = time.perf_counter()
+    simulator.run()
+    transitions: int = algorithm.finish()
+    return {
+        "episode": episode,
+        "directory": episode_directory,
+        "transitions": transitions,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+class DatasetExporter:
+    """ Exports an offline RL dataset by running a classical scheduling
+    algorithm over a set of scenarios, recording the transitions of
+    each episode in a gym environment configuration (observations,
+    action, and rewards). Episodes may be fanned out over a pool of
+    worker processes; each episode is written to its own subdirectory
+    of directory as a TrajectoryWriter recording. Use load_dataset to
+    read the exported transitions.
+
+    When running in worker processes, algorithm_factory, scenarios,
+    and env_factory must be picklable (e.g. module-level functions).
+
+    Args:
+        algorithm_factory (Callable[[], BaseAlgorithm]): Function
+            returning the algorithm to record, e.g.
+            acnportal.algorithms.SortedSchedulingAlgo.
+        scenarios (Union[Callable[..., Simulator],
+            Sequence[Simulator]]): See EvaluationRunner.
+        directory (str): Directory in which to write the dataset.
+        env_factory (Callable[[], CustomSimEnv]): Function returning the
+            environment whose observation, action, and reward
+            configuration is recorded. The action object must define
+            to_action (see SimAction). Default make_default_sim_env.
+        num_workers (int): Number of worker processes. If 0 (default),
+            episodes are run sequentially in this process.
+        seed (Union[int, np.random.SeedSequence]): See EvaluationRunner.
+        chunk_size (int): See TrajectoryWriter.
+    """
+
+    algorithm_factory: Callable[[], BaseAlgorithm]
+    scenarios: Union[Callable[..., Simulator], Sequence[Simulator]]
+    directory: str
+    env_factory: Callable[[], CustomSimEnv]
+    num_workers: int
+    seed_sequence: np.random.SeedSequence
+    chunk_size: int
+    _num_episodes_run: int
+    _num_transitions_run: int
+    _elapsed_time: float
+
+    def __init__(
+        self,
+        algorithm_factory: Callable[[], BaseAlgorithm],
+        scenarios: Union[
+            Callable[..., Simulator], Sequence[Simulator]
+        ],
+        directory: str,
+        env_factory: Callable[[], CustomSimEnv] = make_default_sim_env,
+        num_workers: int = 0,
+        seed: Optional[Union[int, np.random.SeedSequence]] = None,
+        chunk_size: int = 4096,
+    ) -> None:
+        if num_workers < 0:
+            raise ValueError(f"num_workers must be nonnegative. Got {num_workers}.")
+        self.algorithm_factory = algorithm_factory
+        self.scenarios = scenarios
+        self.directory = directory
+        self.env_factory = env_factory
+        self.num_workers = num_workers
+        self.seed_sequence = (
+            seed
+            if isinstance(seed, np.random.SeedSequence)
+            else np.random.SeedSequence(seed)
+        )
+        self.chunk_size = chunk_size
+        self._num_episodes_run = 0
+        self._num_transitions_run = 0
+        self._elapsed_time = 0.0
+
+    @property
+    def throughput(self) -> Dict[str, float]:
+        """ Return the throughput of the episodes exported so far.
+
+        Returns:
+            Dict[str, float]: Dict with keys episodes, transitions,
+                elapsed_time (seconds), and transitions_per_second.
+        """
+        elapsed_time: float = self._elapsed_time
+        return {
+            "episodes": self._num_episodes_run,
+            "transitions": self._num_transitions_run,
+            "elapsed_time": elapsed_time,
+            "transitions_per_second": (
+                self._num_transitions_run / elapsed_time if elapsed_time else 0.0
+            ),
+        }
+
+    def run(self, num_episodes: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """ Export the dataset, yielding a row of results for each
+        episode as it completes (see _export_episode). Episodes are
+        numbered after those exported by previous calls.
+
+        Args:
+            num_episodes (int): See EvaluationRunner.run.
+
+        Yields:
+            Dict[str, Any]: Row of results with keys episode,
+                directory, transitions, and wall_time.
+        """
+        scenarios: List[Scenario] = episode_scenarios(
+            self.scenarios,
+            self.seed_sequence,
+            num_episodes,
+            copy=not self.num_workers,
+        )
+        first_episode: int = self._num_episodes_run
+        elapsed_before: float = self._elapsed_time
+        start: float = time.perf_counter()
+        episode_args: List[tuple] = [
+            (
+                first_episode + episode,
+                scenario,
+                self.algorithm_factory,
+                self.env_factory,
+                self.directory,
+                self.chunk_size,
+            )
+            for episode, scenario in enumerate(scenarios)
+        ]
+        for row in run_episodes(_export_episode, episode_args, self.num_workers):
+            self._num_episodes_run += 1
+            self._num_transitions_run += row["transitions"]
+            self._elapsed_time = elapsed_before + time.perf_counter() - start
+            yield row
+
+    def export(self, num_episodes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Export the dataset and return the results of all episodes.
+
+        Args:
+            num_episodes (int): See run.
+
+        Returns:
+            List[Dict[str, Any]]: Rows of results, in episode order.
+        """
+        return sorted(self.run(num_episodes), key=lambda row: row["episode"])
+
+
+def load_dataset(directory: str) -> Dict[str, Any]:
+    """ Load the transitions of every episode exported to a directory
+    by DatasetExporter.
+
+    Args:
+        directory (str): Directory containing the dataset.
+
+    Returns:
+        Dict[str, Any]: Transitions in the format of
+            TrajectoryReader.transitions, concatenated over episodes in
+            episode order.
+    """
+    episode_transitions: List[Dict[str, Any]] = [
+        TrajectoryReader(os.path.join(directory, episode_directory)).transitions()
+        for episode_directory in sorted(os.listdir(directory))
+        if episode_directory.startswith("episode-")
+    ]
+    if not episode_transitions:
+        raise ValueError(f"No episodes found in {directory}.")
+
+    # noinspection PyMissingOrEmptyDocstring
+    def concatenate(key: str) -> Any:
+        if isinstance(episode_transitions[0][key], dict):
+            return {
+                observation_key: np.concatenate(
+                    [
+                        transitions[key][observation_key]
+                        for transitions in episode_transitions
+                    ]
+                )
+                for observation_key in episode_transitions[0][key]
+            }
+        return np.concatenate([transitions[key] for transitions in episode_transitions])
+
+    return {key: concatenate(key) for key in episode_transitions[0]}
@@ -0,0 +1,271 @@
+# coding=utf-8
+"""
+Parallel evaluation of trained models over sets of scenarios.
+"""
+import time
+from typing import (
+    Optional,
+    Dict,
+    List,
+    Any,
+    Callable,
+    Iterator,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from acnportal.acnsim import Simulator
+from acnportal.acnsim import analysis
+
+from gym_acnportal.gym_acnsim.envs import BaseSimEnv, make_default_sim_env
+from .gym_algorithm import GymTrainedAlgorithm, SimRLModelWrapper
+from .scenarios import (
+    Scenario,
+    attach_algorithm,
+    build_simulator,
+    episode_scenarios,
+    run_episodes,
+)
+
+
+def peak_aggregate_current(sim: Simulator) -> float:
+    """ Return the peak aggregate current drawn during a simulation.
+
+    Args:
+        sim (Simulator): A Simulator object which has been run.
+
+    Returns:
+        float: Peak aggregate current [A].
+    """
+    return float(sim.peak)
+
+
+default_metrics: Dict[str, Callable[[Simulator], Any]] = {
+    "total_energy_delivered": analysis.total_energy_delivered,
+    "proportion_of_energy_delivered": analysis.proportion_of_energy_delivered,
+    "proportion_of_demands_met": analysis.proportion_of_demands_met,
+    "peak_aggregate_current": peak_aggregate_current,
+}
+
+# Model used by episodes run in a worker process. Each worker builds
+# the model once, in _initialize_worker.
+_worker_model: Optional[SimRLModelWrapper] = None
+
+
+def _initialize_worker(model_wrapper_factory: Callable[[], SimRLModelWrapper]) -> None:
+    """ Build the model used by episodes run in this worker process. """
+    global _worker_model
+    _worker_model = model_wrapper_factory()
+
+
+def _run_episode(
+    episode: int,
+    scenario: Scenario,
+    env_factory: Callable[[], BaseSimEnv],
+    metrics: Dict[str, Callable[[Simulator], Any]],
+    algorithm_kwargs: Dict[str, Any],
+    model: Optional[SimRLModelWrapper] = None,
+) -> Dict[str, Any]:
+    """ Run one evaluation episode and compute its metrics.
+
+    Args:
+        episode (int): Index of the episode.
+        scenario (Scenario): Scenario to run. A Simulator is run
+            in place.
+        env_factory (Callable[[], BaseSimEnv]): See EvaluationRunner.
+        metrics (Dict[str, Callable[[Simulator], Any]]): See
+            EvaluationRunner.
+        algorithm_kwargs (Dict[str, Any]): See EvaluationRunner.
+        model (SimRLModelWrapper): Model to evaluate. If None, the
+            model of this worker process is used.
+
+    Returns:
+        Dict[str, Any]: Row of results with keys episode, periods (the
+            number of periods simulated), wall_time (seconds taken to
+            run the simulation), and each key of metrics.
+    """
+    if model is None:
+        model = _worker_model
+    simulator: Simulator = build_simulator(scenario)
+    algorithm: GymTrainedAlgorithm = GymTrainedAlgorithm(**algorithm_kwargs)
+    algorithm.register_model(model)
+    algorithm.register_env(env_factory())
+    attach_algorithm(simulator, algorithm)
+
+    start: float = time.perf_counter()
+    simulator.run()
+    row: Dict[str, Any] = {
+        "episode": episode,
+        "periods": simulator.iteration,
+        "wall_time": time.perf_counter() - start,
+    }
+    for name, metric in metrics.items():
+        row[name] = metric(simulator)
+    return row
+
+
+class EvaluationRunner:
+    """ Evaluates a trained model over a set of scenarios, running each
+    scenario as a Simulator scheduled by a GymTrainedAlgorithm.
+    Episodes may be fanned out over a pool of worker processes;
+    results are streamed as episodes complete.
+
+    When running in worker processes, model_wrapper_factory,
+    scenarios, env_factory, and metrics must be picklable (e.g.
+    module-level functions). The model is built once per worker and
+    shared by all episodes that worker runs.
+
+    Args:
+        model_wrapper_factory (Callable[[], SimRLModelWrapper]):
+            Function returning the wrapped model to evaluate.
+        scenarios (Union[Callable[..., Simulator],
+            Sequence[Simulator]]): Either a function generating a
+            Simulator, passed a numpy random Generator as the keyword
+            argument rng if it has a parameter named rng (as in
+            RebuildingEnv), or a sequence of Simulators, e.g. loaded
+            from a scenario store. The Simulators' schedulers are
+            replaced by a GymTrainedAlgorithm; Simulators in a sequence
+            are copied before being run.
+        env_factory (Callable[[], BaseSimEnv]): Function returning the
+            environment whose observation and action configuration the
+            model was trained with. Its interface is set when the
+            GymTrainedAlgorithm is registered with each Simulator.
+            Default make_default_sim_env.
+        metrics (Dict[str, Callable[[Simulator], Any]]): Metrics
+            computed from each Simulator after it is run, e.g.
+            functions from acnportal.acnsim.analysis. Default
+            default_metrics.
+        num_workers (int): Number of worker processes. If 0 (default),
+            episodes are run sequentially in this process.
+        seed (Union[int, np.random.SeedSequence]): Seed from which a
+            random number generator is spawned for each episode if
+            scenarios is a function.
+        algorithm_kwargs (Dict[str, Any]): Keyword arguments passed to
+            GymTrainedAlgorithm, e.g. inference_only.
+    """
+
+    model_wrapper_factory: Callable[[], SimRLModelWrapper]
+    scenarios: Union[
+        Callable[..., Simulator], Sequence[Simulator]
+    ]
+    env_factory: Callable[[], BaseSimEnv]
+    metrics: Dict[str, Callable[[Simulator], Any]]
+    num_workers: int
+    seed_sequence: np.random.SeedSequence
+    algorithm_kwargs: Dict[str, Any]
+    _num_episodes_run: int
+    _num_periods_run: int
+    _elapsed_time: float
+
+    def __init__(
+        self,
+        model_wrapper_factory: Callable[[], SimRLModelWrapper],
+        scenarios: Union[
+            Callable[..., Simulator], Sequence[Simulator]
+        ],
+        env_factory: Callable[[], BaseSimEnv] = make_default_sim_env,
+        metrics: Optional[Dict[str, Callable[[Simulator], Any]]] = None,
+        num_workers: int = 0,
+        seed: Optional[Union[int, np.random.SeedSequence]] = None,
+        algorithm_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if num_workers < 0:
+            raise ValueError(f"num_workers must be nonnegative. Got {num_workers}.")
+        self.model_wrapper_factory = model_wrapper_factory
+        self.scenarios = scenarios
+        self.env_factory = env_factory
+        self.metrics = default_metrics if metrics is None else metrics
+        self.num_workers = num_workers
+        self.seed_sequence = (
+            seed
+            if isinstance(seed, np.random.SeedSequence)
+            else np.random.SeedSequence(seed)
+        )
+        self.algorithm_kwargs = {} if algorithm_kwargs is None else algorithm_kwargs
+        self._num_episodes_run = 0
+        self._num_periods_run = 0
+        self._elapsed_time = 0.0
+
+    @property
+    def throughput(self) -> Dict[str, float]:
+        """ Return the throughput of the episodes run so far.
+
+        Returns:
+            Dict[str, float]: Dict with keys episodes, periods,
+                elapsed_time (seconds), episodes_per_second, and
+                periods_per_second.
+        """
+        elapsed_time: float = self._elapsed_time
+        return {
+            "episodes": self._num_episodes_run,
+            "periods": self._num_periods_run,
+            "elapsed_time": elapsed_time,
+            "episodes_per_second": (
+                self._num_episodes_run / elapsed_time if elapsed_time else 0.0
+            ),
+            "periods_per_second": (
+                self._num_periods_run / elapsed_time if elapsed_time else 0.0
+            ),
+        }
+
+    def run(self, num_episodes: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """ Run the evaluation, yielding a row of results for each
+        episode as it completes (see _run_episode). With worker
+        processes, rows may not be yielded in episode order.
+
+        Args:
+            num_episodes (int): Number of episodes to run. Required if
+                scenarios is a function; otherwise, defaults to running
+                every Simulator in scenarios.
+
+        Yields:
+            Dict[str, Any]: Row of results with keys episode, periods,
+                wall_time, and each key of metrics.
+        """
+        # Simulators are copied when sent to worker processes.
+        scenarios: List[Scenario] = episode_scenarios(
+            self.scenarios,
+            self.seed_sequence,
+            num_episodes,
+            copy=not self.num_workers,
+        )
+        elapsed_before: float = self._elapsed_time
+        start: float = time.perf_counter()
+        episode_args: List[Tuple] = [
+            (episode, scenario, self.env_factory, self.metrics, self.algorithm_kwargs)
+            for episode, scenario in enumerate(scenarios)
+        ]
+        if not self.num_workers:
+            # Episodes run in this process share one model, passed to
+            # each episode rather than stored in _worker_model.
+            model: SimRLModelWrapper = self.model_wrapper_factory()
+            episode_args = [args + (model,) for args in episode_args]
+
+        # noinspection PyMissingOrEmptyDocstring
+        def record(row: Dict[str, Any]) -> Dict[str, Any]:
+            self._num_episodes_run += 1
+            self._num_periods_run += row["periods"]
+            self._elapsed_time = elapsed_before + time.perf_counter() - start
+            return row
+
+        for row in run_episodes(
+            _run_episode,
+            episode_args,
+            self.num_workers,
+            initializer=_initialize_worker,
+            initargs=(self.model_wrapper_factory,),
+        ):
+            yield record(row)
+
+    def evaluate(self, num_episodes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Run the evaluation and return the results of all episodes.
+
+        Args:
+            num_episodes (int): See run.
+
+        Returns:
+            List[Dict[str, Any]]: Rows of results, in episode order.
+        """
+        return sorted(self.run(num_episodes), key=lambda row: row["episode"])
@@ -2,14 +2,18 @@
 """
 Algorithms used for deploying trained RL models.
 """
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from copy import deepcopy
+
 import numpy as np
 
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 
 from acnportal.acnsim import Interface, EV
 from acnportal.algorithms import BaseAlgorithm
 
-from gym_acnportal.gym_acnsim.envs import BaseSimEnv
+from gym_acnportal.gym_acnsim.envs import BaseSimEnv, CustomSimEnv, RunningMeanStd
 from gym_acnportal.gym_acnsim.interfaces import (
     GymTrainedInterface,
     GymTrainingInterface,
@@ -58,6 +62,36 @@ class SimRLModelWrapper:
         """
         raise NotImplementedError
 
+    def predict_batch(
+        self,
+        observations: List[object],
+        rewards: List[float],
+        dones: List[bool],
+        infos: List[Dict[Any, Any]],
+    ) -> List[np.ndarray]:
+        """
+        Return a prediction for each of a batch of observations, e.g.
+        from many simulations sharing this model (see InferenceBroker).
+        By default, this calls predict once per observation; wrappers of
+        models that can evaluate many observations at once should
+        override this method.
+
+        Args:
+            observations: A list of observations of environments.
+            rewards: The last reward returned by each environment.
+            dones: Whether each environment's simulation is done.
+            infos: Info from each environment.
+
+        Returns:
+            List[np.ndarray]: The action for each observation, in order.
+        """
+        return [
+            self.predict(observation, reward, done, info)
+            for observation, reward, done, info in zip(
+                observations, rewards, dones, infos
+            )
+        ]
+
 
 class GymBaseAlgorithm(BaseAlgorithm):
     """ Abstract algorithm class for Simulations using a reinforcement
@@ -125,7 +159,7 @@ class GymBaseAlgorithm(BaseAlgorithm):
             gym_interface: GymTrainedInterface = interface
         super().register_interface(gym_interface)
         if self._env is not None:
-            self.env.interface = interface
+            self.env.interface = gym_interface
 
     @property
     def env(self) -> BaseSimEnv:
@@ -176,14 +210,119 @@ class GymTrainedAlgorithm(GymBaseAlgorithm):
     scheduler.run(), causing this GymAlgorithm to run model.predict().
     Alternatively, one may call model.learn(vec_env), which instead will
     step through the simulation. See GymTrainingAlgorithm for this case.
+
+    Args:
+        max_recompute (int): See BaseAlgorithm.
+        inference_only (bool): If True, schedule() computes only the
+            observation from the registered interface before calling
+            model.predict, which is passed None for the reward and
+            info and False for done. The env's reward, done, and info
+            are not updated, the previous state is not stored, and no
+            copies of the env's state are made, so scheduler latency
+            is dominated by the model. Use this when deploying a model
+            whose predict method only uses the observation. Default
+            False.
+        latency_budget (float): Maximum time in seconds to wait for
+            model.predict. If set, predictions run in a worker thread;
+            if a prediction misses the deadline, or the previous
+            prediction is still running, a fallback schedule is
+            returned instead (see fallback_algorithm) and the miss is
+            counted in metrics. If None (default), predict is called
+            synchronously. The worker thread is shut down by shutdown(),
+            on leaving a with block, or when the algorithm is garbage
+            collected.
+        fallback_algorithm (BaseAlgorithm): Algorithm, e.g. an
+            acnportal sorting algorithm, run when a prediction misses
+            the latency budget. It shares this algorithm's interface.
+            If None (default), the last schedule is shifted by one
+            period and extended instead.
+        update_normalization (bool): If False (default), the running
+            normalization statistics of a registered CustomSimEnv are
+            frozen (see CustomSimEnv.freeze_normalization), so that the
+            deployed model sees observations normalized as in training.
+            If True, the statistics are updated with the observation of
+            each schedule call that updates the env's state (i.e. not
+            inference_only).
+        normalization_state (Dict[str, Optional[RunningMeanStd]]): If
+            given, normalization statistics, e.g. those returned by
+            CustomSimEnv.normalization_state of the training env,
+            loaded into a registered CustomSimEnv (see
+            CustomSimEnv.set_normalization_state) before it is frozen.
+            Without them, a newly built env normalizes with fresh
+            statistics rather than those of training.
     """
 
     _env: BaseSimEnv
     _model: Optional[SimRLModelWrapper]
-
-    def __init__(self, max_recompute: int = 1) -> None:
+    inference_only: bool
+    latency_budget: Optional[float]
+    fallback_algorithm: Optional[BaseAlgorithm]
+    update_normalization: bool
+    normalization_state: Optional[Dict[str, Optional[RunningMeanStd]]]
+    _executor: Optional[ThreadPoolExecutor]
+    _executor_finalizer: Optional[weakref.finalize]
+    _pending_prediction: Optional[Future]
+    _last_schedule: Optional[Dict[str, List[float]]]
+    _metrics: Dict[str, int]
+
+    def __init__(
+        self,
+        max_recompute: int = 1,
+        inference_only: bool = False,
+        latency_budget: Optional[float] = None,
+        fallback_algorithm: Optional[BaseAlgorithm] = None,
+        update_normalization: bool = False,
+        normalization_state: Optional[Dict[str, Optional[RunningMeanStd]]] = None,
+    ) -> None:
         super().__init__(max_recompute=max_recompute)
         self._model = None
+        self.inference_only = inference_only
+        self.latency_budget = latency_budget
+        self.fallback_algorithm = fallback_algorithm
+        self.update_normalization = update_normalization
+        self.normalization_state = normalization_state
+        self._executor = None
+        self._executor_finalizer = None
+        self._pending_prediction = None
+        self._last_schedule = None
+        self._metrics = {
+            "predictions": 0,
+            "deadline_misses": 0,
+            "skipped_predictions": 0,
+            "fallback_schedules": 0,
+        }
+
+    def __deepcopy__(self, memodict: Optional[Dict] = None) -> "GymTrainedAlgorithm":
+        return type(self)(
+            max_recompute=self.max_recompute,
+            inference_only=self.inference_only,
+            latency_budget=self.latency_budget,
+            fallback_algorithm=deepcopy(self.fallback_algorithm, memodict),
+            update_normalization=self.update_normalization,
+            normalization_state=deepcopy(self.normalization_state, memodict),
+        )
+
+    def register_interface(self, interface: Interface) -> None:
+        """ NOTE: Registering an interface sets the environment's
+        interface to GymTrainedInterface. The interface is also
+        registered with the fallback algorithm, if one is set.
+        """
+        super().register_interface(interface)
+        if self.fallback_algorithm is not None:
+            self.fallback_algorithm.register_interface(self.interface)
+
+    def register_env(self, env: BaseSimEnv) -> None:
+        """ NOTE: The normalization_state, if given, is loaded into a
+        registered CustomSimEnv, whose normalization statistics are
+        then frozen unless update_normalization.
+        """
+        super().register_env(env)
+        if not isinstance(env, CustomSimEnv):
+            return
+        if self.normalization_state is not None:
+            env.set_normalization_state(**self.normalization_state)
+        if not self.update_normalization:
+            env.freeze_normalization()
 
     @property
     def model(self) -> SimRLModelWrapper:
@@ -235,10 +374,130 @@ class GymTrainedAlgorithm(GymBaseAlgorithm):
                 "GymAlgorithm environment must have an interface of "
                 "type GymTrainedInterface to call schedule(). "
             )
-        self.env.update_state()
-        self.env.store_previous_state()
-        self.env.action = self.model.predict(
-            self.env.observation, self.env.reward, self.env.done, self.env.info
+        if self.inference_only:
+            observation: Dict[str, np.ndarray] = self.env.observation_from_state()
+            self.env.observation = observation
+            predict_args: Tuple = (observation, None, False, None)
+        else:
+            self.env.update_state()
+            self.env.store_previous_state()
+            predict_args: Tuple = (
+                self.env.observation,
+                self.env.reward,
+                self.env.done,
+                self.env.info,
+            )
+        if self.latency_budget is None:
+            action: np.ndarray = self.model.predict(*predict_args)
+        else:
+            action: Optional[np.ndarray] = self._predict_within_budget(predict_args)
+            if action is None:
+                schedule: Dict[str, List[float]] = self._fallback_schedule(active_evs)
+                self.env.schedule = schedule
+                self._last_schedule = schedule
+                return schedule
+        self.env.action = action
+        schedule: Dict[str, List[float]] = self.env.action_to_schedule()
+        self.env.schedule = schedule
+        self._last_schedule = schedule
+        return schedule
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """ Return counters describing how the latency budget was met.
+
+        Returns:
+            Dict[str, int]: Dict with keys
+                predictions: Number of predictions submitted to the model.
+                deadline_misses: Number of predictions that did not
+                    finish within the latency budget.
+                skipped_predictions: Number of calls to schedule in
+                    which no prediction was submitted because the
+                    previous one was still running.
+                fallback_schedules: Number of schedules not produced
+                    by the model.
+        """
+        return dict(self._metrics)
+
+    def _predict_within_budget(self, predict_args: Tuple) -> Optional[np.ndarray]:
+        """ Run model.predict in a worker thread, waiting at most
+        latency_budget seconds for the result.
+
+        Args:
+            predict_args (Tuple): Arguments to model.predict.
+
+        Returns:
+            Optional[np.ndarray]: The predicted action, or None if the
+                prediction missed the deadline or could not be
+                submitted because the previous prediction is still
+                running. The result of a late prediction is discarded.
+        """
+        if self._pending_prediction is not None:
+            if not self._pending_prediction.done():
+                self._metrics["skipped_predictions"] += 1
+                return None
+            self._pending_prediction = None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="GymTrainedAlgorithm"
+            )
+            self._executor_finalizer = weakref.finalize(
+                self, self._executor.shutdown, wait=False
+            )
+        self._metrics["predictions"] += 1
+        # A late prediction keeps running after schedule returns, so it
+        # is given its own copy of the observation, which the env
+        # overwrites on the next call.
+        future: Future = self._executor.submit(
+            self.model.predict, deepcopy(predict_args[0]), *predict_args[1:]
         )
-        self.env.schedule = self.env.action_to_schedule()
-        return self.env.schedule
+        try:
+            return future.result(timeout=self.latency_budget)
+        except TimeoutError:
+            self._metrics["deadline_misses"] += 1
+            self._pending_prediction = future
+            return None
+
+    def _fallback_schedule(self, active_evs: List[EV]) -> Dict[str, List[float]]:
+        """ Return the schedule used when no prediction is available in
+        time. This is the schedule of the fallback algorithm if one is
+        set. Otherwise, it is the last schedule returned, shifted by
+        one period and extended by repeating its final rate, or a zero
+        schedule if no schedule has been returned yet.
+
+        Args:
+            active_evs (List[EV]): EVs currently plugged in.
+
+        Returns:
+            Dict[str, List[float]]: See BaseAlgorithm.schedule.
+        """
+        self._metrics["fallback_schedules"] += 1
+        if self.fallback_algorithm is not None:
+            return self.fallback_algorithm.run()
+        if self._last_schedule is None:
+            return {ev.station_id: [0] for ev in active_evs}
+        return {
+            station_id: list(rates[1:]) + list(rates[-1:])
+            if len(rates) > 1
+            else list(rates)
+            for station_id, rates in self._last_schedule.items()
+        }
+
+    def shutdown(self) -> None:
+        """ Shut down the prediction worker thread, if any, without
+        waiting for a running prediction to finish.
+
+        Returns:
+            None
+        """
+        if self._executor_finalizer is not None:
+            self._executor_finalizer()
+            self._executor_finalizer = None
+        self._executor = None
+        self._pending_prediction = None
+
+    def __enter__(self) -> "GymTrainedAlgorithm":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.shutdown()
@@ -0,0 +1,143 @@
+# coding=utf-8
+"""
+Scenarios of episodes run by the EvaluationRunner and DatasetExporter,
+and the fan-out of those episodes over worker processes.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed, Future
+from copy import deepcopy
+from typing import (
+    Optional,
+    Dict,
+    List,
+    Any,
+    Callable,
+    Iterator,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from acnportal.acnsim import Simulator
+
+from gym_acnportal.gym_acnsim.envs import accepts_rng
+from .gym_algorithm import GymBaseAlgorithm
+
+# A scenario is either a Simulator to run, or a function generating a
+# Simulator (from a random number generator passed as the keyword
+# argument rng, if the function has a parameter named rng) along with
+# the SeedSequence from which to create that generator.
+Scenario = Union[
+    Simulator,
+    Tuple[Callable[..., Simulator], np.random.SeedSequence],
+]
+
+
+def episode_scenarios(
+    scenarios: Union[Callable[..., Simulator], Sequence[Simulator]],
+    seed_sequence: np.random.SeedSequence,
+    num_episodes: Optional[int],
+    copy: bool,
+) -> List[Scenario]:
+    """ Return the scenario of each episode to run.
+
+    Args:
+        scenarios (Union[Callable[..., Simulator],
+            Sequence[Simulator]]): Either a function generating a
+            Simulator, or a sequence of Simulators. See
+            EvaluationRunner.
+        seed_sequence (np.random.SeedSequence): Sequence from which the
+            seed of each episode is spawned if scenarios is a function.
+        num_episodes (int): Number of episodes. Required if scenarios
+            is a function; otherwise, defaults to every Simulator in
+            scenarios.
+        copy (bool): If True, Simulators in scenarios are copied.
+
+    Returns:
+        List[Scenario]: The scenario of each episode.
+    """
+    if callable(scenarios):
+        if num_episodes is None:
+            raise ValueError(
+                "num_episodes must be provided if scenarios is a function."
+            )
+        return [
+            (scenarios, episode_seed_sequence)
+            for episode_seed_sequence in seed_sequence.spawn(num_episodes)
+        ]
+    simulators: Sequence[Simulator] = (
+        scenarios if num_episodes is None else scenarios[:num_episodes]
+    )
+    if copy:
+        return [deepcopy(simulator) for simulator in simulators]
+    return list(simulators)
+
+
+def build_simulator(scenario: Scenario) -> Simulator:
+    """ Return the Simulator of a scenario.
+
+    Args:
+        scenario (Scenario): Scenario of an episode. A Simulator is
+            returned as is.
+
+    Returns:
+        Simulator: The Simulator to run.
+    """
+    if isinstance(scenario, Simulator):
+        return scenario
+    scenario_function, seed_sequence = scenario
+    if accepts_rng(scenario_function):
+        return scenario_function(rng=np.random.default_rng(seed_sequence))
+    return scenario_function()
+
+
+def attach_algorithm(simulator: Simulator, algorithm: GymBaseAlgorithm) -> None:
+    """ Replace a Simulator's scheduler with a gym algorithm, which
+    registers a GymTrainedInterface to the Simulator.
+
+    Args:
+        simulator (Simulator): Simulator to be scheduled by algorithm.
+        algorithm (GymBaseAlgorithm): Algorithm scheduling simulator.
+
+    Returns:
+        None
+    """
+    simulator.update_scheduler(algorithm)
+
+
+def run_episodes(
+    episode_function: Callable[..., Dict[str, Any]],
+    episode_args: List[Tuple],
+    num_workers: int,
+    initializer: Optional[Callable] = None,
+    initargs: Tuple = (),
+) -> Iterator[Dict[str, Any]]:
+    """ Call episode_function with each tuple of episode_args, yielding
+    results as they complete.
+
+    Args:
+        episode_function (Callable[..., Dict[str, Any]]): Function
+            running an episode and returning a row of results.
+        episode_args (List[Tuple]): Arguments of each episode.
+        num_workers (int): Number of worker processes. If 0, episodes
+            are run sequentially in this process.
+        initializer (Callable): Function called with initargs in each
+            worker process before any episode is run. It is not called
+            if num_workers is 0.
+        initargs (Tuple): Arguments to initializer.
+
+    Yields:
+        Dict[str, Any]: Row of results of each episode.
+    """
+    if not num_workers:
+        for args in episode_args:
+            yield episode_function(*args)
+        return
+    with ProcessPoolExecutor(
+        max_workers=num_workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        futures: List[Future] = [
+            executor.submit(episode_function, *args) for args in episode_args
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,169 @@
+# coding=utf-8
+""" Tests for batched inference across many GymTrainedAlgorithms. """
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from ..batched_inference import InferenceBroker, BrokeredModelWrapper
+from ..gym_algorithm import GymTrainedAlgorithm, SimRLModelWrapper
+
+
+class BatchRecordingModelWrapper(SimRLModelWrapper):
+    """ Model wrapper that predicts twice the observation and records
+    the size of each batch.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.batch_sizes: List[int] = []
+
+    def predict(self, observation, reward, done, info=None) -> np.ndarray:
+        return 2 * np.asarray(observation)
+
+    def predict_batch(self, observations, rewards, dones, infos) -> List[np.ndarray]:
+        self.batch_sizes.append(len(observations))
+        return list(2 * np.stack(observations))
+
+
+class TestSimRLModelWrapperPredictBatch(unittest.TestCase):
+    def test_predict_batch_default(self) -> None:
+        model_wrapper = SimRLModelWrapper()
+        model_wrapper.predict = lambda observation, *_: observation + 1
+        np.testing.assert_equal(
+            model_wrapper.predict_batch([1, 2], [0, 0], [False, False], [{}, {}]),
+            [2, 3],
+        )
+
+
+class TestInferenceBroker(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.model = BatchRecordingModelWrapper()
+
+    def _broker_helper(self, **kwargs) -> InferenceBroker:
+        broker = InferenceBroker(self.model, **kwargs)
+        self.addCleanup(broker.close)
+        return broker
+
+    def test_invalid_max_batch_size(self) -> None:
+        with self.assertRaises(ValueError):
+            InferenceBroker(self.model, max_batch_size=0)
+
+    def test_register(self) -> None:
+        broker = self._broker_helper()
+        algorithm = GymTrainedAlgorithm()
+        model_wrapper = broker.register(algorithm)
+        self.assertIsInstance(model_wrapper, BrokeredModelWrapper)
+        self.assertIs(algorithm.model, model_wrapper)
+        self.assertIs(model_wrapper.broker, broker)
+        self.assertIs(model_wrapper.model, self.model)
+
+    def test_single_request_flushed_after_max_wait(self) -> None:
+        broker = self._broker_helper(max_wait=0.01)
+        model_wrapper = BrokeredModelWrapper(broker)
+        np.testing.assert_equal(model_wrapper.predict(np.ones(2), 0, False), 2)
+        self.assertEqual(self.model.batch_sizes, [1])
+
+    def test_concurrent_requests_batched(self) -> None:
+        num_clients = 8
+        # A long max_wait ensures the batch is only evaluated once full.
+        broker = self._broker_helper(max_batch_size=num_clients, max_wait=5)
+        clients = [BrokeredModelWrapper(broker) for _ in range(num_clients)]
+        with ThreadPoolExecutor(max_workers=num_clients) as executor:
+            actions = list(
+                executor.map(
+                    lambda i: clients[i].predict(np.full(2, i), 0, False),
+                    range(num_clients),
+                )
+            )
+        for i, action in enumerate(actions):
+            np.testing.assert_equal(action, np.full(2, 2 * i))
+        self.assertEqual(self.model.batch_sizes, [num_clients])
+        self.assertEqual(
+            broker.stats,
+            {
+                "num_batches": 1,
+                "num_predictions": num_clients,
+                "mean_batch_size": num_clients,
+            },
+        )
+
+    def test_batch_split_at_max_batch_size(self) -> None:
+        broker = self._broker_helper(max_batch_size=3, max_wait=0.05)
+        actions = BrokeredModelWrapper(broker).predict_batch(
+            [np.full(1, i) for i in range(7)], 7 * [0], 7 * [False], 7 * [None]
+        )
+        np.testing.assert_equal(np.concatenate(actions), 2 * np.arange(7))
+        self.assertEqual(self.model.batch_sizes, [3, 3, 1])
+
+    def test_exception_propagated(self) -> None:
+        error = RuntimeError("model failed")
+
+        # noinspection PyMissingOrEmptyDocstring
+        def failing_predict_batch(*_) -> None:
+            raise error
+
+        self.model.predict_batch = failing_predict_batch
+        broker = self._broker_helper(max_wait=0)
+        with self.assertRaises(RuntimeError):
+            BrokeredModelWrapper(broker).predict(np.ones(2), 0, False)
+
+    def test_wrong_number_of_actions(self) -> None:
+        self.model.predict_batch = lambda observations, *_: observations[:-1]
+        broker = self._broker_helper(max_batch_size=2, max_wait=5)
+        futures = [broker.submit(np.ones(2), 0, False) for _ in range(2)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(5)
+
+    def test_close_evaluates_pending_requests(self) -> None:
+        broker = InferenceBroker(self.model, max_wait=5)
+        futures = [broker.submit(np.full(2, i), 0, False) for i in range(3)]
+        broker.close()
+        for i, future in enumerate(futures):
+            np.testing.assert_equal(future.result(0), np.full(2, 2 * i))
+
+    def test_submit_racing_close(self) -> None:
+        broker = InferenceBroker(self.model, max_wait=0)
+        futures = []
+        start = threading.Barrier(5)
+
+        # noinspection PyMissingOrEmptyDocstring
+        def submit_until_closed() -> None:
+            start.wait()
+            while True:
+                try:
+                    futures.append(broker.submit(np.ones(2), 0, False))
+                except RuntimeError:
+                    return
+
+        threads = [threading.Thread(target=submit_until_closed) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        broker.close()
+        for thread in threads:
+            thread.join()
+        # Every accepted request is resolved; none is left behind the
+        # dispatcher's shutdown.
+        for future in futures:
+            np.testing.assert_equal(future.result(0), 2)
+
+    def test_close(self) -> None:
+        broker = InferenceBroker(self.model)
+        broker.close()
+        self.assertFalse(broker._dispatcher.is_alive())
+        with self.assertRaises(RuntimeError):
+            broker.submit(np.ones(2), 0, False)
+
+    def test_context_manager(self) -> None:
+        with InferenceBroker(self.model) as broker:
+            dispatcher: threading.Thread = broker._dispatcher
+        self.assertFalse(dispatcher.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+# coding=utf-8
+""" Tests for exporting offline datasets from classical algorithms. """
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from acnportal.algorithms import UncontrolledCharging
+
+from gym_acnportal.gym_acnsim.envs import BaseSimEnv, TrajectoryReader
+from .test_evaluation import scenario_function
+from ..dataset_export import (
+    DatasetExporter,
+    TransitionRecordingAlgorithm,
+    load_dataset,
+)
+
+
+class TestTransitionRecordingAlgorithm(unittest.TestCase):
+    def test_schedule_requires_custom_env(self) -> None:
+        algorithm = TransitionRecordingAlgorithm(UncontrolledCharging(), "unused")
+        algorithm.register_env(BaseSimEnv(None))
+        with self.assertRaises(TypeError):
+            algorithm.schedule([])
+
+    def test_finish_without_schedule(self) -> None:
+        algorithm = TransitionRecordingAlgorithm(UncontrolledCharging(), "unused")
+        self.assertEqual(algorithm.finish(), 0)
+
+
+class TestDatasetExporter(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = temporary_directory.name
+
+    def test_invalid_num_workers(self) -> None:
+        with self.assertRaises(ValueError):
+            DatasetExporter(
+                UncontrolledCharging, scenario_function, self.directory, num_workers=-1
+            )
+
+    def test_export(self) -> None:
+        exporter = DatasetExporter(
+            UncontrolledCharging, scenario_function, self.directory, seed=0
+        )
+        rows = exporter.export(2)
+        self.assertEqual([row["episode"] for row in rows], [0, 1])
+        for row in rows:
+            self.assertTrue(os.path.isdir(row["directory"]))
+            reader = TrajectoryReader(row["directory"])
+            self.assertEqual(len(reader), row["transitions"] + 1)
+            first = reader.read("first")
+            self.assertTrue(first[0])
+            self.assertFalse(first[1:].any())
+            self.assertTrue(reader.read("done")[-1])
+        self.assertEqual(
+            exporter.throughput["transitions"], sum(row["transitions"] for row in rows)
+        )
+
+        dataset = load_dataset(self.directory)
+        num_transitions = sum(row["transitions"] for row in rows)
+        self.assertEqual(len(dataset["reward"]), num_transitions)
+        self.assertEqual(dataset["action"].shape, (num_transitions, 2))
+        self.assertEqual(set(dataset["observation"]), set(dataset["next_observation"]))
+        # Uncontrolled charging sends the maximum pilot (32 A) to the
+        # occupied EVSE, i.e. 16 A above the center of the default
+        # zero-centered action space, and 0 A to the empty EVSE.
+        occupied = dataset["observation"]["arrivals"][:, 0] > 0
+        np.testing.assert_allclose(dataset["action"][occupied, 0], 16)
+        np.testing.assert_allclose(dataset["action"][:, 1], -16)
+
+    def test_export_episodes_numbered_across_calls(self) -> None:
+        exporter = DatasetExporter(
+            UncontrolledCharging, scenario_function, self.directory, seed=0
+        )
+        exporter.export(1)
+        self.assertEqual([row["episode"] for row in exporter.export(1)], [1])
+
+    def test_export_worker_processes(self) -> None:
+        rows = DatasetExporter(
+            UncontrolledCharging,
+            scenario_function,
+            self.directory,
+            num_workers=2,
+            seed=0,
+        ).export(3)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+        self.assertEqual(
+            len(load_dataset(self.directory)["reward"]),
+            sum(row["transitions"] for row in rows),
+        )
+
+    def test_load_empty_dataset_error(self) -> None:
+        with self.assertRaises(ValueError):
+            load_dataset(self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
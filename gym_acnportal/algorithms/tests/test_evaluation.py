@@ -0,0 +1,133 @@
+# coding=utf-8
+""" Tests for the parallel evaluation runner. """
+import unittest
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+import pytz
+from acnportal import acnsim
+from acnportal.acnsim import Simulator, EV, Battery, PluginEvent, EventQueue
+
+from .. import evaluation
+from ..evaluation import EvaluationRunner, default_metrics, peak_aggregate_current
+from ..gym_algorithm import SimRLModelWrapper
+
+
+class ConstantModelWrapper(SimRLModelWrapper):
+    """ Model wrapper that always predicts a zero action, i.e. the
+    middle of each EVSE's range under the default action space.
+    """
+
+    def predict(
+        self, observation: Dict[str, np.ndarray], reward, done, info=None
+    ) -> np.ndarray:
+        return np.zeros(len(observation["arrivals"]))
+
+
+def scenario_function(rng: np.random.Generator) -> Simulator:
+    """ Return a Simulator with one EV plugged in at a random time. """
+    network = acnsim.sites.simple_acn(
+        ["EVSE-001", "EVSE-002"], aggregate_cap=32 * 208 / 1000
+    )
+    arrival = int(rng.integers(0, 5))
+    battery = Battery(100, 0, 100)
+    ev = EV(arrival, arrival + 10, 3, "EVSE-001", "EV-001", battery)
+    return Simulator(
+        network,
+        None,
+        EventQueue([PluginEvent(arrival, ev)]),
+        pytz.timezone("America/Los_Angeles").localize(datetime(2018, 9, 5)),
+        period=5,
+        verbose=False,
+    )
+
+
+class TestEvaluationRunner(unittest.TestCase):
+    def test_peak_aggregate_current(self) -> None:
+        simulator = scenario_function(np.random.default_rng(0))
+        simulator.peak = 12
+        self.assertEqual(peak_aggregate_current(simulator), 12.0)
+
+    def test_invalid_num_workers(self) -> None:
+        with self.assertRaises(ValueError):
+            EvaluationRunner(ConstantModelWrapper, scenario_function, num_workers=-1)
+
+    def test_scenario_function_requires_num_episodes(self) -> None:
+        runner = EvaluationRunner(ConstantModelWrapper, scenario_function)
+        with self.assertRaises(ValueError):
+            runner.evaluate()
+
+    def test_evaluate_in_process(self) -> None:
+        runner = EvaluationRunner(ConstantModelWrapper, scenario_function, seed=0)
+        rows = runner.evaluate(3)
+        self.assertEqual([row["episode"] for row in rows], [0, 1, 2])
+        for row in rows:
+            self.assertEqual(
+                set(row), {"episode", "periods", "wall_time", *default_metrics}
+            )
+            # The EV is charged at 16 A during its 10-period stay.
+            self.assertEqual(row["peak_aggregate_current"], 16)
+            self.assertGreater(row["total_energy_delivered"], 0)
+        throughput = runner.throughput
+        self.assertEqual(throughput["episodes"], 3)
+        self.assertEqual(throughput["periods"], sum(row["periods"] for row in rows))
+        self.assertGreater(throughput["episodes_per_second"], 0)
+
+    def test_evaluate_in_process_passes_model(self) -> None:
+        models = []
+
+        # noinspection PyMissingOrEmptyDocstring
+        def model_wrapper_factory() -> SimRLModelWrapper:
+            models.append(ConstantModelWrapper())
+            return models[-1]
+
+        runner = EvaluationRunner(model_wrapper_factory, scenario_function, seed=0)
+        runner.evaluate(2)
+        # One model is built and passed to every episode; the worker
+        # process global is left untouched.
+        self.assertEqual(len(models), 1)
+        self.assertIsNone(evaluation._worker_model)
+
+    def test_evaluate_reproducible(self) -> None:
+        runners = [
+            EvaluationRunner(ConstantModelWrapper, scenario_function, seed=1)
+            for _ in range(2)
+        ]
+        rows = [runner.evaluate(4) for runner in runners]
+        for row, other_row in zip(*rows):
+            self.assertEqual(row["periods"], other_row["periods"])
+
+    def test_evaluate_simulators_not_modified(self) -> None:
+        simulators = [scenario_function(np.random.default_rng(i)) for i in range(2)]
+        runner = EvaluationRunner(
+            ConstantModelWrapper,
+            simulators,
+            metrics={"energy": acnsim.analysis.total_energy_delivered},
+        )
+        rows = runner.evaluate()
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(set(rows[0]), {"episode", "periods", "wall_time", "energy"})
+        for simulator in simulators:
+            self.assertEqual(simulator.iteration, 0)
+            self.assertIsNone(simulator.scheduler)
+
+    def test_evaluate_worker_processes(self) -> None:
+        in_process_rows = EvaluationRunner(
+            ConstantModelWrapper, scenario_function, seed=2
+        ).evaluate(4)
+        runner = EvaluationRunner(
+            ConstantModelWrapper, scenario_function, num_workers=2, seed=2
+        )
+        streamed_episodes = [row["episode"] for row in runner.run(4)]
+        self.assertEqual(sorted(streamed_episodes), [0, 1, 2, 3])
+        worker_rows = EvaluationRunner(
+            ConstantModelWrapper, scenario_function, num_workers=2, seed=2
+        ).evaluate(4)
+        for row, worker_row in zip(in_process_rows, worker_rows):
+            for key in ["episode", "periods", *default_metrics]:
+                self.assertEqual(row[key], worker_row[key])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,16 @@
 # coding=utf-8
 """ Tests for the ACN-Sim gym algorithm and model wrapper. """
+import gc
+import threading
 import unittest
+from copy import deepcopy
 from unittest.mock import create_autospec, Mock, call
 
 import numpy as np
 from acnportal.acnsim import Interface, Simulator
+from acnportal.algorithms import BaseAlgorithm, UncontrolledCharging
 
-from gym_acnportal.gym_acnsim.envs import BaseSimEnv
+from gym_acnportal.gym_acnsim.envs import BaseSimEnv, CustomSimEnv, RunningMeanStd
 from gym_acnportal.gym_acnsim.interfaces import (
     GymTrainedInterface,
     GymTrainingInterface,
@@ -54,7 +58,7 @@ class TestGymBaseAlgorithm(unittest.TestCase):
         self.algorithm.register_interface(interface)
         self.assertNotEqual(self.algorithm.interface, interface)
         self.assertIsInstance(self.algorithm.interface, GymTrainedInterface)
-        self.assertEqual(self.env.interface, interface)
+        self.assertIs(self.env.interface, self.algorithm.interface)
 
     def test_register_gym_interface(self) -> None:
         gym_interface = GymTrainedInterface(create_autospec(Simulator))
@@ -150,6 +154,204 @@ class TestGymTrainedAlgorithm(TestGymBaseAlgorithm):
         self.assertEqual(self.env.schedule, {"PS-000": [0]})
         self.assertEqual(return_schedule, {"PS-000": [0]})
 
+    def test_deepcopy_inference_only(self) -> None:
+        algorithm = GymTrainedAlgorithm(max_recompute=3, inference_only=True)
+        algorithm_copy = deepcopy(algorithm)
+        self.assertEqual(algorithm_copy.max_recompute, 3)
+        self.assertTrue(algorithm_copy.inference_only)
+
+    def test_register_env_freezes_normalization(self) -> None:
+        env = create_autospec(CustomSimEnv)
+        self.algorithm.register_env(env)
+        env.freeze_normalization.assert_called_once_with()
+
+    def test_register_env_update_normalization(self) -> None:
+        env = create_autospec(CustomSimEnv)
+        algorithm = GymTrainedAlgorithm(update_normalization=True)
+        algorithm.register_env(env)
+        env.freeze_normalization.assert_not_called()
+        self.assertTrue(deepcopy(algorithm).update_normalization)
+
+    def test_register_env_loads_normalization_state(self) -> None:
+        env = create_autospec(CustomSimEnv)
+        state = {"observation_rms": RunningMeanStd((3,)), "reward_rms": None}
+        algorithm = GymTrainedAlgorithm(normalization_state=state)
+        manager = Mock()
+        manager.attach_mock(env.set_normalization_state, "set_normalization_state")
+        manager.attach_mock(env.freeze_normalization, "freeze_normalization")
+        algorithm.register_env(env)
+        self.assertEqual(
+            manager.mock_calls,
+            [call.set_normalization_state(**state), call.freeze_normalization()],
+        )
+        algorithm_copy = deepcopy(algorithm)
+        self.assertIsNot(
+            algorithm_copy.normalization_state["observation_rms"],
+            state["observation_rms"],
+        )
+
+    def test_schedule_inference_only(self) -> None:
+        self.algorithm = GymTrainedAlgorithm(inference_only=True)
+        self.env.interface = None
+        self.algorithm.register_env(self.env)
+        self.algorithm.register_interface(self.interface)
+        self.algorithm.register_model(self.model)
+
+        observation = {"obs": np.eye(2)}
+        self.env.observation_from_state = Mock(return_value=observation)
+        self.env.update_state = Mock()
+        self.env.store_previous_state = Mock()
+        self.model.predict = Mock(return_value=np.ones((2,)))
+        self.env.action_to_schedule = Mock(return_value={"PS-000": [0]})
+
+        return_schedule = self.algorithm.schedule([])
+
+        self.env.observation_from_state.assert_called_once()
+        self.model.predict.assert_called_once_with(observation, None, False, None)
+        self.env.update_state.assert_not_called()
+        self.env.store_previous_state.assert_not_called()
+        self.env.reward_from_state.assert_not_called()
+        self.env.info_from_state.assert_not_called()
+        self.assertIs(self.env.observation, observation)
+        np.testing.assert_equal(self.env.action, np.ones((2,)))
+        self.assertEqual(return_schedule, {"PS-000": [0]})
+
+
+class TestGymTrainedAlgorithmLatencyBudget(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.env = create_autospec(BaseSimEnv)
+        self.env.interface = None
+        self.interface = create_autospec(GymTrainedInterface)
+        self.model = create_autospec(SimRLModelWrapper)
+        self.release_prediction = threading.Event()
+        predict_calls = []
+
+        # The first prediction blocks until released; later predictions
+        # return immediately.
+        # noinspection PyMissingOrEmptyDocstring
+        def predict(*args) -> np.ndarray:
+            predict_calls.append(args)
+            if len(predict_calls) == 1:
+                self.release_prediction.wait(5)
+                return np.zeros((2,))
+            return np.ones((2,))
+
+        self.model.predict = Mock(side_effect=predict)
+        self.env.action_to_schedule = Mock(return_value={"PS-000": [16, 32]})
+
+    def _algorithm_helper(self, **kwargs) -> GymTrainedAlgorithm:
+        algorithm = GymTrainedAlgorithm(latency_budget=0.01, **kwargs)
+        algorithm.register_env(self.env)
+        algorithm.register_interface(self.interface)
+        algorithm.register_model(self.model)
+        self.addCleanup(algorithm.shutdown)
+        self.addCleanup(self.release_prediction.set)
+        return algorithm
+
+    def test_correct_on_init(self) -> None:
+        algorithm = GymTrainedAlgorithm()
+        self.assertIsNone(algorithm.latency_budget)
+        self.assertIsNone(algorithm.fallback_algorithm)
+        self.assertEqual(
+            algorithm.metrics,
+            {
+                "predictions": 0,
+                "deadline_misses": 0,
+                "skipped_predictions": 0,
+                "fallback_schedules": 0,
+            },
+        )
+
+    def test_deepcopy(self) -> None:
+        fallback = UncontrolledCharging()
+        algorithm = GymTrainedAlgorithm(latency_budget=0.5, fallback_algorithm=fallback)
+        algorithm_copy = deepcopy(algorithm)
+        self.assertEqual(algorithm_copy.latency_budget, 0.5)
+        self.assertIsInstance(algorithm_copy.fallback_algorithm, UncontrolledCharging)
+        self.assertIsNot(algorithm_copy.fallback_algorithm, fallback)
+
+    def test_register_interface_with_fallback(self) -> None:
+        fallback = create_autospec(BaseAlgorithm)
+        algorithm = self._algorithm_helper(fallback_algorithm=fallback)
+        fallback.register_interface.assert_called_once_with(algorithm.interface)
+
+    def test_deadline_miss_extends_last_schedule(self) -> None:
+        algorithm = self._algorithm_helper()
+        algorithm._last_schedule = {"PS-000": [8, 16, 24], "PS-001": [4]}
+        schedule = algorithm.schedule([])
+        self.assertEqual(schedule, {"PS-000": [16, 24, 24], "PS-001": [4]})
+        self.assertEqual(self.env.schedule, schedule)
+        self.assertEqual(algorithm.metrics["deadline_misses"], 1)
+        self.assertEqual(algorithm.metrics["fallback_schedules"], 1)
+        self.env.action_to_schedule.assert_not_called()
+
+    def test_deadline_miss_no_last_schedule(self) -> None:
+        algorithm = self._algorithm_helper()
+        ev = Mock()
+        ev.station_id = "PS-002"
+        self.assertEqual(algorithm.schedule([ev]), {"PS-002": [0]})
+
+    def test_deadline_miss_fallback_algorithm(self) -> None:
+        fallback = create_autospec(BaseAlgorithm)
+        fallback.run = Mock(return_value={"PS-000": [32]})
+        algorithm = self._algorithm_helper(fallback_algorithm=fallback)
+        self.assertEqual(algorithm.schedule([]), {"PS-000": [32]})
+        fallback.run.assert_called_once()
+
+    def test_skip_prediction_while_previous_running(self) -> None:
+        algorithm = self._algorithm_helper()
+        algorithm.schedule([])
+        algorithm.schedule([])
+        self.assertEqual(
+            algorithm.metrics,
+            {
+                "predictions": 1,
+                "deadline_misses": 1,
+                "skipped_predictions": 1,
+                "fallback_schedules": 2,
+            },
+        )
+        # Once the late prediction finishes, the model is used again;
+        # the late result is discarded.
+        self.release_prediction.set()
+        algorithm._pending_prediction.result(5)
+        self.assertEqual(algorithm.schedule([]), {"PS-000": [16, 32]})
+        np.testing.assert_equal(self.env.action, np.ones((2,)))
+        self.assertEqual(algorithm.metrics["predictions"], 2)
+        self.assertEqual(algorithm.metrics["fallback_schedules"], 2)
+
+    def test_prediction_gets_observation_copy(self) -> None:
+        observation = {"demands": np.array([1.0, 2.0])}
+        self.env.observation = observation
+        algorithm = self._algorithm_helper()
+        algorithm.schedule([])
+        predicted_observation = self.model.predict.call_args[0][0]
+        self.assertIsNot(predicted_observation, observation)
+        np.testing.assert_equal(predicted_observation["demands"], [1.0, 2.0])
+
+    def test_context_manager_shuts_down(self) -> None:
+        with self._algorithm_helper() as algorithm:
+            algorithm.schedule([])
+            executor = algorithm._executor
+            self.assertIsNotNone(executor)
+        self.assertIsNone(algorithm._executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
+    def test_executor_shut_down_when_collected(self) -> None:
+        algorithm = GymTrainedAlgorithm(latency_budget=0.01)
+        algorithm.register_env(self.env)
+        algorithm.register_interface(self.interface)
+        algorithm.register_model(self.model)
+        self.addCleanup(self.release_prediction.set)
+        algorithm.schedule([])
+        executor = algorithm._executor
+        del algorithm
+        gc.collect()
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
 
 if __name__ == "__main__":
     unittest.main()
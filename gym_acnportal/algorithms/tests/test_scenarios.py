@@ -0,0 +1,78 @@
+# coding=utf-8
+""" Tests for the scenarios of evaluation and export episodes. """
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+from acnportal.acnsim import Simulator
+
+from ..gym_algorithm import GymBaseAlgorithm
+from ..scenarios import (
+    attach_algorithm,
+    build_simulator,
+    episode_scenarios,
+    run_episodes,
+)
+
+
+class TestScenarios(unittest.TestCase):
+    def test_episode_scenarios_function(self) -> None:
+        scenario_function = Mock()
+        scenarios = episode_scenarios(
+            scenario_function, np.random.SeedSequence(0), 3, copy=True
+        )
+        self.assertEqual(len(scenarios), 3)
+        for scenario in scenarios:
+            self.assertIs(scenario[0], scenario_function)
+            self.assertIsInstance(scenario[1], np.random.SeedSequence)
+
+    def test_episode_scenarios_function_requires_num_episodes(self) -> None:
+        with self.assertRaises(ValueError):
+            episode_scenarios(Mock(), np.random.SeedSequence(0), None, copy=True)
+
+    def test_episode_scenarios_sequence(self) -> None:
+        simulators = [[0], [1], [2]]
+        scenarios = episode_scenarios(
+            simulators, np.random.SeedSequence(0), 2, copy=False
+        )
+        self.assertEqual(len(scenarios), 2)
+        self.assertIs(scenarios[0], simulators[0])
+        copied = episode_scenarios(
+            simulators, np.random.SeedSequence(0), None, copy=True
+        )
+        self.assertEqual(copied, simulators)
+        self.assertIsNot(copied[0], simulators[0])
+
+    def test_build_simulator_passes_rng_by_keyword(self) -> None:
+        seed_sequence = np.random.SeedSequence(0)
+        simulator = Mock(spec=Simulator)
+        generators = []
+
+        # noinspection PyMissingOrEmptyDocstring
+        def keyword_only_scenario_function(*, rng: np.random.Generator) -> Simulator:
+            generators.append(rng)
+            return simulator
+
+        self.assertIs(
+            build_simulator((keyword_only_scenario_function, seed_sequence)),
+            simulator,
+        )
+        self.assertIsInstance(generators[0], np.random.Generator)
+        self.assertIs(build_simulator((lambda: simulator, seed_sequence)), simulator)
+        self.assertIs(build_simulator(simulator), simulator)
+
+    def test_attach_algorithm(self) -> None:
+        simulator = Mock(spec=Simulator)
+        algorithm = GymBaseAlgorithm()
+        attach_algorithm(simulator, algorithm)
+        simulator.update_scheduler.assert_called_once_with(algorithm)
+
+    def test_run_episodes_in_process(self) -> None:
+        rows = list(
+            run_episodes(lambda episode: {"episode": episode}, [(0,), (1,)], 0)
+        )
+        self.assertEqual(rows, [{"episode": 0}, {"episode": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,7 @@ from typing import List, Dict
 from gym.envs import registry
 from gym.envs.registration import register, EnvSpec
 from .interfaces import GymTrainedInterface, GymTrainingInterface
+from .timing import StepTimer
 from .envs import *
 
 all_envs: List[EnvSpec] = list(registry.all())
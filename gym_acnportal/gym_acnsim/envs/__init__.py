@@ -4,9 +4,14 @@ This package contains environments for training RL agents to schedule EV
 charging.
 """
 from .base_env import BaseSimEnv
-from .custom_envs import CustomSimEnv, RebuildingEnv
+from .custom_envs import CustomSimEnv, RebuildingEnv, LazyObservation
 from .custom_envs import make_default_sim_env
 from .custom_envs import make_rebuilding_default_sim_env
 from .custom_envs import default_observation_objects
 from .custom_envs import default_action_object
 from .custom_envs import default_reward_functions
+from .custom_envs import accepts_rng
+from .dtypes import DtypePolicy
+from .normalization import RunningMeanStd
+from .recording import TrajectoryRecorder, TrajectoryReader, TrajectoryWriter
+from .diagnostics import CopyAccounting, DiagnosticsWrapper
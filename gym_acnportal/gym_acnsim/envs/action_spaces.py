@@ -6,9 +6,13 @@ functions for different builtin actions.
 See the SimAction docstring for more information on the
 SimAction class.
 
-Each factory function takes no arguments and returns an instance of type
-SimAction. Each factory function defines a space_function and and
-an to_schedule function with the following signatures:
+Each factory function returns an instance of type SimAction. Factory
+functions optionally take the dtype of the action space (default
+float64). Multi-period factory functions also require the horizon of
+the schedule, in periods.
+
+Each factory function defines a space_function and a to_schedule
+function with the following signatures:
 
 space_function:
     Callable[[GymInterface], Space]
@@ -20,13 +24,21 @@ to_schedule gives an ACN-Sim schedule for a given action. The
 to_schedule method does not enforce action space constraints, as some
 learning algorithms treat action space constraints as loose rather than
 strict.
+
+Builtin factory functions also define the inverse of to_schedule,
+to_action, which gives the action corresponding to an ACN-Sim schedule,
+e.g. one produced by a classical scheduling algorithm:
+
+to_action:
+    Callable[[GymInterface, Dict[str, List[float]]], np.ndarray]
 """
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
 from gym import Space
 from gym.spaces import Box
 
+from .dtypes import DTypeLike
 from ..interfaces import GymTrainedInterface
 
 
@@ -68,11 +80,19 @@ class SimAction:
         name (str): Name of this action. This attribute allows an
             environment to distinguish between different types of
             actions.
+        _to_action (Optional[Callable[[GymInterface,
+                    Dict[str, List[float]]], np.ndarray]]):
+            Function that accepts an interface to a simulation and a
+            schedule and generates the corresponding action, or None
+            if this action type cannot be generated from schedules.
     """
 
     _space_function: Callable[[GymTrainedInterface], Space]
     _to_schedule: Callable[[GymTrainedInterface, np.ndarray], Dict[str, List[float]]]
     name: str
+    _to_action: Optional[
+        Callable[[GymTrainedInterface, Dict[str, List[float]]], np.ndarray]
+    ]
 
     def __init__(
         self,
@@ -81,6 +101,9 @@ class SimAction:
             [GymTrainedInterface, np.ndarray], Dict[str, List[float]]
         ],
         name: str,
+        to_action: Optional[
+            Callable[[GymTrainedInterface, Dict[str, List[float]]], np.ndarray]
+        ] = None,
     ) -> None:
         """
         Args:
@@ -95,6 +118,11 @@ class SimAction:
             name (str): Name of this observation. This attribute allows
                 an environment to distinguish between different types
                 of observation.
+            to_action (Optional[Callable[[GymInterface,
+                       Dict[str, List[float]]], np.ndarray]]):
+                Function that accepts a GymInterface and a schedule and
+                generates the action corresponding to the schedule.
+                Optional.
         Returns:
             None.
 
@@ -102,6 +130,7 @@ class SimAction:
         self._space_function = space_function
         self._to_schedule = to_schedule
         self.name = name
+        self._to_action = to_action
 
     def get_space(self, interface: GymTrainedInterface) -> Space:
         """
@@ -139,9 +168,82 @@ class SimAction:
         """
         return self._to_schedule(interface, action)
 
+    def get_action(
+        self, interface: GymTrainedInterface, schedule: Dict[str, List[float]]
+    ) -> np.ndarray:
+        """
+        Returns the action corresponding to an ACN-Sim schedule, i.e.
+        the inverse of get_schedule. Schedules longer than the action's
+        horizon are truncated and shorter schedules are padded with 0.
+
+        Args:
+            interface (GymTrainedInterface): Interface to a simulation.
+            schedule (Dict[str, List[float]]): Schedule to be converted
+                into an action.
+
+        Returns:
+            np.ndarray: The action corresponding to the schedule.
+
+        Raises:
+            NotImplementedError: If this action has no to_action
+                function.
+        """
+        if self._to_action is None:
+            raise NotImplementedError(
+                f"Action {self.name} cannot be generated from a schedule."
+            )
+        return self._to_action(interface, schedule)
+
+
+# Helper functions for action factory functions.
+def _max_rates(interface: GymTrainedInterface) -> np.ndarray:
+    """ Return the maximum pilot signal of each station, in the order
+    of station_ids.
+    """
+    return np.array(
+        [interface.max_pilot_signal(station_id) for station_id in interface.station_ids]
+    )
+
+
+def _min_rates(interface: GymTrainedInterface) -> np.ndarray:
+    """ Return the minimum pilot signal of each station, in the order
+    of station_ids.
+    """
+    return np.array(
+        [interface.min_pilot_signal(station_id) for station_id in interface.station_ids]
+    )
+
+
+def _schedule_to_array(
+    interface: GymTrainedInterface, schedule: Dict[str, List[float]], horizon: int
+) -> np.ndarray:
+    """ Return a schedule as a (number of stations, horizon) array,
+    truncating longer schedules and padding shorter or missing ones
+    with 0.
+    """
+    schedule_array: np.ndarray = np.zeros((len(interface.station_ids), horizon))
+    for i, station_id in enumerate(interface.station_ids):
+        rates: List[float] = list(schedule.get(station_id, []))[:horizon]
+        schedule_array[i, : len(rates)] = rates
+    return schedule_array
+
+
+def _check_multi_period_action(
+    interface: GymTrainedInterface, action: np.ndarray
+) -> None:
+    """ Raise a TypeError unless action is a (number of stations,
+    horizon) array.
+    """
+    if len(action.shape) != 2 or action.shape[0] != len(interface.station_ids):
+        raise TypeError(
+            f"Multi-period schedule action type only accepts 2-D numpy "
+            f"arrays of shape (number of stations, horizon). Got shape = "
+            f"{action.shape}."
+        )
+
 
 # Action factory functions.
-def single_charging_schedule() -> SimAction:
+def single_charging_schedule(dtype: DTypeLike = "float") -> SimAction:
     """ Generates a SimAction instance that wraps functions to handle
     actions taking the form of a vector of pilot signals. For this
     action type, a single entry represents the pilot signal sent to
@@ -151,6 +253,10 @@ def single_charging_schedule() -> SimAction:
 
     As a 0 min rate is assumed to be allowed, the action space lower
     bound is set to 0 if the station min rates are all greater than 0.
+
+    Args:
+        dtype (DTypeLike): Dtype of the action space, and of actions
+            returned by to_action.
     """
 
     # noinspection PyMissingOrEmptyDocstring
@@ -171,7 +277,7 @@ def single_charging_schedule() -> SimAction:
                 ]
             ),
         )
-        return Box(low=min_rate, high=max_rate, shape=(num_evses,), dtype="float")
+        return Box(low=min_rate, high=max_rate, shape=(num_evses,), dtype=dtype)
 
     # noinspection PyMissingOrEmptyDocstring
     def to_schedule(
@@ -185,10 +291,16 @@ def single_charging_schedule() -> SimAction:
             )
         return {interface.station_ids[i]: [action[i]] for i in range(len(action))}
 
-    return SimAction(space_function, to_schedule, "single schedule")
+    # noinspection PyMissingOrEmptyDocstring
+    def to_action(
+        interface: GymTrainedInterface, schedule: Dict[str, List[float]]
+    ) -> np.ndarray:
+        return _schedule_to_array(interface, schedule, 1)[:, 0].astype(dtype)
+
+    return SimAction(space_function, to_schedule, "single schedule", to_action)
 
 
-def zero_centered_single_charging_schedule() -> SimAction:
+def zero_centered_single_charging_schedule(dtype: DTypeLike = "float") -> SimAction:
     """ Generates a SimAction instance that wraps functions to handle
     actions taking the form of a vector of pilot signals. For this
     action type, actions are assumed to be centered about 0, in that
@@ -199,29 +311,23 @@ def zero_centered_single_charging_schedule() -> SimAction:
     As a 0 min rate is assumed to be allowed, the action space lower
     bound is set to -rate_offset_array if the station min rates are all
     greater than 0.
+
+    Args:
+        dtype (DTypeLike): Dtype of the action space, and of actions
+            returned by to_action.
     """
 
     # noinspection PyMissingOrEmptyDocstring
     def space_function(interface: GymTrainedInterface) -> Box:
         num_evses: int = len(interface.station_ids)
-        max_rates: np.ndarray = np.array(
-            [
-                interface.max_pilot_signal(station_id)
-                for station_id in interface.station_ids
-            ]
-        )
-        min_rates: np.ndarray = np.array(
-            [
-                interface.min_pilot_signal(station_id)
-                for station_id in interface.station_ids
-            ]
-        )
+        max_rates: np.ndarray = _max_rates(interface)
+        min_rates: np.ndarray = _min_rates(interface)
         rate_offset_array: np.ndarray = (max_rates + min_rates) / 2
         return Box(
             low=min(min(-rate_offset_array), min(min_rates - rate_offset_array)),
             high=max(max_rates - rate_offset_array),
             shape=(num_evses,),
-            dtype="float",
+            dtype=dtype,
         )
 
     # noinspection PyMissingOrEmptyDocstring
@@ -234,18 +340,8 @@ def zero_centered_single_charging_schedule() -> SimAction:
                 f"of length <= 1 in a 1-D numpy array. Got shape = "
                 f"{len(action.shape)}."
             )
-        max_rates: np.ndarray = np.array(
-            [
-                interface.max_pilot_signal(station_id)
-                for station_id in interface.station_ids
-            ]
-        )
-        min_rates: np.ndarray = np.array(
-            [
-                interface.min_pilot_signal(station_id)
-                for station_id in interface.station_ids
-            ]
-        )
+        max_rates: np.ndarray = _max_rates(interface)
+        min_rates: np.ndarray = _min_rates(interface)
         rate_offset_array: np.ndarray = (max_rates + min_rates) / 2
         offset_action: np.ndarray = action + rate_offset_array
         return {
@@ -253,4 +349,122 @@ def zero_centered_single_charging_schedule() -> SimAction:
             for i in range(len(offset_action))
         }
 
-    return SimAction(space_function, to_schedule, "zero-centered single schedule")
+    # noinspection PyMissingOrEmptyDocstring
+    def to_action(
+        interface: GymTrainedInterface, schedule: Dict[str, List[float]]
+    ) -> np.ndarray:
+        rate_offset_array: np.ndarray = (
+            _max_rates(interface) + _min_rates(interface)
+        ) / 2
+        return (
+            _schedule_to_array(interface, schedule, 1)[:, 0] - rate_offset_array
+        ).astype(dtype)
+
+    return SimAction(
+        space_function, to_schedule, "zero-centered single schedule", to_action
+    )
+
+
+def charging_schedule(horizon: int, dtype: DTypeLike = "float") -> SimAction:
+    """ Generates a SimAction instance that wraps functions to handle
+    actions taking the form of a matrix of pilot signals, with one row
+    per EVSE and one column per period in the schedule. Multi-period
+    actions let an environment step the simulator several periods per
+    agent decision (see BaseSimEnv.periods_per_action).
+
+    The space bounds are the same as those of single_charging_schedule.
+
+    Args:
+        horizon (int): Number of periods in each schedule, typically
+            the periods_per_action of the environment.
+        dtype (DTypeLike): Dtype of the action space, and of actions
+            returned by to_action.
+    """
+
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> Box:
+        num_evses: int = len(interface.station_ids)
+        max_rate: float = max(_max_rates(interface))
+        min_rate: float = min(0.0, min(_min_rates(interface)))
+        return Box(
+            low=min_rate,
+            high=max_rate,
+            shape=(num_evses, horizon),
+            dtype=dtype,
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def to_schedule(
+        interface: GymTrainedInterface, action: np.ndarray
+    ) -> Dict[str, List[float]]:
+        _check_multi_period_action(interface, action)
+        return {
+            interface.station_ids[i]: list(action[i]) for i in range(len(action))
+        }
+
+    # noinspection PyMissingOrEmptyDocstring
+    def to_action(
+        interface: GymTrainedInterface, schedule: Dict[str, List[float]]
+    ) -> np.ndarray:
+        return _schedule_to_array(interface, schedule, horizon).astype(dtype)
+
+    return SimAction(space_function, to_schedule, "schedule", to_action)
+
+
+def zero_centered_charging_schedule(
+    horizon: int, dtype: DTypeLike = "float"
+) -> SimAction:
+    """ Generates a SimAction instance that wraps functions to handle
+    actions taking the form of a matrix of pilot signals, with one row
+    per EVSE and one column per period in the schedule. As in
+    zero_centered_single_charging_schedule, an action of 0 corresponds
+    to a pilot signal halfway between the EVSE's minimum and maximum
+    rates.
+
+    Args:
+        horizon (int): Number of periods in each schedule, typically
+            the periods_per_action of the environment.
+        dtype (DTypeLike): Dtype of the action space, and of actions
+            returned by to_action.
+    """
+
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> Box:
+        num_evses: int = len(interface.station_ids)
+        max_rates: np.ndarray = _max_rates(interface)
+        min_rates: np.ndarray = _min_rates(interface)
+        rate_offset_array: np.ndarray = (max_rates + min_rates) / 2
+        return Box(
+            low=min(min(-rate_offset_array), min(min_rates - rate_offset_array)),
+            high=max(max_rates - rate_offset_array),
+            shape=(num_evses, horizon),
+            dtype=dtype,
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def to_schedule(
+        interface: GymTrainedInterface, action: np.ndarray
+    ) -> Dict[str, List[float]]:
+        _check_multi_period_action(interface, action)
+        rate_offset_array: np.ndarray = (
+            _max_rates(interface) + _min_rates(interface)
+        ) / 2
+        offset_action: np.ndarray = action + rate_offset_array[:, np.newaxis]
+        return {
+            interface.station_ids[i]: list(offset_action[i])
+            for i in range(len(offset_action))
+        }
+
+    # noinspection PyMissingOrEmptyDocstring
+    def to_action(
+        interface: GymTrainedInterface, schedule: Dict[str, List[float]]
+    ) -> np.ndarray:
+        rate_offset_array: np.ndarray = (
+            _max_rates(interface) + _min_rates(interface)
+        ) / 2
+        return (
+            _schedule_to_array(interface, schedule, horizon)
+            - rate_offset_array[:, np.newaxis]
+        ).astype(dtype)
+
+    return SimAction(space_function, to_schedule, "zero-centered schedule", to_action)
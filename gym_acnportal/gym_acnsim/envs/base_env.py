@@ -3,13 +3,108 @@
 This module contains an abstract gym environment that wraps an ACN-Sim
 Simulation.
 """
+import sys
+import types
+import weakref
+from collections import deque
 from copy import deepcopy
-from typing import Optional, Dict, List, Any, Tuple
+from typing import Optional, Dict, List, Any, Tuple, Set, Union
 
 import gym
 import numpy as np
 
-from ..interfaces import GymTrainedInterface, GymTrainingInterface
+from ..interfaces import (
+    GymTrainedInterface,
+    GymTrainingInterface,
+    INFEASIBILITY_MODES,
+)
+from ..timing import StepTimer, _timed
+
+# Initial snapshots of the interfaces environments were created with
+# share_init_snapshot, keyed by those interfaces. Snapshots are never
+# modified (resets copy them), so such environments created with the
+# same interface share one.
+_shared_init_snapshots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# Every shared snapshot, including those whose interface no longer
+# exists.
+_all_shared_init_snapshots: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _shared_init_snapshot(
+    interface: Optional[GymTrainedInterface],
+) -> Optional[GymTrainedInterface]:
+    """ Return the shared initial snapshot of interface, creating it
+    if it does not exist.
+    """
+    if interface is None:
+        return None
+    try:
+        return _shared_init_snapshots[interface]
+    except KeyError:
+        snapshot: GymTrainedInterface = deepcopy(interface)
+        _shared_init_snapshots[interface] = snapshot
+        _all_shared_init_snapshots.add(snapshot)
+        return snapshot
+
+
+class _StepState:
+    """ The action, schedule, observation, reward, done, and info of
+    the current agent-environment loop iteration. See BaseSimEnv.
+    """
+
+    __slots__ = ("action", "schedule", "observation", "reward", "done", "info")
+
+    def __init__(self) -> None:
+        self.action = None
+        self.schedule = {}
+        self.observation = None
+        self.reward = None
+        self.done = None
+        self.info = None
+
+
+# Types whose instances are not counted as part of an environment's
+# memory.
+_UNSIZED_TYPES: Tuple[type, ...] = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def _deep_getsizeof(obj: Any, seen: Set[int]) -> int:
+    """ Return the size in bytes of obj and the objects it references,
+    skipping objects whose ids are in seen and adding the ids of the
+    objects counted to seen.
+    """
+    size: int = 0
+    stack: List[Any] = [obj]
+    while stack:
+        item: Any = stack.pop()
+        if id(item) in seen or isinstance(item, _UNSIZED_TYPES):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, np.ndarray):
+            # Arrays owning their data include it in getsizeof; views
+            # reference the array owning theirs.
+            if item.base is not None:
+                stack.append(item.base)
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+            for cls in type(item).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return size
 
 
 class BaseSimEnv(gym.Env):
@@ -34,45 +129,99 @@ class BaseSimEnv(gym.Env):
     is not required for internal functionality.
 
     Attributes:
+        fast_forward_idle (bool): If True, after each step (and on
+            reset) the simulation is advanced through any periods in
+            which no EVs are plugged in, and the number of periods
+            skipped after a step is reported in info under the key
+            "idle_periods_skipped".
+        periods_per_action (int): Maximum number of periods the
+            simulation is stepped per agent action. If greater than 1,
+            the agent's (multi-period) schedule is submitted to the
+            simulator, and the simulator is stepped (each step covering
+            up to its max_recompute periods) until the schedule runs
+            out, the simulation is done, or the set of active EVs
+            changes; rewards are summed over the simulator steps, and
+            the number of periods stepped is reported in info under the
+            key "periods_stepped".
+        infeasibility_mode (str): How infeasible schedules are handled
+            when stepping the simulation. One of "reject" (the
+            simulation is not stepped), "clip", "scale", or "project"
+            (the schedule is made feasible and the simulation is
+            stepped). See GymTrainedInterface.make_feasible. Reward
+            functions see the agent's original schedule, so constraint
+            violation penalties still apply.
+        step_timer (StepTimer): If not None, the phases of each step
+            (converting the action to a schedule, checking feasibility,
+            stepping the simulator, and computing the observation,
+            reward, done, and info) are timed with this StepTimer.
+        share_init_snapshot (bool): If True, the initial snapshot is
+            shared with the other environments created with the same
+            interface object and share_init_snapshot, rather than
+            copied for this environment. The snapshot is taken when the
+            first such environment is created, so only share it if the
+            interface is not stepped in the meantime, e.g. an interface
+            to a scenario kept for creating environments.
         _interface (GymTrainedInterface): An interface to a simulation to be
             stepped by this environment, or None. If None, an interface must
             be set later.
         _init_snapshot (GymTrainedInterface): A deep copy of the initial
-            interface, used for environment resets.
-        _prev_interface (GymTrainedInterface): A deep copy of the interface
-            at the previous time step; used for calculating action
-            rewards.
-        _action (object): The action taken by the agent in this
-            agent-environment loop iteration.
-        _schedule (Dict[str, List[number]]): Dictionary mapping
-            station ids to a schedule of pilot signals.
-        _observation (np.ndarray): The observation given to the agent in
-            this agent-environment loop iteration.
-        _done (object): An object representing whether or not the
-            execution of the environment is complete.
-        _info (object): An object that gives info about the environment.
+            interface, used for environment resets. It is never
+            modified. See share_init_snapshot.
+        _prev_interface (GymTrainedInterface): The interface at the
+            previous time step; used for calculating action rewards.
+            Since the simulation is stepped in place, this is the live
+            interface after a step or reset.
+        _step_state (_StepState): The state of this agent-environment
+            loop iteration, with slots:
+                action (object): The action taken by the agent.
+                schedule (Dict[str, List[number]]): Dictionary mapping
+                    station ids to a schedule of pilot signals.
+                observation (np.ndarray): The observation given to the
+                    agent.
+                reward (float): The reward given to the agent.
+                done (object): An object representing whether or not
+                    the execution of the environment is complete.
+                info (object): An object that gives info about the
+                    environment.
     """
 
     _interface: Optional[GymTrainedInterface]
     _init_snapshot: GymTrainedInterface
     _prev_interface: GymTrainedInterface
-    _action: Optional[np.ndarray]
-    _schedule: Dict[str, List[float]]
-    _observation: Optional[np.ndarray]
-    _reward: Optional[float]
-    _done: Optional[bool]
-    _info: Optional[Dict[Any, Any]]
-
-    def __init__(self, interface: Optional[GymTrainedInterface]) -> None:
+    _step_state: _StepState
+    # If False, the observation property returns the observation itself
+    # rather than a copy, e.g. for environments reusing observation
+    # buffers.
+    _copy_observation: bool = True
+    fast_forward_idle: bool
+    periods_per_action: int
+    infeasibility_mode: str
+    step_timer: Optional[StepTimer]
+    share_init_snapshot: bool
+
+    def __init__(
+        self,
+        interface: Optional[GymTrainedInterface],
+        fast_forward_idle: bool = False,
+        periods_per_action: int = 1,
+        infeasibility_mode: str = "reject",
+        step_timer: Optional[StepTimer] = None,
+        share_init_snapshot: bool = False,
+    ) -> None:
+        self.share_init_snapshot = share_init_snapshot
         self._interface = interface
-        self._init_snapshot = deepcopy(interface)
-        self._prev_interface = deepcopy(interface)
-        self._action = None
-        self._schedule = {}
-        self._observation = None
-        self._reward = None
-        self._done = None
-        self._info = None
+        self._init_snapshot = self._snapshot(interface)
+        self._prev_interface = interface
+        self._step_state = _StepState()
+        self.fast_forward_idle = fast_forward_idle
+        self.periods_per_action = periods_per_action
+        if infeasibility_mode not in INFEASIBILITY_MODES:
+            raise ValueError(
+                f"Unknown infeasibility mode {infeasibility_mode}. Expected "
+                f"one of {INFEASIBILITY_MODES}."
+            )
+        self.infeasibility_mode = infeasibility_mode
+        self.step_timer = step_timer
 
     @property
     def interface(self) -> GymTrainedInterface:
@@ -81,10 +230,20 @@ class BaseSimEnv(gym.Env):
     @interface.setter
     def interface(self, new_interface: GymTrainedInterface) -> None:
         if self._interface is None:
-            self._init_snapshot = deepcopy(new_interface)
-            self._prev_interface = deepcopy(new_interface)
+            self._init_snapshot = self._snapshot(new_interface)
+            self._prev_interface = new_interface
         self._interface = new_interface
 
+    def _snapshot(
+        self, interface: Optional[GymTrainedInterface]
+    ) -> Optional[GymTrainedInterface]:
+        """ Return an initial snapshot of interface: the shared
+        snapshot if share_init_snapshot, or a new deep copy otherwise.
+        """
+        if self.share_init_snapshot:
+            return _shared_init_snapshot(interface)
+        return deepcopy(interface)
+
     @property
     def prev_interface(self) -> GymTrainedInterface:
         return self._prev_interface
@@ -95,51 +254,53 @@ class BaseSimEnv(gym.Env):
 
     @property
     def action(self) -> np.ndarray:
-        return deepcopy(self._action)
+        return deepcopy(self._step_state.action)
 
     @action.setter
     def action(self, new_action: np.ndarray) -> None:
-        self._action = new_action
+        self._step_state.action = new_action
 
     @property
     def schedule(self) -> Dict[str, List[float]]:
-        return deepcopy(self._schedule)
+        return deepcopy(self._step_state.schedule)
 
     @schedule.setter
     def schedule(self, new_schedule: Dict[str, List[float]]) -> None:
-        self._schedule = new_schedule
+        self._step_state.schedule = new_schedule
 
     @property
     def observation(self) -> np.ndarray:
-        return deepcopy(self._observation)
+        if not self._copy_observation:
+            return self._step_state.observation
+        return deepcopy(self._step_state.observation)
 
     @observation.setter
     def observation(self, new_observation: np.ndarray) -> None:
-        self._observation = new_observation
+        self._step_state.observation = new_observation
 
     @property
     def reward(self) -> float:
-        return deepcopy(self._reward)
+        return deepcopy(self._step_state.reward)
 
     @reward.setter
     def reward(self, new_reward: float) -> None:
-        self._reward = new_reward
+        self._step_state.reward = new_reward
 
     @property
     def done(self) -> bool:
-        return deepcopy(self._done)
+        return deepcopy(self._step_state.done)
 
     @done.setter
     def done(self, new_done: bool) -> None:
-        self._done = new_done
+        self._step_state.done = new_done
 
     @property
     def info(self) -> Dict[Any, Any]:
-        return deepcopy(self._info)
+        return deepcopy(self._step_state.info)
 
     @info.setter
     def info(self, new_info: Dict[Any, Any]) -> None:
-        self._info = new_info
+        self._step_state.info = new_info
 
     def update_state(self) -> None:
         """ Update the state of the environment. Namely, the
@@ -156,10 +317,14 @@ class BaseSimEnv(gym.Env):
                 "use sim.run() to progress the environment or set a "
                 "new interface."
             )
-        self.observation = self.observation_from_state()
-        self.reward = self.reward_from_state()
-        self.done = self.done_from_state()
-        self.info = self.info_from_state()
+        with _timed(self.step_timer, "observation"):
+            self.observation = self.observation_from_state()
+        with _timed(self.step_timer, "reward"):
+            self.reward = self.reward_from_state()
+        with _timed(self.step_timer, "done"):
+            self.done = self.done_from_state()
+        with _timed(self.step_timer, "info"):
+            self.info = self.info_from_state()
 
     def store_previous_state(self) -> None:
         """ Store the previous state of the simulation in the
@@ -170,6 +335,20 @@ class BaseSimEnv(gym.Env):
         """
         self._prev_interface = self.interface
 
+    def skip_idle_periods(self) -> int:
+        """ If fast_forward_idle is set and the interface is a
+        GymTrainingInterface, advance the simulation through any idle
+        periods. See GymTrainingInterface.fast_forward.
+
+        Returns:
+            int: The number of periods skipped.
+        """
+        if not self.fast_forward_idle or not isinstance(
+            self._interface, GymTrainingInterface
+        ):
+            return 0
+        return self._interface.fast_forward()
+
     def step(
         self, action: np.ndarray
     ) -> Tuple[np.ndarray, float, bool, Dict[Any, Any]]:
@@ -200,17 +379,116 @@ class BaseSimEnv(gym.Env):
                 "use sim.run() to progress the environment or set a "
                 "new interface."
             )
-        self.action = action
-        self.schedule = self.action_to_schedule()
-
+        with _timed(self.step_timer, "step"):
+            self.action = action
+            with _timed(self.step_timer, "action_to_schedule"):
+                self.schedule = self.action_to_schedule()
+            if self.periods_per_action > 1:
+                step_result = self._multi_period_step()
+            else:
+                step_result = self._single_period_step()
+        if self.step_timer is not None:
+            self.step_timer.end_step()
+        return step_result
+
+    def _single_period_step(
+        self,
+    ) -> Tuple[np.ndarray, float, bool, Dict[Any, Any]]:
+        """ Step the simulation one period using the current action and
+        schedule. See step().
+        """
         self.store_previous_state()
-        self._interface.step(self.schedule)
+        self._interface.step(
+            self.schedule,
+            infeasibility_mode=self.infeasibility_mode,
+            step_timer=self.step_timer,
+        )
+        idle_periods_skipped: int = self.skip_idle_periods()
 
         self.update_state()
+        if self.fast_forward_idle:
+            self._step_state.info["idle_periods_skipped"] = idle_periods_skipped
 
         return self.observation, self.reward, self.done, self.info
 
-    def reset(self) -> Dict[str, np.ndarray]:
+    def _multi_period_step(
+        self,
+    ) -> Tuple[np.ndarray, float, bool, Dict[Any, Any]]:
+        """ Step the simulation up to periods_per_action periods using
+        the current (multi-period) action and schedule. See step().
+
+        Each simulator step is given the whole remaining schedule and
+        covers up to the Simulator's max_recompute periods, fewer if an
+        event requires a new schedule. If max_recompute is at least
+        periods_per_action and no event occurs, one simulator step
+        covers the whole action. Otherwise (e.g. with the common
+        training setting max_recompute=1, which is fixed when the
+        Simulator is built) the simulator is stepped again with the
+        rest of the schedule, so that the action still spans
+        periods_per_action periods.
+
+        Rewards are computed after every simulator step and summed, as
+        the builtin reward functions only see the state after the last
+        step; computing a single reward after all periods would drop
+        the rewards of the earlier periods. While stepping, the action
+        and schedule attributes hold only the period being applied, so
+        that reward functions see each period once.
+        """
+        action: np.ndarray = self._step_state.action
+        schedule: Dict[str, List[float]] = self._step_state.schedule
+        schedule_length: int = (
+            len(next(iter(schedule.values()))) if len(schedule) > 0 else 1
+        )
+        horizon: int = max(1, min(self.periods_per_action, schedule_length))
+        start_time: int = self._interface.current_time
+        active_station_ids: List[str] = self._interface.active_station_ids
+        accumulated_reward: float = 0
+        periods_stepped: int = 0
+        while True:
+            self._step_state.action = (
+                action[:, periods_stepped : periods_stepped + 1]
+                if len(action.shape) > 1
+                else action
+            )
+            self._step_state.schedule = {
+                station_id: pilots[periods_stepped : periods_stepped + 1]
+                for station_id, pilots in schedule.items()
+            }
+            self.store_previous_state()
+            self._interface.step(
+                {
+                    station_id: pilots[periods_stepped:]
+                    for station_id, pilots in schedule.items()
+                },
+                infeasibility_mode=self.infeasibility_mode,
+                step_timer=self.step_timer,
+            )
+            previous_periods_stepped: int = periods_stepped
+            periods_stepped = self._interface.current_time - start_time
+            if (
+                self._interface.is_done
+                or periods_stepped >= horizon
+                or periods_stepped == previous_periods_stepped
+                or self._interface.active_station_ids != active_station_ids
+            ):
+                break
+            with _timed(self.step_timer, "reward"):
+                accumulated_reward += self.reward_from_state()
+        idle_periods_skipped: int = self.skip_idle_periods()
+
+        self.update_state()
+        self._step_state.reward += accumulated_reward
+        self._step_state.info["periods_stepped"] = periods_stepped
+        if self.fast_forward_idle:
+            self._step_state.info["idle_periods_skipped"] = idle_periods_skipped
+        self._step_state.action = action
+        self._step_state.schedule = schedule
+
+        return self.observation, self.reward, self.done, self.info
+
+    def reset(
+        self, return_info: bool = False
+    ) -> Union[Dict[str, np.ndarray], Tuple[Dict[str, np.ndarray], Dict[Any, Any]]]:
         """ Resets the state of the simulation and returns an initial
         observation. Resetting is done by setting the interface to the
         simulation to an interface to the simulation in its initial
@@ -218,17 +496,63 @@ class BaseSimEnv(gym.Env):
 
         Implements gym.Env.reset()
 
+        Args:
+            return_info (bool): If True, the info given by
+                reset_info_from_state is returned with the observation.
+
         Returns:
-            observation (np.ndarray): the initial observation.
+            observation (np.ndarray): the initial observation, and, if
+                return_info, the reset info.
         """
         self.interface = deepcopy(self._init_snapshot)
-        self._prev_interface = deepcopy(self._init_snapshot)
-        return self.observation_from_state()
+        self._prev_interface = self._interface
+        self.skip_idle_periods()
+        self.observation = self.observation_from_state()
+        if return_info:
+            return self.observation, self.reset_info_from_state()
+        return self.observation
 
     def render(self, mode="human"):
         """ Renders the environment. Implements gym.Env.render(). """
         raise NotImplementedError
 
+    def memory_report(self) -> Dict[str, Any]:
+        """ Return the memory used by this environment's simulation
+        state. Each object is counted once, under the first component
+        (in the order below) referencing it.
+
+        Returns:
+            Dict[str, Any]: Dict with keys:
+                interface (int): Bytes of the live interface, including
+                    its Simulator, network, and event queue.
+                prev_interface (int): Bytes of the previous interface
+                    not shared with the live interface.
+                init_snapshot (int): Bytes of the initial snapshot.
+                init_snapshot_shared (bool): True if the initial
+                    snapshot is shared by the environments created with
+                    the same interface.
+                step_state (int): Bytes of the action, schedule,
+                    observation, reward, done, and info.
+                total (int): Bytes used by this environment, i.e. the
+                    sum of the above, excluding a shared initial
+                    snapshot.
+        """
+        seen: Set[int] = {id(self)}
+        report: Dict[str, Any] = {
+            "interface": _deep_getsizeof(self._interface, seen),
+            "prev_interface": _deep_getsizeof(self._prev_interface, seen),
+            "init_snapshot": _deep_getsizeof(self._init_snapshot, seen),
+            "init_snapshot_shared": self._init_snapshot in _all_shared_init_snapshots,
+            "step_state": _deep_getsizeof(self._step_state, seen),
+        }
+        report["total"] = (
+            report["interface"]
+            + report["prev_interface"]
+            + report["step_state"]
+            + (0 if report["init_snapshot_shared"] else report["init_snapshot"])
+        )
+        return report
+
     def action_to_schedule(self) -> Dict[str, List[float]]:
         """ Convert an agent action to a schedule to be input to the
         simulator.
@@ -275,3 +599,15 @@ class BaseSimEnv(gym.Env):
             info (dict): dict of environment information
         """
         raise NotImplementedError
+
+    def reset_info_from_state(self) -> Dict[Any, Any]:
+        """ Give information about the environment returned by reset
+        when return_info is True. Unlike info_from_state, this is only
+        computed at reset, so it suits information that does not change
+        within an episode.
+
+        Returns:
+            info (dict): dict of environment information. Empty by
+                default.
+        """
+        return {}
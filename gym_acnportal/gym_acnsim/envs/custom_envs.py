@@ -3,17 +3,116 @@
 This package contains customizable gym environments that wrap
 simulations.
 """
+import inspect
+import weakref
+from collections.abc import Mapping
 from copy import deepcopy
-from typing import Optional, Dict, List, Callable, Any
+from typing import (
+    Optional,
+    Dict,
+    List,
+    Callable,
+    Any,
+    Union,
+    Tuple,
+    FrozenSet,
+    Iterable,
+    Iterator,
+)
 
 import numpy as np
 from gym import spaces
 
 from .base_env import BaseSimEnv
 from . import observation as obs, reward_functions as rf
-from .action_spaces import SimAction, zero_centered_single_charging_schedule
+from .action_spaces import (
+    SimAction,
+    zero_centered_single_charging_schedule,
+    zero_centered_charging_schedule,
+)
+from .dtypes import DtypePolicy
+from .normalization import RunningMeanStd
 from .observation import SimObservation
 from ..interfaces import GymTrainedInterface
+from ..timing import StepTimer, _timed
+
+
+class LazyObservation(Mapping):
+    """ Observation of a CustomSimEnv with lazy_observations, mapping
+    the name of each observation object to its observation. Each
+    observation is computed on first access and cached, so observations
+    a policy never reads are never computed.
+
+    A LazyObservation is only valid for the step for which it was
+    returned: the simulation advances in place, so accessing an
+    observation that was not computed before the environment's next
+    observation raises a RuntimeError. Use materialize to compute all
+    observations at once, e.g. to keep them or where a dict is
+    required. Deep copies of a LazyObservation are materialized.
+    """
+
+    __slots__ = ("_env", "_generation", "_observations")
+
+    _env: "weakref.ReferenceType[CustomSimEnv]"
+    _generation: int
+    _observations: Dict[str, Any]
+
+    def __init__(self, env: "CustomSimEnv", generation: int) -> None:
+        # The environment is weakly referenced so that the observation
+        # stored in the environment's step state does not form a cycle.
+        self._env = weakref.ref(env)
+        self._generation = generation
+        self._observations = {}
+
+    def __getitem__(self, name: str) -> Any:
+        observation: Any = self._observations.get(name)
+        if observation is not None:
+            return observation
+        env: Optional[CustomSimEnv] = self._env()
+        if env is None or name not in env._observation_objects_by_name:
+            raise KeyError(name)
+        if env._observation_generation != self._generation:
+            raise RuntimeError(
+                f"Observation {name} was not computed before the environment "
+                "advanced. Call materialize to keep all observations of a step."
+            )
+        observation = env._compute_observation(env._observation_objects_by_name[name])
+        self._observations[name] = observation
+        return observation
+
+    def __iter__(self) -> Iterator[str]:
+        env: Optional[CustomSimEnv] = self._env()
+        if env is None:
+            return iter(self._observations)
+        return iter(env._observation_objects_by_name)
+
+    def __len__(self) -> int:
+        env: Optional[CustomSimEnv] = self._env()
+        if env is None:
+            return len(self._observations)
+        return len(env._observation_objects_by_name)
+
+    def __repr__(self) -> str:
+        return f"LazyObservation(computed={list(self._observations)})"
+
+    def __deepcopy__(self, memodict: Optional[Dict] = None) -> Dict[str, Any]:
+        # A copy must not depend on the environment advancing, so it is
+        # a dict of copies of all observations.
+        return deepcopy(self.materialize(), memodict)
+
+    @property
+    def computed_keys(self) -> List[str]:
+        """ Return the names of the observations computed so far. """
+        return list(self._observations)
+
+    def materialize(self) -> Dict[str, Any]:
+        """ Compute any observations not yet computed.
+
+        Returns:
+            Dict[str, Any]: Dict mapping the name of each observation
+                object to its observation.
+        """
+        return {name: self[name] for name in self}
 
 
 class CustomSimEnv(BaseSimEnv):
@@ -37,10 +136,40 @@ class CustomSimEnv(BaseSimEnv):
     """
 
     observation_objects: List[SimObservation]
-    observation_space: spaces.Dict
+    observation_space: Union[spaces.Dict, spaces.Box]
     action_object: SimAction
     action_space: spaces.Space
     reward_functions: List[Callable[[BaseSimEnv], float]]
+    flatten_observations: bool
+    reuse_observation_buffers: bool
+    dtype_policy: Optional[DtypePolicy]
+    static_observations: FrozenSet[str]
+    static_observation_space: spaces.Dict
+    static_observation: Dict[str, np.ndarray]
+    lazy_observations: bool
+    consumed_keys: Optional[FrozenSet[str]]
+    cache_spaces: bool
+    normalize_observations: bool
+    normalize_reward: bool
+    normalization_clip: Optional[float]
+    reward_discount: float
+    observation_rms: Optional[RunningMeanStd]
+    reward_rms: Optional[RunningMeanStd]
+    observation_slices: Dict[str, slice]
+    observation_shapes: Dict[str, Tuple[int, ...]]
+    _observation_buffer: Optional[np.ndarray]
+    _observation_buffers: Dict[str, np.ndarray]
+    _observation_dtypes: Dict[str, np.dtype]
+    _dynamic_observation_objects: List[SimObservation]
+    _observation_objects_by_name: Dict[str, SimObservation]
+    _observation_generation: int
+    _static_observation_objects: List[SimObservation]
+    _space_signature: Optional[Tuple[Any, ...]]
+    _discounted_return: float
+    # True while the observation of an agent transition (a step or
+    # reset) is computed; only such observations are added to
+    # observation_rms.
+    _observation_transition: bool = False
 
     def __init__(
         self,
@@ -48,6 +177,22 @@ class CustomSimEnv(BaseSimEnv):
         observation_objects: List[SimObservation],
         action_object: SimAction,
         reward_functions: List[Callable[[BaseSimEnv], float]],
+        fast_forward_idle: bool = False,
+        periods_per_action: int = 1,
+        infeasibility_mode: str = "reject",
+        step_timer: Optional[StepTimer] = None,
+        flatten_observations: bool = False,
+        reuse_observation_buffers: bool = False,
+        dtype_policy: Optional[DtypePolicy] = None,
+        static_observations: Iterable[str] = (),
+        lazy_observations: bool = False,
+        consumed_keys: Optional[Iterable[str]] = None,
+        cache_spaces: bool = True,
+        normalize_observations: bool = False,
+        normalize_reward: bool = False,
+        normalization_clip: Optional[float] = 10.0,
+        reward_discount: float = 0.99,
+        share_init_snapshot: bool = False,
     ) -> None:
         """ Initialize this environment. Every CustomSimEnv needs a list
         of SimObservation objects, action space functions, and reward
@@ -64,22 +209,157 @@ class CustomSimEnv(BaseSimEnv):
             reward_functions (List[Callable[[BaseSimEnv], float]]): List
                 of functions which take as input a BaseSimEnv instance
                 and return a number.
+            fast_forward_idle (bool): See BaseSimEnv.
+            periods_per_action (int): See BaseSimEnv. Use with a
+                multi-period action object such as charging_schedule.
+            infeasibility_mode (str): See BaseSimEnv.
+            step_timer (StepTimer): See BaseSimEnv. Each observation
+                object and reward function is additionally timed as the
+                phase "observation.<name>" or "reward.<name>".
+            flatten_observations (bool): If True, the observation space
+                is a single float32 Box (or a Box of the dtype policy's
+                float_dtype), and each observation object
+                writes its observation, flattened, into its slice
+                (observation_slices[name]) of a preallocated buffer,
+                in the order of observation_objects. Every observation
+                space must be a Box. Use unflatten_observation to
+                recover the observation of each object.
+            reuse_observation_buffers (bool): If True, each observation
+                object writes its observation into a buffer kept by the
+                environment for its name (see SimObservation.get_obs),
+                and observations returned by step, reset, and the
+                observation property are these buffers rather than
+                copies, so they are overwritten by the next step. Copy
+                observations that need to be kept. Observations are
+                always written into buffers if flattened.
+            dtype_policy (DtypePolicy): If given, the Box spaces of the
+                observation and action objects are recast to the dtypes
+                of the policy, and observations are cast to the dtypes
+                of their spaces (buffers are allocated with them). If
+                None, spaces and observations keep the dtypes given by
+                their objects.
+            static_observations (Iterable[str]): Names of observation
+                objects whose observations do not change within an
+                episode, e.g. constraint_matrix_coo_observation. These
+                are left out of the observation space and of the
+                observations returned by step; instead, they are
+                computed once per interface (i.e. at initialization and
+                reset) into static_observation, whose space is
+                static_observation_space, and returned in the info of
+                reset(return_info=True) under "static_observation".
+            lazy_observations (bool): If True, observations returned by
+                step, reset, and the observation property are
+                LazyObservation mappings, which compute each
+                observation on first access, so that observations the
+                policy does not read are not computed. Observations are
+                not copied. Cannot be used with flatten_observations.
+            consumed_keys (Iterable[str]): If given, the names of the
+                observation objects the policy consumes. Other
+                observation objects are left out of the observation
+                space and never computed.
+            cache_spaces (bool): If True, the observation and action
+                spaces (and observation buffers) are only rebuilt when
+                the interface is set to one whose network_signature
+                differs from that of the interface the spaces were
+                built for, e.g. not on resets over a fixed network.
+                Set to False if the spaces of the observation or action
+                objects depend on more than the network signature, or
+                after changing the objects of the environment.
+            normalize_observations (bool): If True, each flat
+                observation is standardized in place in the flat
+                observation buffer by the running statistics
+                observation_rms, so observations (including those
+                recovered by unflatten_observation) are normalized.
+                The observation of each agent transition (computed by
+                update_state, e.g. in step, or by reset) is added to
+                the statistics first; other calls to
+                observation_from_state do not change them. The
+                observation space is then unbounded, or bounded by
+                normalization_clip. Requires flatten_observations.
+                Statistics are kept while the size of the flat
+                observation is unchanged. See set_normalization_state
+                to load the statistics of another environment.
+            normalize_reward (bool): If True, the reward returned by
+                each step is divided by the standard deviation of the
+                discounted return, whose running statistics are kept in
+                reward_rms. The rewards of the periods of a
+                multi-period action are summed before normalization.
+                The discounted return restarts whenever the interface
+                is set, e.g. at reset.
+            normalization_clip (float): If given, normalized
+                observations and rewards are clipped to
+                [-normalization_clip, normalization_clip].
+            reward_discount (float): Discount of the return by which
+                rewards are normalized.
+            share_init_snapshot (bool): See BaseSimEnv.
         """
-        super().__init__(interface)
+        super().__init__(
+            interface,
+            fast_forward_idle=fast_forward_idle,
+            periods_per_action=periods_per_action,
+            infeasibility_mode=infeasibility_mode,
+            step_timer=step_timer,
+            share_init_snapshot=share_init_snapshot,
+        )
 
         self.observation_objects = observation_objects
         self.action_object = action_object
         self.reward_functions = reward_functions
+        self.flatten_observations = flatten_observations
+        self.reuse_observation_buffers = reuse_observation_buffers
+        self._copy_observation = not reuse_observation_buffers
+        self.dtype_policy = dtype_policy
+        self.static_observations = frozenset(static_observations)
+        self.lazy_observations = lazy_observations
+        self.consumed_keys = (
+            frozenset(consumed_keys) if consumed_keys is not None else None
+        )
+        if lazy_observations and flatten_observations:
+            raise ValueError(
+                "Lazy observations cannot be used with flattened observations."
+            )
+        if lazy_observations:
+            self._copy_observation = False
+        if normalize_observations and not flatten_observations:
+            raise ValueError(
+                "Observation normalization requires flattened observations."
+            )
+        self.normalize_observations = normalize_observations
+        self.normalize_reward = normalize_reward
+        self.normalization_clip = normalization_clip
+        self.reward_discount = reward_discount
+        self.observation_rms = None
+        self.reward_rms = RunningMeanStd() if normalize_reward else None
+        self._discounted_return = 0.0
+        names: FrozenSet[str] = frozenset(
+            observation_object.name for observation_object in observation_objects
+        )
+        for argument, argument_names in (
+            ("Static observations", self.static_observations),
+            ("Consumed keys", self.consumed_keys or frozenset()),
+        ):
+            unknown_names: FrozenSet[str] = argument_names - names
+            if unknown_names:
+                raise ValueError(
+                    f"{argument} {sorted(unknown_names)} are not the names of "
+                    "observation objects."
+                )
+        self.static_observation_space = spaces.Dict({})
+        self.static_observation = {}
+        self._dynamic_observation_objects = observation_objects
+        self._observation_objects_by_name = {}
+        self._observation_generation = 0
+        self._static_observation_objects = []
+        self.cache_spaces = cache_spaces
+        self._space_signature = None
+        self.observation_slices = {}
+        self.observation_shapes = {}
+        self._observation_buffer = None
+        self._observation_buffers = {}
+        self._observation_dtypes = {}
         if interface is None:
             return
-        self.observation_space = spaces.Dict(
-            {
-                observation_object.name: observation_object.get_space(self.interface)
-                for observation_object in observation_objects
-            }
-        )
-
-        self.action_space = action_object.get_space(interface)
+        self._set_spaces(interface)
 
     @property
     def interface(self) -> GymTrainedInterface:
@@ -94,17 +374,199 @@ class CustomSimEnv(BaseSimEnv):
     @interface.setter
     def interface(self, new_interface: GymTrainedInterface) -> None:
         if self._interface is None:
-            self._init_snapshot = deepcopy(new_interface)
-            self._prev_interface = deepcopy(new_interface)
+            self._init_snapshot = self._snapshot(new_interface)
+            self._prev_interface = new_interface
         self._interface = new_interface
-        self.observation_space = spaces.Dict(
-            {
-                observation_object.name: observation_object.get_space(new_interface)
+        self._discounted_return = 0.0
+        self._set_spaces(new_interface)
+
+    def _set_spaces(self, interface: GymTrainedInterface) -> None:
+        """ Set the observation and action spaces for interface, unless
+        spaces are cached and were built for an interface with the same
+        network signature. Static observations are computed in either
+        case.
+        """
+        signature: Optional[Tuple[Any, ...]] = (
+            _network_signature(interface) if self.cache_spaces else None
+        )
+        if signature is not None and signature == self._space_signature:
+            if self._static_observation_objects:
+                self._compute_static_observation(interface)
+            return
+        self._set_observation_space(interface)
+        self._set_action_space(interface)
+        self._space_signature = signature
+
+    def _set_observation_space(self, interface: GymTrainedInterface) -> None:
+        """ Set the observation space from the spaces of the observation
+        objects, and allocate the observation buffers if observations
+        are flattened or buffers are reused. If observations are
+        flattened, the buffer of each observation object is a view of
+        its slice of the flat observation buffer.
+
+        If the environment has a dtype policy, the spaces are recast by
+        the policy, and the dtype of each recast space is recorded in
+        _observation_dtypes so that observations can be cast to it.
+
+        Static observations are left out of the observation space, and
+        are computed here, as the spaces and static observations are
+        set together whenever the interface is. Observations not in
+        consumed_keys are left out entirely.
+        """
+        observation_objects: List[SimObservation] = (
+            self.observation_objects
+            if self.consumed_keys is None
+            else [
+                observation_object
                 for observation_object in self.observation_objects
-            }
+                if observation_object.name in self.consumed_keys
+            ]
         )
+        observation_spaces: Dict[str, spaces.Space] = {
+            observation_object.name: observation_object.get_space(interface)
+            for observation_object in observation_objects
+        }
+        self._observation_dtypes = {}
+        if self.dtype_policy is not None:
+            for name, space in observation_spaces.items():
+                cast: spaces.Space = self.dtype_policy.observation_space(name, space)
+                if cast is not space:
+                    observation_spaces[name] = cast
+                    self._observation_dtypes[name] = cast.dtype
+        if self.static_observations:
+            self._set_static_observation(
+                interface, observation_objects, observation_spaces
+            )
+        else:
+            self._dynamic_observation_objects = observation_objects
+        self._observation_objects_by_name = {
+            observation_object.name: observation_object
+            for observation_object in self._dynamic_observation_objects
+        }
+        if not self.flatten_observations:
+            self.observation_space = spaces.Dict(observation_spaces)
+            if self.reuse_observation_buffers:
+                self._observation_buffers = {
+                    name: np.zeros(space.shape, dtype=space.dtype)
+                    for name, space in observation_spaces.items()
+                }
+            return
+
+        # Rebuilt spaces may leave out observations (e.g. after a change
+        # of consumed_keys), so slices are not carried over.
+        self.observation_slices = {}
+        self.observation_shapes = {}
+        lows: List[np.ndarray] = []
+        highs: List[np.ndarray] = []
+        offset: int = 0
+        for name, space in observation_spaces.items():
+            if not isinstance(space, spaces.Box):
+                raise TypeError(
+                    f"Flattened observations require Box observation spaces. "
+                    f"The space of observation {name} is a {type(space)}."
+                )
+            size: int = int(np.prod(space.shape))
+            self.observation_slices[name] = slice(offset, offset + size)
+            self.observation_shapes[name] = space.shape
+            lows.append(np.broadcast_to(space.low, space.shape).ravel())
+            highs.append(np.broadcast_to(space.high, space.shape).ravel())
+            offset += size
+        dtype: np.dtype = (
+            np.dtype(np.float32)
+            if self.dtype_policy is None
+            else self.dtype_policy.float_dtype
+        )
+        if self.normalize_observations:
+            bound: float = (
+                self.normalization_clip
+                if self.normalization_clip is not None
+                else np.inf
+            )
+            lows, highs = [np.full(offset, -bound)], [np.full(offset, bound)]
+            if self.observation_rms is None or self.observation_rms.shape != (
+                offset,
+            ):
+                self.observation_rms = RunningMeanStd((offset,))
+        self.observation_space = spaces.Box(
+            low=np.concatenate(lows).astype(dtype),
+            high=np.concatenate(highs).astype(dtype),
+            dtype=dtype,
+        )
+        self._observation_buffer = np.zeros(offset, dtype=dtype)
+        self._observation_buffers = {
+            name: self._observation_buffer[observation_slice].reshape(
+                self.observation_shapes[name]
+            )
+            for name, observation_slice in self.observation_slices.items()
+        }
+
+    def _set_static_observation(
+        self,
+        interface: GymTrainedInterface,
+        observation_objects: List[SimObservation],
+        observation_spaces: Dict[str, spaces.Space],
+    ) -> None:
+        """ Move the spaces of static observations from
+        observation_spaces to static_observation_space, and compute the
+        static observations.
+        """
+        static_spaces: Dict[str, spaces.Space] = {}
+        self._dynamic_observation_objects = []
+        self._static_observation_objects = []
+        for observation_object in observation_objects:
+            name: str = observation_object.name
+            if name not in self.static_observations:
+                self._dynamic_observation_objects.append(observation_object)
+                continue
+            self._static_observation_objects.append(observation_object)
+            static_spaces[name] = observation_spaces.pop(name)
+            self._observation_dtypes.pop(name, None)
+        self.static_observation_space = spaces.Dict(static_spaces)
+        self._compute_static_observation(interface)
+
+    def _compute_static_observation(self, interface: GymTrainedInterface) -> None:
+        """ Compute the static observations, cast to the dtypes of their
+        spaces.
+        """
+        self.static_observation = {
+            observation_object.name: np.asarray(
+                observation_object.get_obs(interface),
+                dtype=self.static_observation_space[observation_object.name].dtype,
+            )
+            for observation_object in self._static_observation_objects
+        }
+
+    def _set_action_space(self, interface: GymTrainedInterface) -> None:
+        """ Set the action space from the space of the action object,
+        recast by the dtype policy if the environment has one.
+        """
+        action_space: spaces.Space = self.action_object.get_space(interface)
+        if self.dtype_policy is not None:
+            action_space = self.dtype_policy.action_space(action_space)
+        self.action_space = action_space
+
+    def unflatten_observation(self, observation: np.ndarray) -> Dict[str, np.ndarray]:
+        """ Split a flattened observation into the observation of each
+        observation object. See flatten_observations.
+
+        Args:
+            observation (np.ndarray): Flattened observation, or a batch
+                of flattened observations (of shape (batch size,
+                observation size)).
 
-        self.action_space = self.action_object.get_space(new_interface)
+        Returns:
+            Dict[str, np.ndarray]: Dict mapping the name of each
+                observation object to its observation (views of
+                observation, with the shape of the object's space, or
+                with a leading batch dimension).
+        """
+        batch_shape: Tuple[int, ...] = observation.shape[:-1]
+        return {
+            name: observation[..., observation_slice].reshape(
+                batch_shape + self.observation_shapes[name]
+            )
+            for name, observation_slice in self.observation_slices.items()
+        }
 
     def render(self, mode="human"):
         """ Renders the environment. Implements gym.Env.render(). """
@@ -120,30 +582,257 @@ class CustomSimEnv(BaseSimEnv):
         """
         return self.action_object.get_schedule(self.interface, self.action)
 
-    def observation_from_state(self) -> Dict[str, np.ndarray]:
+    def observation_from_state(self) -> Union[Dict[str, np.ndarray], np.ndarray]:
         """ Construct an environment observation from the state of the
         simulator using the environment's observation construction
         functions.
 
+        If observations are flattened, each observation is written into
+        its slice of the flat observation buffer, which is returned. If
+        observation buffers are reused, each observation is written into
+        its buffer, and a dict of the buffers is returned. Buffers are
+        overwritten by subsequent calls. If observations are lazy, a
+        LazyObservation is returned, and observations are computed when
+        accessed.
+
         Returns:
-            observation (Dict[str, np.ndarray]): An environment
-                observation generated from the simulation state
+            observation (Union[Dict[str, np.ndarray], np.ndarray]): An
+                environment observation generated from the simulation
+                state
         """
-        return {
-            observation_object.name: observation_object.get_obs(self.interface)
-            for observation_object in self.observation_objects
-        }
+        if self.lazy_observations:
+            self._observation_generation += 1
+            return LazyObservation(self, self._observation_generation)
+        if self._observation_buffers:
+            self._write_observation_buffers()
+            if self.flatten_observations:
+                if self.observation_rms is not None:
+                    if self._observation_transition:
+                        self.observation_rms.update(self._observation_buffer)
+                    self.observation_rms.normalize(
+                        self._observation_buffer,
+                        out=self._observation_buffer,
+                        clip=self.normalization_clip,
+                    )
+                return self._observation_buffer
+            return dict(self._observation_buffers)
+        observation: Dict[str, np.ndarray]
+        if self.step_timer is None or not self.step_timer.enabled:
+            observation = {
+                observation_object.name: observation_object.get_obs(self.interface)
+                for observation_object in self._dynamic_observation_objects
+            }
+        else:
+            observation = {}
+            for observation_object in self._dynamic_observation_objects:
+                with self.step_timer.time(f"observation.{observation_object.name}"):
+                    observation[observation_object.name] = observation_object.get_obs(
+                        self.interface
+                    )
+        for name, dtype in self._observation_dtypes.items():
+            observation[name] = np.asarray(observation[name], dtype=dtype)
+        return observation
+
+    def _compute_observation(self, observation_object: SimObservation) -> Any:
+        """ Compute the observation of one observation object, writing
+        it into its buffer if buffers are reused. See LazyObservation.
+        """
+        name: str = observation_object.name
+        out: Optional[np.ndarray] = self._observation_buffers.get(name)
+        with _timed(self.step_timer, f"observation.{name}"):
+            observation: Any = observation_object.get_obs(self.interface, out=out)
+        if out is None and name in self._observation_dtypes:
+            observation = np.asarray(observation, dtype=self._observation_dtypes[name])
+        return observation
+
+    def _write_observation_buffers(self) -> None:
+        """ Write each observation into its observation buffer. See
+        observation_from_state.
+        """
+        step_timer: Optional[StepTimer] = (
+            self.step_timer
+            if self.step_timer is not None and self.step_timer.enabled
+            else None
+        )
+        for observation_object in self._dynamic_observation_objects:
+            out: np.ndarray = self._observation_buffers[observation_object.name]
+            if step_timer is None:
+                observation_object.get_obs(self.interface, out=out)
+                continue
+            with step_timer.time(f"observation.{observation_object.name}"):
+                observation_object.get_obs(self.interface, out=out)
+
+    def update_state(self) -> None:
+        """ Update the state of the environment. See
+        BaseSimEnv.update_state. The observation is that of an agent
+        transition, so it is added to observation_rms if observations
+        are normalized.
+        """
+        self._observation_transition = True
+        try:
+            super().update_state()
+        finally:
+            self._observation_transition = False
+
+    def reset(
+        self, return_info: bool = False
+    ) -> Union[Dict[str, np.ndarray], Tuple[Dict[str, np.ndarray], Dict[Any, Any]]]:
+        """ Resets the state of the simulation and returns an initial
+        observation, which is added to observation_rms if observations
+        are normalized. See BaseSimEnv.reset.
+        """
+        self._observation_transition = True
+        try:
+            return super().reset(return_info=return_info)
+        finally:
+            self._observation_transition = False
+
+    def step(
+        self, action: np.ndarray
+    ) -> Tuple[Union[Dict[str, np.ndarray], np.ndarray], float, bool, Dict[Any, Any]]:
+        """ Step the simulation with an agent's action. See
+        BaseSimEnv.step.
+
+        If normalize_reward, the reward of the step is normalized once,
+        after it is summed over the periods of a multi-period action,
+        so that the statistics and the discount advance once per agent
+        transition.
+        """
+        observation, reward, done, info = super().step(action)
+        if self.reward_rms is not None:
+            reward = self._normalize_reward(reward)
+            self._step_state.reward = reward
+        return observation, reward, done, info
 
     def reward_from_state(self) -> float:
-        """ Calculate a reward from the state of the simulator
+        """ Calculate a reward from the state of the simulator. The
+        reward is not normalized; see step.
 
         Returns:
             reward (float): a reward generated from the simulation
                 state
         """
-        return sum(
-            np.array([reward_func(self) for reward_func in self.reward_functions])
+        return self._sum_rewards()
+
+    def _sum_rewards(self) -> float:
+        """ Return the sum of the reward functions. """
+        if self.step_timer is None or not self.step_timer.enabled:
+            return sum(
+                np.array([reward_func(self) for reward_func in self.reward_functions])
+            )
+        rewards: List[float] = []
+        for reward_func in self.reward_functions:
+            with self.step_timer.time(
+                f"reward.{getattr(reward_func, '__name__', type(reward_func).__name__)}"
+            ):
+                rewards.append(reward_func(self))
+        return sum(np.array(rewards))
+
+    def _normalize_reward(self, reward: float) -> float:
+        """ Add reward to the discounted return, add the return to
+        reward_rms, and return reward divided by the return's standard
+        deviation. See normalize_reward.
+        """
+        self._discounted_return = (
+            self._discounted_return * self.reward_discount + reward
         )
+        self.reward_rms.update(self._discounted_return)
+        reward = float(reward / self.reward_rms.std)
+        if self.normalization_clip is not None:
+            reward = min(max(reward, -self.normalization_clip), self.normalization_clip)
+        return reward
+
+    def freeze_normalization(self, frozen: bool = True) -> None:
+        """ Freeze (or unfreeze) the running normalization statistics,
+        so that observations and rewards are normalized without updating
+        them, e.g. when deploying or evaluating a trained policy.
+
+        Args:
+            frozen (bool): If True, freeze the statistics; if False,
+                resume updating them.
+
+        Returns:
+            None
+        """
+        for rms in (self.observation_rms, self.reward_rms):
+            if rms is not None:
+                rms.frozen = frozen
+
+    def normalization_state(self) -> Dict[str, Optional[RunningMeanStd]]:
+        """ Return copies of the running normalization statistics, e.g.
+        to deploy a trained policy with the statistics of its training
+        environment (see set_normalization_state and
+        GymTrainedAlgorithm).
+
+        Returns:
+            Dict[str, Optional[RunningMeanStd]]: Dict mapping
+                "observation_rms" and "reward_rms" to copies of the
+                statistics (None if not normalized).
+        """
+        return {
+            "observation_rms": deepcopy(self.observation_rms),
+            "reward_rms": deepcopy(self.reward_rms),
+        }
+
+    def set_normalization_state(
+        self,
+        observation_rms: Optional[RunningMeanStd] = None,
+        reward_rms: Optional[RunningMeanStd] = None,
+    ) -> None:
+        """ Load running normalization statistics, e.g. those returned
+        by normalization_state of the environment a policy was trained
+        in. Copies of the given statistics replace the environment's,
+        keeping whether the environment's statistics are frozen.
+
+        Args:
+            observation_rms (RunningMeanStd): If given, statistics of
+                flat observations of the size of this environment's.
+                Requires normalize_observations.
+            reward_rms (RunningMeanStd): If given, statistics of
+                discounted returns. Requires normalize_reward.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If statistics are given for observations or
+                rewards that are not normalized, or if the shape of
+                observation_rms does not match the flat observation.
+        """
+        if observation_rms is not None:
+            if not self.normalize_observations:
+                raise ValueError(
+                    "Cannot load observation statistics into an environment "
+                    "without normalize_observations."
+                )
+            if (
+                self.observation_rms is not None
+                and observation_rms.shape != self.observation_rms.shape
+            ):
+                raise ValueError(
+                    f"Observation statistics of shape {observation_rms.shape} do "
+                    f"not match observations of shape {self.observation_rms.shape}."
+                )
+            self.observation_rms = self._loaded_rms(
+                observation_rms, self.observation_rms
+            )
+        if reward_rms is not None:
+            if not self.normalize_reward:
+                raise ValueError(
+                    "Cannot load reward statistics into an environment without "
+                    "normalize_reward."
+                )
+            self.reward_rms = self._loaded_rms(reward_rms, self.reward_rms)
+
+    @staticmethod
+    def _loaded_rms(
+        rms: RunningMeanStd, current_rms: Optional[RunningMeanStd]
+    ) -> RunningMeanStd:
+        """ Return a copy of rms, frozen if current_rms is. """
+        loaded_rms: RunningMeanStd = deepcopy(rms)
+        if current_rms is not None:
+            loaded_rms.frozen = current_rms.frozen
+        return loaded_rms
 
     def done_from_state(self) -> bool:
         """ Determine if the simulation is done from the state of the
@@ -166,6 +855,19 @@ class CustomSimEnv(BaseSimEnv):
         """
         return {"interface": self.interface}
 
+    def reset_info_from_state(self) -> Dict[Any, Any]:
+        """ Give the static observations, if the environment has any,
+        as reset info. See static_observations.
+
+        Returns:
+            info (Dict[str, Dict[str, np.ndarray]]): Dict mapping
+                "static_observation" to static_observation, or an empty
+                dict if the environment has no static observations.
+        """
+        if not self.static_observations:
+            return {}
+        return {"static_observation": self.static_observation}
+
 
 # Default observation objects, action object, and reward functions list
 # for use with make_default_sim_env and make_rebuilding_default_sim_env.
@@ -187,14 +889,20 @@ default_reward_functions: List[Callable[[BaseSimEnv], float]] = [
 
 
 def make_default_sim_env(
-    interface: Optional[GymTrainedInterface] = None,
+    interface: Optional[GymTrainedInterface] = None, **kwargs
 ) -> CustomSimEnv:
     """ A simulator environment with the following characteristics:
 
-    The action and observation spaces are continuous.
+    The action and observation spaces are continuous, and float64
+    unless a dtype_policy is given (e.g. DtypePolicy() for float32
+    observations and actions, with int32 arrivals, departures, and
+    timestep).
 
     An action in this environment is a pilot signal for each EVSE,
-    within the minimum and maximum EVSE rates.
+    within the minimum and maximum EVSE rates. If periods_per_action is
+    greater than 1, an action is instead a schedule of pilot signals
+    for each EVSE over periods_per_action periods (see
+    zero_centered_charging_schedule).
 
     An observation is a dict consisting of fields (times are 1-indexed
     in the observations):
@@ -220,15 +928,29 @@ def make_default_sim_env(
             reward.
 
     The simulation is considered done if the event queue is empty.
+
+    Additional keyword arguments (e.g. fast_forward_idle) are passed to
+    CustomSimEnv.
     """
     return CustomSimEnv(
         interface,
         default_observation_objects,
-        default_action_object,
+        _default_action_object(kwargs.get("periods_per_action", 1)),
         default_reward_functions,
+        **kwargs,
     )
 
 
+def _default_action_object(periods_per_action: int) -> SimAction:
+    """ Return the action object of the default environments: the
+    default_action_object, or a zero-centered charging schedule over
+    periods_per_action periods if periods_per_action is greater than 1.
+    """
+    if periods_per_action > 1:
+        return zero_centered_charging_schedule(periods_per_action)
+    return default_action_object
+
+
 class RebuildingEnv(CustomSimEnv):
     """ A simulator environment that subclasses CustomSimEnv, with
     the extra property that the entire simulation is rebuilt within 
@@ -236,8 +958,36 @@ class RebuildingEnv(CustomSimEnv):
 
     This is especially useful if the network or event queue have 
     stochastic elements.
+
+    Randomness in rebuilt simulations is controlled through a
+    numpy.random.SeedSequence owned by the environment. Each call to
+    reset spawns a new child sequence (one per episode), so that
+    scenario generation is reproducible given the seed passed to
+    seed() or reset(), and independent across parallel environments
+    seeded with different seeds or with sequences spawned from a
+    common parent. If the interface generating function has a parameter
+    named rng, it is called with a numpy.random.Generator built from the
+    current episode's child sequence, passed as the keyword argument
+    rng.
+
+    Attributes:
+        interface_generating_function (Callable[..., GymTrainedInterface]):
+            Function which returns a GymTrainedInterface to a generated
+            simulator, optionally accepting a numpy.random.Generator as
+            the keyword argument rng.
+        episode_seed_sequence (np.random.SeedSequence): The seed
+            sequence from which the current episode's simulation was
+            generated, or None if the environment was created without
+            an interface generating function (every episode then
+            restores the same simulation).
     """
 
+    interface_generating_function: Callable[..., GymTrainedInterface]
+    episode_seed_sequence: Optional[np.random.SeedSequence]
+    _seed_sequence: np.random.SeedSequence
+    _generating_function_accepts_rng: bool
+    _fixed_scenario: bool
+
     def __init__(
         self,
         interface: Optional[GymTrainedInterface],
@@ -245,8 +995,10 @@ class RebuildingEnv(CustomSimEnv):
         action_object: SimAction,
         reward_functions: List[Callable[[BaseSimEnv], float]],
         interface_generating_function: Optional[
-            Callable[[], GymTrainedInterface]
+            Callable[..., GymTrainedInterface]
         ] = None,
+        seed: Optional[Union[int, np.random.SeedSequence]] = None,
+        **kwargs,
     ) -> None:
         """ Initialize this environment. Every CustomSimEnv needs a list
         of SimObservation objects, action space functions, and reward
@@ -268,10 +1020,18 @@ class RebuildingEnv(CustomSimEnv):
             reward_functions (List[Callable[[BaseSimEnv], float]]): List
                 of functions which take as input a BaseSimEnv instance
                 and return a number.
-            interface_generating_function (Optional[Callable[[],
+            interface_generating_function (Optional[Callable[...,
                                                     GymInterface]]):
                 Function which returns a GymInterface to a generated
-                simulator.
+                simulator. If the function has a parameter named rng,
+                it is passed a numpy.random.Generator (as the keyword
+                argument rng) from which all randomness in the
+                generated simulation should be drawn; otherwise it is
+                called without arguments.
+            seed (Optional[Union[int, np.random.SeedSequence]]): Seed
+                for the environment's random streams. See seed().
+            **kwargs: Additional keyword arguments passed to
+                CustomSimEnv.
         """
         if interface_generating_function is None and interface is None:
             raise TypeError(
@@ -280,20 +1040,29 @@ class RebuildingEnv(CustomSimEnv):
                 "None"
             )
 
-        if interface_generating_function is None:
-            self._init_snapshot = deepcopy(interface)
+        self.episode_seed_sequence = None
+        self.seed(seed)
 
+        if interface_generating_function is None:
+            # The initial snapshot of interface is taken by
+            # BaseSimEnv.__init__, and restored on each reset.
             # noinspection PyMissingOrEmptyDocstring
             def interface_generating_function() -> GymTrainedInterface:
                 return self._init_snapshot
 
+            self.interface_generating_function = interface_generating_function
+            self._generating_function_accepts_rng = False
+            self._fixed_scenario = True
         else:
-            interface: GymTrainedInterface = interface_generating_function()
-
-        self.interface_generating_function = interface_generating_function
+            self.interface_generating_function = interface_generating_function
+            self._fixed_scenario = False
+            self._generating_function_accepts_rng = accepts_rng(
+                interface_generating_function
+            )
+            interface = self._generate_interface()
 
         super().__init__(
-            interface, observation_objects, action_object, reward_functions
+            interface, observation_objects, action_object, reward_functions, **kwargs
         )
 
     @classmethod
@@ -301,8 +1070,9 @@ class RebuildingEnv(CustomSimEnv):
         cls,
         env: CustomSimEnv,
         interface_generating_function: Optional[
-            Callable[[], GymTrainedInterface]
+            Callable[..., GymTrainedInterface]
         ] = None,
+        seed: Optional[Union[int, np.random.SeedSequence]] = None,
     ) -> "RebuildingEnv":
         return cls(
             env.interface,
@@ -310,39 +1080,175 @@ class RebuildingEnv(CustomSimEnv):
             env.action_object,
             env.reward_functions,
             interface_generating_function=interface_generating_function,
+            seed=seed,
+            fast_forward_idle=env.fast_forward_idle,
+            periods_per_action=env.periods_per_action,
+            infeasibility_mode=env.infeasibility_mode,
+            step_timer=env.step_timer,
+            flatten_observations=env.flatten_observations,
+            reuse_observation_buffers=env.reuse_observation_buffers,
+            dtype_policy=env.dtype_policy,
+            static_observations=env.static_observations,
+            lazy_observations=env.lazy_observations,
+            consumed_keys=env.consumed_keys,
+            cache_spaces=env.cache_spaces,
+            normalize_observations=env.normalize_observations,
+            normalize_reward=env.normalize_reward,
+            normalization_clip=env.normalization_clip,
+            reward_discount=env.reward_discount,
+            share_init_snapshot=env.share_init_snapshot,
+        )
+
+    def seed(
+        self, seed: Optional[Union[int, np.random.SeedSequence]] = None
+    ) -> List[int]:
+        """ Seeds the random streams used to generate simulations.
+
+        The seed may be an int, None (in which case fresh entropy is
+        drawn from the OS), or a numpy.random.SeedSequence. Passing
+        sequences spawned from a common parent (e.g.
+        SeedSequence(seed).spawn(num_envs)) gives independent streams
+        to parallel environments.
+
+        Implements gym.Env.seed()
+
+        Args:
+            seed (Optional[Union[int, np.random.SeedSequence]]): Seed
+                for the environment's random streams.
+
+        Returns:
+            List[int]: The entropy of the environment's root seed
+                sequence.
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            self._seed_sequence = seed
+        else:
+            self._seed_sequence = np.random.SeedSequence(seed)
+        return [self._seed_sequence.entropy]
+
+    @property
+    def episode_key(self) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """ Return a hashable key that deterministically identifies the
+        simulation generated for the current episode, or None if the
+        current simulation was not generated from a seed sequence.
+        Useful for keying scenario caches.
+
+        Returns:
+            Optional[Tuple[int, Tuple[int, ...]]]: The entropy and spawn
+                key of the current episode's seed sequence.
+        """
+        if self.episode_seed_sequence is None:
+            return None
+        return (
+            self.episode_seed_sequence.entropy,
+            tuple(self.episode_seed_sequence.spawn_key),
         )
 
-    def reset(self) -> Dict[str, np.ndarray]:
+    def _generate_interface(self) -> GymTrainedInterface:
+        """ Generate an interface to a new simulation, spawning a new
+        child seed sequence for the episode unless the environment
+        restores a fixed simulation.
+
+        Returns:
+            GymTrainedInterface: An interface to the generated
+                simulation.
+        """
+        if self._fixed_scenario:
+            return self.interface_generating_function()
+        self.episode_seed_sequence = self._seed_sequence.spawn(1)[0]
+        if self._generating_function_accepts_rng:
+            return self.interface_generating_function(
+                rng=np.random.default_rng(self.episode_seed_sequence)
+            )
+        return self.interface_generating_function()
+
+    def reset(
+        self,
+        return_info: bool = False,
+        *,
+        seed: Optional[Union[int, np.random.SeedSequence]] = None,
+    ) -> Union[Dict[str, np.ndarray], Tuple[Dict[str, np.ndarray], Dict[Any, Any]]]:
         """ Resets the state of the simulation and returns an initial 
-        observation. Resetting is done by setting the interface to 
-        the simulation to an interface to the simulation in its 
-        initial state.
-        
+        observation. Resetting is done by rebuilding the simulation and
+        then, as in CustomSimEnv.reset, setting the interface to the
+        simulation to an interface to the simulation in its initial
+        state.
+
+        Args:
+            return_info (bool): See BaseSimEnv.reset.
+            seed (Optional[Union[int, np.random.SeedSequence]]): If not
+                None, the environment is re-seeded with this seed before
+                the simulation is rebuilt. See seed(). Keyword-only.
+
         Returns:
-            observation (np.ndarray): the initial observation.
+            observation (np.ndarray): the initial observation, and, if
+                return_info, the reset info.
         """
-        temp_interface = self.interface_generating_function()
-        self.interface = deepcopy(temp_interface)
-        self._prev_interface = deepcopy(temp_interface)
-        self._init_snapshot = deepcopy(temp_interface)
-        return self.observation_from_state()
+        if seed is not None:
+            self.seed(seed)
+        self._init_snapshot = self._generate_interface()
+        return super().reset(return_info=return_info)
 
     def render(self, mode="human"):
         """ Renders the environment. Implements gym.Env.render(). """
         raise NotImplementedError
 
 
+def _network_signature(interface: GymTrainedInterface) -> Optional[Tuple[Any, ...]]:
+    """ Return the network signature of interface, or None if its
+    Simulator has no network (e.g. a stand-in Simulator in tests), in
+    which case spaces are not cached.
+    """
+    # noinspection PyProtectedMember
+    if not hasattr(interface._simulator, "network"):
+        return None
+    return interface.network_signature()
+
+
+def accepts_rng(function: Callable[..., Any]) -> bool:
+    """ Return True if function has a parameter named rng that can be
+    passed as a keyword argument, as RebuildingEnv passes its random
+    number generator to interface generating functions.
+
+    Args:
+        function (Callable[..., Any]): Function to inspect. Functions
+            whose signature cannot be inspected (e.g. some builtins)
+            are treated as taking no arguments.
+
+    Returns:
+        bool: True if function accepts the keyword argument rng.
+    """
+    try:
+        parameter: Optional[inspect.Parameter] = inspect.signature(
+            function
+        ).parameters.get("rng")
+    except (TypeError, ValueError):
+        return False
+    return parameter is not None and parameter.kind in (
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        inspect.Parameter.KEYWORD_ONLY,
+    )
+
+
 def make_rebuilding_default_sim_env(
-    interface_generating_function: Optional[Callable[[], GymTrainedInterface]]
+    interface_generating_function: Optional[Callable[..., GymTrainedInterface]],
+    seed: Optional[Union[int, np.random.SeedSequence]] = None,
+    **kwargs,
 ) -> RebuildingEnv:
     """ A simulator environment with the same characteristics as the
     environment returned by make_default_sim_env except on every reset,
     the simulation is completely rebuilt using interface_generating_function.
 
-    See make_default_sim_env for more info.
+    See make_default_sim_env for more info, and RebuildingEnv for a
+    description of seeding. Additional keyword arguments are passed to
+    RebuildingEnv.
     """
-    interface = interface_generating_function()
-    return RebuildingEnv.from_custom_sim_env(
-        make_default_sim_env(interface),
+    return RebuildingEnv(
+        None,
+        default_observation_objects,
+        _default_action_object(kwargs.get("periods_per_action", 1)),
+        default_reward_functions,
         interface_generating_function=interface_generating_function,
+        seed=seed,
+        **kwargs,
     )
@@ -0,0 +1,254 @@
+# coding=utf-8
+"""
+Diagnostics of the copying and allocation overhead of environments.
+
+CopyAccounting counts the deepcopy calls made by the environment and
+interface modules, and the memory each call site allocates.
+DiagnosticsWrapper uses it together with tracemalloc to report, per
+episode, the copies made, the memory allocated by each step, and the
+source lines allocating the most memory.
+"""
+import copy
+import sys
+import tracemalloc
+from typing import Optional, Dict, List, Any, Callable, Tuple
+
+import gym
+
+from . import base_env, custom_envs
+from .. import interfaces
+
+# Modules whose module-level deepcopy is replaced while a CopyAccounting
+# is active.
+_ACCOUNTED_MODULES: Tuple[Any, ...] = (base_env, custom_envs, interfaces)
+
+
+class CopyAccounting:
+    """ Context manager counting the deepcopy calls made by the
+    environment and interface modules while it is active, and the
+    memory allocated (and still allocated when the copy returns) by
+    each call site, as measured by tracemalloc.
+
+    Call sites are named <module>.<function>:<line>. Bytes of a copy
+    include those of any nested accounted copies. tracemalloc is
+    started on entry if it is not already tracing, and stopped on exit
+    if it was started on entry.
+
+    Accounting replaces the deepcopy name in each accounted module, so
+    it applies to every environment in the process; it is not
+    thread-safe. Accountings may be nested: the innermost active
+    accounting accounts for the copies, and the deepcopy it replaced is
+    restored on exit.
+    """
+
+    _sites: Dict[str, List[int]]
+    _started_tracing: bool
+    _previous_deepcopies: List[Callable]
+
+    def __init__(self) -> None:
+        self._sites = {}
+        self._started_tracing = False
+        self._previous_deepcopies = []
+
+    def __enter__(self) -> "CopyAccounting":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous_deepcopies = [module.deepcopy for module in _ACCOUNTED_MODULES]
+        for module in _ACCOUNTED_MODULES:
+            module.deepcopy = self._deepcopy
+        return self
+
+    def __exit__(self, *_) -> None:
+        for module, previous in zip(_ACCOUNTED_MODULES, self._previous_deepcopies):
+            module.deepcopy = previous
+        self._previous_deepcopies = []
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _deepcopy(self, x: Any, memo: Optional[Dict[int, Any]] = None) -> Any:
+        """ Copy x with copy.deepcopy, accounting for the copy. """
+        frame = sys._getframe(1)
+        site: str = (
+            f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:"
+            f"{frame.f_lineno}"
+        )
+        start: int = tracemalloc.get_traced_memory()[0]
+        result: Any = copy.deepcopy(x, memo)
+        site_stats: List[int] = self._sites.setdefault(site, [0, 0])
+        site_stats[0] += 1
+        site_stats[1] += tracemalloc.get_traced_memory()[0] - start
+        return result
+
+    def reset(self) -> None:
+        """ Clear the accounted copies.
+
+        Returns:
+            None
+        """
+        self._sites = {}
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """ Return the copies accounted for, by call site.
+
+        Returns:
+            Dict[str, Dict[str, int]]: Dict mapping each call site to a
+                dict with keys calls and bytes.
+        """
+        return {
+            site: {"calls": calls, "bytes": num_bytes}
+            for site, (calls, num_bytes) in self._sites.items()
+        }
+
+    @property
+    def total_calls(self) -> int:
+        """ Return the number of copies accounted for. """
+        return sum(calls for calls, _ in self._sites.values())
+
+    @property
+    def total_bytes(self) -> int:
+        """ Return the bytes allocated by the copies accounted for. """
+        return sum(num_bytes for _, num_bytes in self._sites.values())
+
+
+class DiagnosticsWrapper(gym.Wrapper):
+    """ Wrapper reporting the copying and allocation overhead of an
+    environment per episode.
+
+    While the wrapped environment is reset or stepped, its copies are
+    accounted for with a CopyAccounting, and the memory allocated by
+    each step is measured with tracemalloc. A tracemalloc snapshot is
+    taken at the start of each episode and compared with one taken at
+    its end to find the source lines whose allocations grew the most.
+
+    An episode's report is added to episode_reports (and passed to
+    report_callback) when the episode ends, i.e. when a step returns
+    done, the environment is reset, or the wrapper is closed. Reports
+    are dicts with keys:
+        episode (int): Index of the episode.
+        steps (int): Number of steps taken.
+        deepcopy (Dict[str, Dict[str, int]]): Copies made during reset
+            and steps, by call site. See CopyAccounting.stats.
+        deepcopy_calls (int): Total number of copies.
+        deepcopy_bytes (int): Total bytes allocated by copies.
+        step_allocated_bytes (List[int]): Change in traced memory over
+            each step.
+        step_peak_bytes (List[int]): Peak traced memory during each
+            step, relative to the start of the step. Empty on Pythons
+            without tracemalloc.reset_peak (before 3.9).
+        top_allocations (List[Tuple[str, int, int]]): The source lines
+            (file:line) whose allocations grew the most over the
+            episode, with their growth in bytes and number of blocks.
+
+    tracemalloc is started when the wrapper is created if it is not
+    already tracing, and stopped when the wrapper is closed if it was
+    started by the wrapper. Tracing slows the environment down
+    considerably; the wrapper is meant for diagnostics, not training.
+
+    Args:
+        env (gym.Env): Environment to diagnose.
+        top_allocations (int): Number of source lines to report in
+            top_allocations.
+        report_callback (Callable[[Dict[str, Any]], None]): Optional
+            function called with each episode's report.
+    """
+
+    top_allocations: int
+    report_callback: Optional[Callable[[Dict[str, Any]], None]]
+    copy_accounting: CopyAccounting
+    episode_reports: List[Dict[str, Any]]
+    _started_tracing: bool
+    _start_snapshot: Optional[tracemalloc.Snapshot]
+    _steps: int
+    _step_allocated_bytes: List[int]
+    _step_peak_bytes: List[int]
+
+    def __init__(
+        self,
+        env: gym.Env,
+        top_allocations: int = 10,
+        report_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        super().__init__(env)
+        self.top_allocations = top_allocations
+        self.report_callback = report_callback
+        self.copy_accounting = CopyAccounting()
+        self.episode_reports = []
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._start_snapshot = None
+        self._steps = 0
+        self._step_allocated_bytes = []
+        self._step_peak_bytes = []
+
+    def reset(self, **kwargs) -> Any:
+        self._finish_episode()
+        self.copy_accounting.reset()
+        self._steps = 0
+        self._step_allocated_bytes = []
+        self._step_peak_bytes = []
+        self._start_snapshot = _snapshot()
+        with self.copy_accounting:
+            return self.env.reset(**kwargs)
+
+    def step(self, action: Any) -> Tuple[Any, float, bool, Dict[Any, Any]]:
+        reset_peak: Optional[Callable[[], None]] = getattr(
+            tracemalloc, "reset_peak", None
+        )
+        if reset_peak is not None:
+            reset_peak()
+        start: int = tracemalloc.get_traced_memory()[0]
+        with self.copy_accounting:
+            observation, reward, done, info = self.env.step(action)
+        current, peak = tracemalloc.get_traced_memory()
+        self._steps += 1
+        self._step_allocated_bytes.append(current - start)
+        if reset_peak is not None:
+            self._step_peak_bytes.append(peak - start)
+        if done:
+            self._finish_episode()
+        return observation, reward, done, info
+
+    def close(self) -> None:
+        self._finish_episode()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        super().close()
+
+    def _finish_episode(self) -> None:
+        """ Report the current episode, if one is in progress. """
+        if self._start_snapshot is None:
+            return
+        top_allocations: List[Tuple[str, int, int]] = [
+            (str(stat.traceback), stat.size_diff, stat.count_diff)
+            for stat in _snapshot().compare_to(self._start_snapshot, "lineno")[
+                : self.top_allocations
+            ]
+        ]
+        self._start_snapshot = None
+        report: Dict[str, Any] = {
+            "episode": len(self.episode_reports),
+            "steps": self._steps,
+            "deepcopy": self.copy_accounting.stats,
+            "deepcopy_calls": self.copy_accounting.total_calls,
+            "deepcopy_bytes": self.copy_accounting.total_bytes,
+            "step_allocated_bytes": self._step_allocated_bytes,
+            "step_peak_bytes": self._step_peak_bytes,
+            "top_allocations": top_allocations,
+        }
+        self.episode_reports.append(report)
+        if self.report_callback is not None:
+            self.report_callback(report)
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    """ Take a tracemalloc snapshot, excluding tracemalloc's own
+    allocations.
+    """
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
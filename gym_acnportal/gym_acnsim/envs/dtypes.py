@@ -0,0 +1,135 @@
+# coding=utf-8
+"""
+Dtype policies for the observation and action spaces of environments.
+
+Builtin observation and action factories default to float64 spaces. A
+DtypePolicy given to a CustomSimEnv recasts the spaces of its
+observation and action objects to compact dtypes (by default float32,
+with int32 time features), and the environment's observations to the
+dtypes of their spaces.
+"""
+from typing import Iterable, FrozenSet, Union
+
+import numpy as np
+from gym import spaces
+
+DTypeLike = Union[str, type, np.dtype]
+
+# Names of the builtin observations whose values are integer timesteps.
+TIME_OBSERVATIONS: FrozenSet[str] = frozenset({"arrivals", "departures", "timestep"})
+
+
+class DtypePolicy:
+    """ Dtypes of the observation and action spaces of an environment.
+
+    Observations named in time_observations take time_dtype, and all
+    other observations take float_dtype. Integer time dtypes must be
+    wide enough for the simulation's timesteps (e.g. int16 holds
+    timesteps below 32767, about 113 days of 5 minute periods).
+
+    Only Box spaces are recast; the spaces of other observations and
+    actions are left as given by their objects. Recast spaces keep
+    their bounds, with the bounds of integer spaces rounded inward and
+    infinite bounds replaced by the limits of the integer dtype.
+
+    Args:
+        float_dtype (DTypeLike): Dtype of observations that are not
+            time features.
+        time_dtype (DTypeLike): Dtype of the observations named in
+            time_observations.
+        action_dtype (DTypeLike): Dtype of the action space.
+        time_observations (Iterable[str]): Names of the observations
+            that are time features. Default the builtin arrival,
+            departure, and timestep observations.
+    """
+
+    float_dtype: np.dtype
+    time_dtype: np.dtype
+    action_dtype: np.dtype
+    time_observations: FrozenSet[str]
+
+    def __init__(
+        self,
+        float_dtype: DTypeLike = np.float32,
+        time_dtype: DTypeLike = np.int32,
+        action_dtype: DTypeLike = np.float32,
+        time_observations: Iterable[str] = TIME_OBSERVATIONS,
+    ) -> None:
+        self.float_dtype = np.dtype(float_dtype)
+        self.time_dtype = np.dtype(time_dtype)
+        self.action_dtype = np.dtype(action_dtype)
+        self.time_observations = frozenset(time_observations)
+
+    def __repr__(self) -> str:
+        return (
+            f"DtypePolicy(float_dtype={self.float_dtype}, "
+            f"time_dtype={self.time_dtype}, action_dtype={self.action_dtype})"
+        )
+
+    def observation_dtype(self, name: str) -> np.dtype:
+        """ Return the dtype of the named observation.
+
+        Args:
+            name (str): Name of the observation.
+
+        Returns:
+            np.dtype: time_dtype if name is a time observation, else
+                float_dtype.
+        """
+        if name in self.time_observations:
+            return self.time_dtype
+        return self.float_dtype
+
+    def observation_space(self, name: str, space: spaces.Space) -> spaces.Space:
+        """ Return the space of the named observation recast to its
+        dtype. See cast_space.
+        """
+        return cast_space(space, self.observation_dtype(name))
+
+    def action_space(self, space: spaces.Space) -> spaces.Space:
+        """ Return the action space recast to action_dtype. See
+        cast_space.
+        """
+        return cast_space(space, self.action_dtype)
+
+
+def cast_space(space: spaces.Space, dtype: DTypeLike) -> spaces.Space:
+    """ Return a Box space recast to dtype, or any other space
+    unchanged.
+
+    Args:
+        space (spaces.Space): Space to recast.
+        dtype (DTypeLike): Dtype of the returned space.
+
+    Returns:
+        spaces.Space: A Box with the shape and bounds of space and the
+            given dtype if space is a Box (space itself if it already
+            has the dtype), else space.
+    """
+    dtype = np.dtype(dtype)
+    if not isinstance(space, spaces.Box) or space.dtype == dtype:
+        return space
+    low: np.ndarray = np.broadcast_to(space.low, space.shape)
+    high: np.ndarray = np.broadcast_to(space.high, space.shape)
+    if np.issubdtype(dtype, np.integer):
+        return spaces.Box(
+            low=_integer_bound(np.ceil(low), dtype),
+            high=_integer_bound(np.floor(high), dtype),
+            dtype=dtype,
+        )
+    return spaces.Box(low=low.astype(dtype), high=high.astype(dtype), dtype=dtype)
+
+
+def _integer_bound(bound: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """ Return bound cast to the integer dtype, with infinite (or out
+    of range) entries replaced by the limits of the dtype.
+    """
+    limits = np.iinfo(dtype)
+    cast: np.ndarray = np.empty(bound.shape, dtype=dtype)
+    below: np.ndarray = bound <= limits.min
+    above: np.ndarray = bound >= limits.max
+    within: np.ndarray = ~(below | above)
+    cast[below] = limits.min
+    cast[above] = limits.max
+    cast[within] = bound[within]
+    return cast
@@ -0,0 +1,187 @@
+# coding=utf-8
+"""
+Running mean and variance statistics for normalizing observations and
+rewards.
+
+A CustomSimEnv created with normalize_observations (or
+normalize_reward) keeps a RunningMeanStd of its flat observations (or
+of its discounted returns), updates it once per agent transition, and
+normalizes observations in place in the flat observation buffer.
+Statistics of environments in different workers can be merged, loaded
+into other environments (see CustomSimEnv.set_normalization_state), and
+frozen for deployment (see GymTrainedAlgorithm).
+"""
+from typing import Tuple, Optional, Union
+
+import numpy as np
+
+
+class RunningMeanStd:
+    """ Running mean and variance of samples of a fixed shape.
+
+    Single samples are added with Welford's algorithm, and batches of
+    samples (or other statistics, see merge) with the parallel
+    algorithm of Chan et al., so that the statistics are numerically
+    stable over long runs. Adding a single sample and normalizing an
+    array in place allocate no arrays.
+
+    Before any sample is added, the mean is 0 and the variance is 1.
+
+    Args:
+        shape (Tuple[int, ...]): Shape of each sample.
+        epsilon (float): Added to the variance before taking the
+            standard deviation, to avoid dividing by 0.
+
+    Attributes:
+        shape (Tuple[int, ...]): Shape of each sample.
+        epsilon (float): See Args.
+        count (int): Number of samples added.
+        mean (np.ndarray): Mean of the samples, of shape shape.
+        frozen (bool): If True, update does not change the statistics.
+    """
+
+    shape: Tuple[int, ...]
+    epsilon: float
+    count: int
+    mean: np.ndarray
+    frozen: bool
+    _m2: np.ndarray
+    _std: np.ndarray
+    _std_stale: bool
+    _delta: np.ndarray
+    _scratch: np.ndarray
+
+    def __init__(self, shape: Tuple[int, ...] = (), epsilon: float = 1e-8) -> None:
+        self.shape = tuple(shape)
+        self.epsilon = epsilon
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self.frozen = False
+        self._m2 = np.zeros(self.shape)
+        self._std = np.full(self.shape, np.sqrt(1 + epsilon))
+        self._std_stale = False
+        self._delta = np.zeros(self.shape)
+        self._scratch = np.zeros(self.shape)
+
+    def __repr__(self) -> str:
+        return (
+            f"RunningMeanStd(shape={self.shape}, count={self.count}, "
+            f"frozen={self.frozen})"
+        )
+
+    @property
+    def var(self) -> np.ndarray:
+        """ Return the (population) variance of the samples, or 1's if
+        no samples have been added.
+        """
+        if not self.count:
+            return np.ones(self.shape)
+        return self._m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        """ Return the standard deviation of the samples, with epsilon
+        added to the variance.
+        """
+        if self._std_stale:
+            if self.count:
+                np.divide(self._m2, self.count, out=self._std)
+            else:
+                self._std.fill(1)
+            np.add(self._std, self.epsilon, out=self._std)
+            np.sqrt(self._std, out=self._std)
+            self._std_stale = False
+        return self._std
+
+    def update(self, x: Union[np.ndarray, float]) -> None:
+        """ Add samples to the statistics, unless they are frozen.
+
+        Args:
+            x (Union[np.ndarray, float]): A sample, of shape shape, or a
+                batch of samples, of shape (batch size,) + shape.
+
+        Returns:
+            None
+        """
+        if self.frozen:
+            return
+        x = np.asarray(x)
+        if x.shape == self.shape:
+            self._update_sample(x)
+        elif x.shape[1:] == self.shape:
+            if len(x):
+                self._merge(len(x), x.mean(axis=0), x.var(axis=0) * len(x))
+        else:
+            raise ValueError(
+                f"Samples of shape {x.shape} do not match statistics of shape "
+                f"{self.shape}."
+            )
+
+    def _update_sample(self, x: np.ndarray) -> None:
+        """ Add a single sample with Welford's algorithm. """
+        self.count += 1
+        np.subtract(x, self.mean, out=self._delta)
+        np.divide(self._delta, self.count, out=self._scratch)
+        np.add(self.mean, self._scratch, out=self.mean)
+        np.subtract(x, self.mean, out=self._scratch)
+        np.multiply(self._delta, self._scratch, out=self._scratch)
+        np.add(self._m2, self._scratch, out=self._m2)
+        self._std_stale = True
+
+    def merge(self, other: "RunningMeanStd") -> None:
+        """ Add the samples of other to these statistics, e.g. to
+        combine the statistics of environments in different workers.
+        Statistics are merged even if frozen.
+
+        Args:
+            other (RunningMeanStd): Statistics of the same shape.
+
+        Returns:
+            None
+        """
+        if other.shape != self.shape:
+            raise ValueError(
+                f"Cannot merge statistics of shape {other.shape} into statistics "
+                f"of shape {self.shape}."
+            )
+        if other.count:
+            # noinspection PyProtectedMember
+            self._merge(other.count, other.mean, other._m2)
+
+    def _merge(self, count: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        """ Add count samples with the given mean and sum of squared
+        deviations from the mean, with the algorithm of Chan et al.
+        """
+        total: int = self.count + count
+        delta: np.ndarray = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self._m2 = self._m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+        self._std_stale = True
+
+    def normalize(
+        self,
+        x: np.ndarray,
+        out: Optional[np.ndarray] = None,
+        clip: Optional[float] = None,
+    ) -> np.ndarray:
+        """ Return x standardized by the statistics, i.e. (x - mean) /
+        std.
+
+        Args:
+            x (np.ndarray): Array of shape shape (or broadcastable to
+                it).
+            out (np.ndarray): Optional array into which the result is
+                written, e.g. x itself. If None, a new array is
+                allocated.
+            clip (float): If given, results are clipped to
+                [-clip, clip].
+
+        Returns:
+            np.ndarray: The normalized array (out, if given).
+        """
+        out = np.subtract(x, self.mean, out=out, casting="same_kind")
+        np.divide(out, self.std, out=out, casting="same_kind")
+        if clip is not None:
+            np.clip(out, -clip, clip, out=out)
+        return out
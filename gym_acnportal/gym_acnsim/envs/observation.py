@@ -6,9 +6,10 @@ functions for different builtin observations.
 See the SimObservation docstring for more information on the
 SimObservation class.
 
-Each factory function takes no arguments and returns an instance of type
-SimObservation. Each factory function defines a space_function and and
-an obs_function with the following signatures:
+Each factory function optionally takes the dtype of the observation
+(default float64) and returns an instance of type SimObservation.
+Each factory function defines a space_function and and an obs_function
+with the following signatures:
 
 space_function: Callable[[GymInterface], spaces.Space]
 obs_function: Callable[[GymInterface], np.ndarray]
@@ -17,14 +18,23 @@ The space_function gives a gym space for a given observation type.
 The obs_function gives a gym observation for a given observation type.
 The observation returned by obs_function is a point in the space
 returned by space_function.
+
+Builtin observations also define an out_function with the signature
+
+out_function: Callable[[GymInterface, np.ndarray], None]
+
+which writes the observation into a caller-provided array with the
+shape of the space, instead of allocating a new one.
 """
-from typing import Callable
+import weakref
+from typing import Callable, Optional, Dict, Tuple, List
 
 import numpy as np
 from gym import spaces
 
-from acnportal.acnsim import EV
+from acnportal.acnsim import EV, EventQueue
 
+from .dtypes import DTypeLike
 from ..interfaces import GymTrainedInterface
 
 
@@ -62,10 +72,15 @@ class SimObservation:
         name (str): Name of this observation. This attribute allows an
             environment to distinguish between different types of
             observation.
+        _out_function (Callable[[GymInterface, np.ndarray], None]):
+            Optional function that accepts a GymInterface and an array
+            with the shape of the space, and writes the observation
+            into the array in place.
     """
 
     _space_function: Callable[[GymTrainedInterface], spaces.Space]
     _obs_function: Callable[[GymTrainedInterface], np.ndarray]
+    _out_function: Optional[Callable[[GymTrainedInterface, np.ndarray], None]]
     name: str
 
     def __init__(
@@ -73,6 +88,9 @@ class SimObservation:
         space_function: Callable[[GymTrainedInterface], spaces.Space],
         obs_function: Callable[[GymTrainedInterface], np.ndarray],
         name: str,
+        out_function: Optional[
+            Callable[[GymTrainedInterface, np.ndarray], None]
+        ] = None,
     ) -> None:
         """
         Args:
@@ -86,12 +104,19 @@ class SimObservation:
             name (str): Name of this observation. This attribute allows
                 an environment to distinguish between different types of
                 observation.
+            out_function (Callable[[GymInterface, np.ndarray], None]):
+                Optional function that accepts a GymInterface and an
+                array with the shape of the space, and writes the
+                observation generated by obs_function into the array in
+                place. If None, get_obs with an output array copies the
+                observation generated by obs_function into it.
 
         Returns:
             None.
         """
         self._space_function = space_function
         self._obs_function = obs_function
+        self._out_function = out_function
         self.name = name
 
     def get_space(self, interface: GymTrainedInterface) -> spaces.Space:
@@ -113,7 +138,9 @@ class SimObservation:
         """
         return self._space_function(interface)
 
-    def get_obs(self, interface: GymTrainedInterface) -> np.ndarray:
+    def get_obs(
+        self, interface: GymTrainedInterface, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
         Returns a gym observation for the state of the simulation given
         by interface. The exact observation depends on both the input
@@ -124,23 +151,36 @@ class SimObservation:
             interface (GymTrainedInterface): Interface to an ACN-Sim Simulation
                 that contains details of and functions to generate
                 details about the current Simulation.
+            out (np.ndarray): Optional array, with the shape of this
+                observation's space, into which the observation is
+                written. The observation is written in place by
+                _out_function if one was given, and otherwise copied
+                from the output of _obs_function.
 
         Returns:
             np.ndarray: A gym observation generated by _obs_function
-                with this interface.
+                with this interface, or out if given.
         """
-        return self._obs_function(interface)
+        if out is None:
+            return self._obs_function(interface)
+        if self._out_function is not None:
+            self._out_function(interface, out)
+        else:
+            out[...] = np.reshape(self._obs_function(interface), out.shape)
+        return out
 
 
 # Per active EV observation factory functions. Note that all EV data
 # is shifted up by 1, as 0's indicate no EV is plugged in.
 def _ev_observation(
-    attribute_function: Callable[[GymTrainedInterface, EV], float], name: str
+    attribute_function: Callable[[GymTrainedInterface, EV], float],
+    name: str,
+    dtype: DTypeLike,
 ) -> SimObservation:
     # noinspection PyMissingOrEmptyDocstring
     def space_function(interface: GymTrainedInterface) -> spaces.Space:
         return spaces.Box(
-            low=0, high=np.inf, shape=(len(interface.station_ids),), dtype="float"
+            low=0, high=np.inf, shape=(len(interface.station_ids),), dtype=dtype
         )
 
     # noinspection PyMissingOrEmptyDocstring
@@ -148,78 +188,478 @@ def _ev_observation(
         attribute_values: dict = {station_id: 0 for station_id in interface.station_ids}
         for ev in interface.active_evs:
             attribute_values[ev.station_id] = attribute_function(interface, ev) + 1
-        return np.array(list(attribute_values.values()))
+        return np.array(list(attribute_values.values()), dtype=dtype)
 
-    return SimObservation(space_function, obs_function, name=name)
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        station_ids = interface.station_ids
+        station_index: Dict[str, int] = dict(zip(station_ids, range(len(station_ids))))
+        out.fill(0)
+        for ev in interface.active_evs:
+            out[station_index[ev.station_id]] = attribute_function(interface, ev) + 1
+
+    return SimObservation(space_function, obs_function, name, out_function)
 
 
-def arrival_observation() -> SimObservation:
+def arrival_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe active EV arrivals.
 
     Zeros in the output observation array indicate no EV is plugged in;
     as such, all observations are shifted up by 1.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation. Arrivals are
+            integer timesteps, so integer dtypes are exact.
     """
-    return _ev_observation(lambda _, ev: ev.arrival, "arrivals")
+    return _ev_observation(lambda _, ev: ev.arrival, "arrivals", dtype)
 
 
-def departure_observation() -> SimObservation:
+def departure_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe active EV departures.
 
     Zeros in the output observation array indicate no EV is plugged in;
     as such, all observations are shifted up by 1.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation. Departures are
+            integer timesteps, so integer dtypes are exact.
     """
-    return _ev_observation(lambda _, ev: ev.departure, "departures")
+    return _ev_observation(lambda _, ev: ev.departure, "departures", dtype)
 
 
-def remaining_demand_observation() -> SimObservation:
+def remaining_demand_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe active EV remaining energy demands in amp periods.
 
     Zeros in the output observation array indicate no EV is plugged in;
     as such, all observations are shifted up by 1.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation.
     """
     return _ev_observation(
-        lambda interface, ev: interface.remaining_amp_periods(ev), "demands"
+        lambda interface, ev: interface.remaining_amp_periods(ev), "demands", dtype
+    )
+
+
+# Padded active EV observation factory function.
+# Names of the columns of active_ev_observation, in order.
+ACTIVE_EV_FEATURES: Tuple[str, ...] = (
+    "mask",
+    "station",
+    "arrival",
+    "departure",
+    "demand",
+)
+
+
+def _write_active_evs(interface: GymTrainedInterface, out: np.ndarray) -> None:
+    """ Write the features of the active EVs, in the order of
+    interface.active_evs, into the rows of out, truncating to the
+    number of rows of out and padding with 0's.
+    """
+    station_ids = interface.station_ids
+    station_index: Dict[str, int] = dict(zip(station_ids, range(len(station_ids))))
+    max_evs: int = out.shape[0]
+    out.fill(0)
+    for row, ev in enumerate(interface.active_evs):
+        if row == max_evs:
+            break
+        out[row] = (
+            1,
+            station_index[ev.station_id] + 1,
+            ev.arrival + 1,
+            ev.departure + 1,
+            interface.remaining_amp_periods(ev) + 1,
+        )
+
+
+def active_ev_observation(max_evs: int, dtype: DTypeLike = "float") -> SimObservation:
+    """ Generates a SimObservation instance that wraps functions to
+    observe the active EVs as a fixed number of padded rows, one per
+    EV, rather than one entry per station. The size of the observation
+    thus depends on max_evs rather than on the number of stations in
+    the network.
+
+    Each row holds the features named in ACTIVE_EV_FEATURES: a mask (1
+    for an active EV, 0 for padding), the index of the EV's station in
+    interface.station_ids, and the EV's arrival, departure, and
+    remaining demand in amp periods. As in the per-station EV
+    observations, all features but the mask are shifted up by 1, so
+    padding rows are all 0's. Rows follow the order of
+    interface.active_evs; if more than max_evs EVs are active, only
+    the first max_evs are observed.
+
+    Args:
+        max_evs (int): Number of rows of the observation, i.e. the
+            maximum number of active EVs observed.
+        dtype (DTypeLike): Dtype of the observation.
+    """
+    # noinspection PyUnusedLocal
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> spaces.Space:
+        return spaces.Box(
+            low=0, high=np.inf, shape=(max_evs, len(ACTIVE_EV_FEATURES)), dtype=dtype
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def obs_function(interface: GymTrainedInterface) -> np.ndarray:
+        observation: np.ndarray = np.empty(
+            (max_evs, len(ACTIVE_EV_FEATURES)), dtype=dtype
+        )
+        _write_active_evs(interface, observation)
+        return observation
+
+    return SimObservation(space_function, obs_function, "active evs", _write_active_evs)
+
+
+# Upcoming arrival observation factory function.
+# Names of the columns of arrival_forecast_observation, in order.
+ARRIVAL_FORECAST_FEATURES: Tuple[str, ...] = ("arrivals", "demand")
+
+
+class _ArrivalIndex:
+    """ The plugin events of an interface's event queue, bucketed by
+    timestamp in increasing order, with a position past the buckets
+    already processed by the simulation.
+    """
+
+    __slots__ = ("_timestamps", "_counts", "_demands", "_position")
+
+    _timestamps: List[int]
+    _counts: List[int]
+    _demands: List[float]
+    _position: int
+
+    def __init__(self, interface: GymTrainedInterface) -> None:
+        buckets: Dict[int, List[float]] = {}
+        for timestamp, demand in interface.upcoming_plugins():
+            bucket: List[float] = buckets.setdefault(timestamp, [0, 0.0])
+            bucket[0] += 1
+            bucket[1] += demand
+        self._timestamps = sorted(buckets)
+        self._counts = [buckets[timestamp][0] for timestamp in self._timestamps]
+        self._demands = [buckets[timestamp][1] for timestamp in self._timestamps]
+        self._position = 0
+
+    def write(self, current_time: int, out: np.ndarray) -> None:
+        """ Write the number and total demand of the plugins processed
+        at each of the next out.shape[0] timesteps into the rows of out.
+        """
+        timestamps: List[int] = self._timestamps
+        # Simulator.step processes the events up to and including the
+        # new current time, so only events at timestep 0 are left
+        # unprocessed at the current time.
+        if current_time > 0:
+            while (
+                self._position < len(timestamps)
+                and timestamps[self._position] <= current_time
+            ):
+                self._position += 1
+        out.fill(0)
+        horizon: int = out.shape[0]
+        for position in range(self._position, len(timestamps)):
+            row: int = max(timestamps[position] - current_time - 1, 0)
+            if row >= horizon:
+                break
+            out[row, 0] += self._counts[position]
+            out[row, 1] += self._demands[position]
+
+
+def arrival_forecast_observation(
+    horizon: int, dtype: DTypeLike = "float"
+) -> SimObservation:
+    """ Generates a SimObservation instance that wraps functions to
+    observe the EVs arriving over the next horizon timesteps.
+
+    Row i of the observation holds the features named in
+    ARRIVAL_FORECAST_FEATURES of the EVs that will plug in when the
+    simulation advances to timestep current_time + 1 + i: their number
+    and their total requested energy in amp periods. Plugins not yet
+    processed at the current time (at timestep 0, those at timestep 0)
+    are counted in row 0.
+
+    The plugin events of a simulation's event queue are indexed by
+    timestamp on its first observation, so that later observations
+    take time proportional to horizon rather than to the size of the
+    event queue. Indices are kept by the returned observation object,
+    keyed by event queue, so a new scenario (e.g. one built by a
+    RebuildingEnv, or a reset copy of the initial simulation) is
+    indexed anew. Plugin events added to an event queue after its
+    first observation are not observed.
+
+    Args:
+        horizon (int): Number of rows of the observation, i.e. the
+            number of future timesteps observed.
+        dtype (DTypeLike): Dtype of the observation.
+    """
+    # Arrival indices of the event queues observed, keyed by those event
+    # queues. Each index is built on the first observation of its event
+    # queue (i.e. at reset) and advanced with the simulation.
+    indices: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    # noinspection PyUnusedLocal
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> spaces.Space:
+        return spaces.Box(
+            low=0,
+            high=np.inf,
+            shape=(horizon, len(ARRIVAL_FORECAST_FEATURES)),
+            dtype=dtype,
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        event_queue: EventQueue = interface.event_queue
+        index: Optional[_ArrivalIndex] = indices.get(event_queue)
+        if index is None:
+            index = _ArrivalIndex(interface)
+            indices[event_queue] = index
+        index.write(interface.current_time, out)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def obs_function(interface: GymTrainedInterface) -> np.ndarray:
+        observation: np.ndarray = np.empty(
+            (horizon, len(ARRIVAL_FORECAST_FEATURES)), dtype=dtype
+        )
+        out_function(interface, observation)
+        return observation
+
+    return SimObservation(
+        space_function, obs_function, "arrival forecast", out_function
+    )
+
+
+# History observation factory function.
+class _History:
+    """ The last length frames of an observation of one interface, in a
+    ring buffer of twice that length holding each frame twice (at
+    position i and i + length), so that the frames from oldest to
+    newest are always the contiguous slice ending at the newest frame's
+    second copy.
+    """
+
+    __slots__ = ("_buffer", "_length", "_position", "_time")
+
+    _buffer: np.ndarray
+    _length: int
+    _position: int
+    _time: Optional[int]
+
+    def __init__(self, length: int, space: spaces.Space) -> None:
+        self._buffer = np.empty((2 * length,) + space.shape, dtype=space.dtype)
+        self._length = length
+        self._position = length - 1
+        self._time = None
+
+    def update(
+        self, observation: SimObservation, interface: GymTrainedInterface
+    ) -> np.ndarray:
+        """ Add the current frame of observation to the history, unless
+        the current time has already been observed, in which case its
+        frame is overwritten. Periods elapsed since the last observed
+        time hold the last observed frame. Return a view of the frames,
+        oldest first.
+        """
+        current_time: int = interface.current_time
+        length: int = self._length
+        if self._time is not None and current_time > self._time:
+            # The newest frame is not overwritten by the held frames, as
+            # at most length - 1 are written before the current frame.
+            previous: np.ndarray = self._buffer[self._position + length]
+            for _ in range(min(current_time - self._time, length) - 1):
+                self._position = (self._position + 1) % length
+                self._buffer[self._position] = previous
+                self._buffer[self._position + length] = previous
+            self._position = (self._position + 1) % length
+        frame: np.ndarray = self._buffer[self._position + length]
+        observation.get_obs(interface, out=frame)
+        if self._time is None or current_time < self._time:
+            self._buffer[:] = frame
+        else:
+            self._buffer[self._position] = frame
+        self._time = current_time
+        return self._buffer[self._position + 1 : self._position + 1 + length]
+
+
+def history_observation(
+    observation: SimObservation, length: int, name: Optional[str] = None
+) -> SimObservation:
+    """ Generates a SimObservation instance that wraps functions to
+    observe the last length frames of another observation, e.g. of the
+    per-station demands over the last length timesteps.
+
+    The observation has shape (length,) + the shape of observation's
+    space, with one frame per period, ordered from oldest to newest.
+    Each interface's history starts with length copies of its first
+    frame (as after a reset). When the interface is observed at a later
+    timestep, a frame is added for every period elapsed: periods that
+    were not observed, e.g. skipped idle periods or the periods of a
+    multi-period action, hold the last observed frame, and the newest
+    frame is the current one. Observing it again at the same timestep
+    replaces the newest frame.
+
+    Histories are kept by the returned observation object, one per
+    interface it observes, so that environments (or observation
+    objects) observing different interfaces do not share frames. Frames
+    are kept in a ring buffer into which observation writes each frame
+    in place, so updating the history costs one frame rather than a
+    concatenation of all length frames. The out_function of the
+    returned observation copies the history into the caller's array
+    without allocating.
+
+    Args:
+        observation (SimObservation): Observation whose history is
+            observed. Its space must be a Box.
+        length (int): Number of frames observed.
+        name (str): Name of the observation. Default the name of
+            observation followed by " history".
+    """
+    # Histories of the interfaces observed, keyed by those interfaces.
+    histories: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> spaces.Space:
+        space: spaces.Space = observation.get_space(interface)
+        if not isinstance(space, spaces.Box):
+            raise TypeError(
+                f"History observations require a Box space, but observation "
+                f"{observation.name} has space {space}."
+            )
+        shape: Tuple[int, ...] = (length,) + space.shape
+        return spaces.Box(
+            low=np.broadcast_to(space.low, shape),
+            high=np.broadcast_to(space.high, shape),
+            dtype=space.dtype,
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def frames(interface: GymTrainedInterface) -> np.ndarray:
+        history: Optional[_History] = histories.get(interface)
+        if history is None:
+            history = _History(length, observation.get_space(interface))
+            histories[interface] = history
+        return history.update(observation, interface)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def obs_function(interface: GymTrainedInterface) -> np.ndarray:
+        return frames(interface).copy()
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        out[...] = frames(interface)
+
+    return SimObservation(
+        space_function,
+        obs_function,
+        name if name is not None else f"{observation.name} history",
+        out_function,
     )
 
 
 # Network-wide observation factory functions.
-def _constraints_observation(attribute: str, name: str) -> SimObservation:
+def _constraints_observation(
+    attribute: str, name: str, dtype: DTypeLike
+) -> SimObservation:
     # noinspection PyMissingOrEmptyDocstring
     def space_function(interface: GymTrainedInterface) -> spaces.Space:
         return spaces.Box(
             low=-np.inf,
             high=np.inf,
             shape=getattr(interface.get_constraints(), attribute).shape,
-            dtype="float",
+            dtype=dtype,
         )
 
     # noinspection PyMissingOrEmptyDocstring
     def obs_function(interface: GymTrainedInterface) -> np.ndarray:
-        return getattr(interface.get_constraints(), attribute)
+        return np.asarray(getattr(interface.get_constraints(), attribute), dtype=dtype)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        out[...] = getattr(interface.get_constraints(), attribute)
 
-    return SimObservation(space_function, obs_function, name=name)
+    return SimObservation(space_function, obs_function, name, out_function)
 
 
-def constraint_matrix_observation() -> SimObservation:
+def constraint_matrix_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe the network constraint matrix.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation.
     """
-    return _constraints_observation("constraint_matrix", "constraint matrix")
+    return _constraints_observation("constraint_matrix", "constraint matrix", dtype)
 
 
-def magnitudes_observation() -> SimObservation:
+def magnitudes_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe the network limiting current magnitudes in amps.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation.
     """
-    return _constraints_observation("magnitudes", "magnitudes")
+    return _constraints_observation("magnitudes", "magnitudes", dtype)
 
 
-def phases_observation() -> SimObservation:
+def constraint_matrix_coo_observation(dtype: DTypeLike = "float") -> SimObservation:
+    """ Generates a SimObservation instance that wraps functions to
+    observe the nonzero entries of the network constraint matrix in
+    coordinate (COO) format, as an array with one row per nonzero entry
+    holding the entry's row index, column index, and value, in
+    row-major order.
+
+    The constraint matrix of large three-phase networks is mostly
+    zeros, so this observation is much smaller than that of
+    constraint_matrix_observation. As the constraint matrix does not
+    change within an episode, consider also giving this observation's
+    name, "constraint matrix coo", in a CustomSimEnv's
+    static_observations, so that it is only computed at reset.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation. Indices are exact
+            in float32 for matrices with fewer than 2 ** 24 rows and
+            columns.
+    """
+
+    # noinspection PyMissingOrEmptyDocstring
+    def space_function(interface: GymTrainedInterface) -> spaces.Space:
+        return spaces.Box(
+            low=-np.inf,
+            high=np.inf,
+            shape=(np.count_nonzero(interface.get_constraints().constraint_matrix), 3),
+            dtype=dtype,
+        )
+
+    # noinspection PyMissingOrEmptyDocstring
+    def obs_function(interface: GymTrainedInterface) -> np.ndarray:
+        return np.asarray(_constraint_matrix_coo(interface), dtype=dtype)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        out[...] = _constraint_matrix_coo(interface)
+
+    return SimObservation(
+        space_function, obs_function, "constraint matrix coo", out_function
+    )
+
+
+def _constraint_matrix_coo(interface: GymTrainedInterface) -> np.ndarray:
+    """ Return the nonzero entries of the constraint matrix as an array
+    of (row, column, value) rows.
+    """
+    constraint_matrix: np.ndarray = interface.get_constraints().constraint_matrix
+    rows, columns = np.nonzero(constraint_matrix)
+    return np.stack([rows, columns, constraint_matrix[rows, columns]], axis=1)
+
+
+def phases_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe the network phases.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation.
     """
     # noinspection PyMissingOrEmptyDocstring
     def space_function(interface: GymTrainedInterface) -> spaces.Space:
@@ -227,17 +667,21 @@ def phases_observation() -> SimObservation:
             low=-np.inf,
             high=np.inf,
             shape=interface.infrastructure_info().phases.shape,
-            dtype="float",
+            dtype=dtype,
         )
 
     # noinspection PyMissingOrEmptyDocstring
     def obs_function(interface: GymTrainedInterface) -> np.ndarray:
-        return interface.infrastructure_info().phases
+        return np.asarray(interface.infrastructure_info().phases, dtype=dtype)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        out[...] = interface.infrastructure_info().phases
 
-    return SimObservation(space_function, obs_function, name="phases")
+    return SimObservation(space_function, obs_function, "phases", out_function)
 
 
-def timestep_observation() -> SimObservation:
+def timestep_observation(dtype: DTypeLike = "float") -> SimObservation:
     """ Generates a SimObservation instance that wraps functions to
     observe the current timestep of the simulation, in periods.
 
@@ -245,14 +689,22 @@ def timestep_observation() -> SimObservation:
     observations, the observed timestep is one greater than than that
     returned by the simulation. Simulations thus start at timestep 1
     from an RL agent's perspective.
+
+    Args:
+        dtype (DTypeLike): Dtype of the observation. Timesteps are
+            integers, so integer dtypes are exact.
     """
     # noinspection PyUnusedLocal
     # noinspection PyMissingOrEmptyDocstring
     def space_function(interface: GymTrainedInterface) -> spaces.Space:
-        return spaces.Box(low=0, high=np.inf, shape=(1,), dtype="float")
+        return spaces.Box(low=0, high=np.inf, shape=(1,), dtype=dtype)
 
     # noinspection PyMissingOrEmptyDocstring
     def obs_function(interface: GymTrainedInterface) -> np.ndarray:
-        return np.array(interface.current_time + 1)
+        return np.array(interface.current_time + 1, dtype=dtype)
+
+    # noinspection PyMissingOrEmptyDocstring
+    def out_function(interface: GymTrainedInterface, out: np.ndarray) -> None:
+        out[...] = interface.current_time + 1
 
-    return SimObservation(space_function, obs_function, name="timestep")
+    return SimObservation(space_function, obs_function, "timestep", out_function)
@@ -0,0 +1,450 @@
+# coding=utf-8
+"""
+Recording of environment trajectories to columnar, memory-mapped files
+for offline RL and debugging.
+
+A recording is a directory containing a metadata.json file and, for
+each chunk of rows, one .npy file per column. Each row is a timestep:
+the observation returned by reset or step, the action that led to it,
+the reward, done, and whether the row starts an episode (first).
+Rows starting an episode have zero action and reward. Metadata is
+replaced atomically each time rows are flushed, so readers may open a
+recording while it is being written and see every flushed row.
+"""
+import json
+import os
+import queue
+import threading
+from typing import Optional, Dict, List, Any, Tuple
+
+import gym
+import numpy as np
+from gym import spaces
+
+METADATA_FILE = "metadata.json"
+OBSERVATION_PREFIX = "observation."
+
+
+def _chunk_path(directory: str, chunk: int, column: str) -> str:
+    """ Return the path of the file storing column in chunk. """
+    return os.path.join(directory, f"chunk-{chunk:06d}", f"{column}.npy")
+
+
+def _prepare_directory(directory: str) -> None:
+    """ Create directory if it does not exist, and check it is empty. """
+    os.makedirs(directory, exist_ok=True)
+    if os.listdir(directory):
+        raise ValueError(f"Directory {directory} is not empty.")
+
+
+class TrajectoryWriter:
+    """ Writes timesteps of an environment with a Dict observation space
+    (e.g. CustomSimEnv) to a recording directory.
+
+    Columns are preallocated in chunks of chunk_size rows, one
+    memory-mapped .npy file per column: one per key of the observation
+    space (named observation.<key>), plus action, reward, done, and
+    first. Recording a timestep copies it into the current chunk;
+    flushing chunks to disk and updating the metadata is done by a
+    background thread.
+
+    Args:
+        directory (str): Directory in which to write the recording.
+            It is created if it does not exist, and must be empty.
+        observation_space (spaces.Dict): Observation space of the
+            environment. Observations must have the shapes of its
+            subspaces (up to dimensions of size 1).
+        action_space (spaces.Space): Action space of the environment.
+        chunk_size (int): Number of rows per chunk.
+        flush_interval (int): Number of rows recorded between
+            flushes. Default chunk_size, i.e. rows are flushed when a
+            chunk is filled.
+    """
+
+    directory: str
+    chunk_size: int
+    flush_interval: int
+    num_rows: int
+    _columns: Dict[str, Tuple[Tuple[int, ...], np.dtype]]
+    _chunk: int
+    _chunk_row: int
+    _chunk_arrays: Dict[str, np.memmap]
+    _chunk_rows: List[int]
+    _flush_queue: "queue.Queue[Optional[Tuple[Dict[str, np.memmap], int, int]]]"
+    _flush_thread: threading.Thread
+    _flush_error: Optional[BaseException]
+    _closed: bool
+
+    def __init__(
+        self,
+        directory: str,
+        observation_space: spaces.Dict,
+        action_space: spaces.Space,
+        chunk_size: int = 4096,
+        flush_interval: Optional[int] = None,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1. Got {chunk_size}.")
+        if flush_interval is not None and flush_interval < 1:
+            raise ValueError(
+                f"flush_interval must be at least 1. Got {flush_interval}."
+            )
+        if not isinstance(observation_space, spaces.Dict):
+            raise TypeError(
+                f"Recording requires a Dict observation space. Got "
+                f"{type(observation_space)}."
+            )
+        _prepare_directory(directory)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.flush_interval = chunk_size if flush_interval is None else flush_interval
+        self.num_rows = 0
+        self._columns = {
+            OBSERVATION_PREFIX + key: (space.shape, np.dtype(space.dtype))
+            for key, space in observation_space.spaces.items()
+        }
+        self._columns["action"] = (action_space.shape, np.dtype(action_space.dtype))
+        self._columns["reward"] = ((), np.dtype(np.float64))
+        self._columns["done"] = ((), np.dtype(bool))
+        self._columns["first"] = ((), np.dtype(bool))
+        self._chunk = -1
+        self._chunk_row = chunk_size
+        self._chunk_arrays = {}
+        self._chunk_rows = []
+        self._flush_error = None
+        self._closed = False
+        # Write empty metadata so that readers may open the recording
+        # immediately.
+        self._write_metadata()
+        self._flush_queue = queue.Queue()
+        self._flush_thread = threading.Thread(
+            target=self._flush_worker, name="TrajectoryWriter", daemon=True
+        )
+        self._flush_thread.start()
+
+    def record(
+        self,
+        observation: Dict[str, np.ndarray],
+        action: Optional[np.ndarray],
+        reward: float,
+        done: bool,
+        first: bool,
+    ) -> None:
+        """ Copy a timestep into the current chunk.
+
+        Args:
+            observation (Dict[str, np.ndarray]): Observation returned by
+                reset or step.
+            action (Optional[np.ndarray]): Action that led to the
+                observation, or None if first (recorded as zeros).
+            reward (float): Reward returned with the observation.
+            done (bool): Whether the observation ends an episode.
+            first (bool): Whether the observation starts an episode.
+
+        Returns:
+            None
+        """
+        self._raise_flush_error()
+        if self._chunk_row == self.chunk_size:
+            self._new_chunk()
+        row: int = self._chunk_row
+        for key, value in observation.items():
+            column: np.memmap = self._chunk_arrays[OBSERVATION_PREFIX + key]
+            # Observations may differ in shape from their space only by
+            # dimensions of size 1 (e.g. a scalar timestep).
+            if np.size(value) != column[row].size:
+                raise ValueError(
+                    f"Observation {key} has shape {np.shape(value)}; expected "
+                    f"{column.shape[1:]} from the observation space."
+                )
+            column[row] = np.reshape(value, column.shape[1:])
+        if action is not None:
+            self._chunk_arrays["action"][row] = action
+        self._chunk_arrays["reward"][row] = reward
+        self._chunk_arrays["done"][row] = done
+        self._chunk_arrays["first"][row] = first
+        self._chunk_row += 1
+        self.num_rows += 1
+        if (
+            self._chunk_row == self.chunk_size
+            or not self.num_rows % self.flush_interval
+        ):
+            self._request_flush()
+
+    def flush(self) -> None:
+        """ Flush all recorded rows to disk and wait for the flush to
+        complete.
+
+        Returns:
+            None
+        """
+        self._request_flush()
+        self._flush_queue.join()
+        self._raise_flush_error()
+
+    def close(self) -> None:
+        """ Flush all recorded rows and stop the flush thread.
+
+        Returns:
+            None
+        """
+        if not self._closed:
+            self._closed = True
+            self.flush()
+            self._flush_queue.put(None)
+            self._flush_thread.join()
+            self._chunk_arrays = {}
+
+    def _new_chunk(self) -> None:
+        """ Preallocate the columns of the next chunk. """
+        self._chunk += 1
+        self._chunk_row = 0
+        self._chunk_rows.append(0)
+        os.makedirs(os.path.dirname(_chunk_path(self.directory, self._chunk, "x")))
+        self._chunk_arrays = {
+            column: np.lib.format.open_memmap(
+                _chunk_path(self.directory, self._chunk, column),
+                mode="w+",
+                dtype=dtype,
+                shape=(self.chunk_size,) + shape,
+            )
+            for column, (shape, dtype) in self._columns.items()
+        }
+
+    def _request_flush(self) -> None:
+        """ Queue the rows of the current chunk to be flushed. """
+        if self._chunk >= 0:
+            self._flush_queue.put((self._chunk_arrays, self._chunk, self._chunk_row))
+
+    def _raise_flush_error(self) -> None:
+        """ Raise any error that occurred in the flush thread. """
+        if self._flush_error is not None:
+            raise RuntimeError("Flushing the recording failed.") from self._flush_error
+
+    def _flush_worker(self) -> None:
+        """ Flush queued chunks and update the metadata until closed. """
+        while True:
+            request = self._flush_queue.get()
+            try:
+                if request is None:
+                    return
+                arrays, chunk, rows = request
+                for array in arrays.values():
+                    array.flush()
+                if rows > self._chunk_rows[chunk]:
+                    self._chunk_rows[chunk] = rows
+                    self._write_metadata()
+            except BaseException as e:
+                self._flush_error = e
+            finally:
+                self._flush_queue.task_done()
+
+    def _write_metadata(self) -> None:
+        """ Atomically replace the metadata with the rows flushed so
+        far.
+        """
+        metadata: Dict[str, Any] = {
+            "chunk_size": self.chunk_size,
+            "columns": {
+                column: {"shape": list(shape), "dtype": dtype.str}
+                for column, (shape, dtype) in self._columns.items()
+            },
+            "chunk_rows": list(self._chunk_rows),
+            "num_rows": sum(self._chunk_rows),
+        }
+        path: str = os.path.join(self.directory, METADATA_FILE)
+        temporary_path: str = path + ".tmp"
+        with open(temporary_path, "w") as outfile:
+            json.dump(metadata, outfile)
+        os.replace(temporary_path, path)
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """ Wrapper recording every reset and step of an environment with a
+    Dict observation space (e.g. CustomSimEnv) to a directory using a
+    TrajectoryWriter.
+
+    Column shapes and dtypes are taken from the observation and action
+    spaces at the first reset; observations must keep these shapes
+    for the whole recording.
+
+    Args:
+        env (gym.Env): Environment to record.
+        directory (str): See TrajectoryWriter.
+        chunk_size (int): See TrajectoryWriter.
+        flush_interval (int): See TrajectoryWriter.
+    """
+
+    directory: str
+    chunk_size: int
+    flush_interval: Optional[int]
+    writer: Optional[TrajectoryWriter]
+
+    def __init__(
+        self,
+        env: gym.Env,
+        directory: str,
+        chunk_size: int = 4096,
+        flush_interval: Optional[int] = None,
+    ) -> None:
+        super().__init__(env)
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1. Got {chunk_size}.")
+        if flush_interval is not None and flush_interval < 1:
+            raise ValueError(
+                f"flush_interval must be at least 1. Got {flush_interval}."
+            )
+        _prepare_directory(directory)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.writer = None
+
+    @property
+    def num_rows(self) -> int:
+        """ Return the number of rows recorded. """
+        return self.writer.num_rows if self.writer is not None else 0
+
+    def reset(self, **kwargs) -> Any:
+        result: Any = self.env.reset(**kwargs)
+        observation: Dict[str, np.ndarray] = (
+            result[0] if kwargs.get("return_info") else result
+        )
+        if self.writer is None:
+            self.writer = TrajectoryWriter(
+                self.directory,
+                self.env.observation_space,
+                self.env.action_space,
+                chunk_size=self.chunk_size,
+                flush_interval=self.flush_interval,
+            )
+        self.writer.record(observation, None, 0.0, False, True)
+        return result
+
+    def step(
+        self, action: np.ndarray
+    ) -> Tuple[Dict[str, np.ndarray], float, bool, Dict[Any, Any]]:
+        observation, reward, done, info = self.env.step(action)
+        self.writer.record(observation, action, reward, done, False)
+        return observation, reward, done, info
+
+    def flush(self) -> None:
+        """ See TrajectoryWriter.flush. """
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self) -> None:
+        """ Close the writer and the wrapped environment.
+
+        Returns:
+            None
+        """
+        if self.writer is not None:
+            self.writer.close()
+        super().close()
+
+
+class TrajectoryReader:
+    """ Reader for recordings made by TrajectoryWriter, including
+    recordings that are still being written. Only rows flushed when
+    the reader was created (or last refreshed) are read.
+
+    Args:
+        directory (str): Directory containing the recording.
+    """
+
+    directory: str
+    metadata: Dict[str, Any]
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self.metadata["num_rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        """ Return the names of the recorded columns. """
+        return list(self.metadata["columns"])
+
+    @property
+    def observation_keys(self) -> List[str]:
+        """ Return the keys of the recorded observations. """
+        return [
+            column[len(OBSERVATION_PREFIX) :]
+            for column in self.columns
+            if column.startswith(OBSERVATION_PREFIX)
+        ]
+
+    def refresh(self) -> None:
+        """ Reload the metadata to read rows flushed since this reader
+        was created.
+
+        Returns:
+            None
+        """
+        with open(os.path.join(self.directory, METADATA_FILE)) as infile:
+            self.metadata = json.load(infile)
+
+    def chunks(self, column: str) -> List[np.ndarray]:
+        """ Return read-only memory maps of the flushed rows of a column,
+        one per chunk.
+
+        Args:
+            column (str): Name of the column.
+
+        Returns:
+            List[np.ndarray]: Memory-mapped rows of each chunk.
+        """
+        if column not in self.metadata["columns"]:
+            raise KeyError(f"No column {column} in recording.")
+        return [
+            np.load(_chunk_path(self.directory, chunk, column), mmap_mode="r")[:rows]
+            for chunk, rows in enumerate(self.metadata["chunk_rows"])
+            if rows
+        ]
+
+    def read(self, column: str) -> np.ndarray:
+        """ Return all flushed rows of a column.
+
+        Args:
+            column (str): Name of the column, e.g. "reward" or
+                "observation.arrivals".
+
+        Returns:
+            np.ndarray: Array with one entry per row.
+        """
+        chunks: List[np.ndarray] = self.chunks(column)
+        if not chunks:
+            column_metadata: Dict[str, Any] = self.metadata["columns"][column]
+            return np.zeros(
+                [0] + column_metadata["shape"], dtype=column_metadata["dtype"]
+            )
+        return np.concatenate(chunks)
+
+    def transitions(self) -> Dict[str, Any]:
+        """ Return the (observation, action, reward, next_observation,
+        done) transitions in the recording.
+
+        Returns:
+            Dict[str, Any]: Dict with keys observation and
+                next_observation (each a dict mapping observation keys
+                to arrays), action, reward, and done, with one entry per
+                transition.
+        """
+        first: np.ndarray = self.read("first")
+        # Row i + 1 continues the episode of row i unless it is first.
+        indices: np.ndarray = np.flatnonzero(~first[1:])
+        observations: Dict[str, np.ndarray] = {
+            key: self.read(OBSERVATION_PREFIX + key) for key in self.observation_keys
+        }
+        return {
+            "observation": {key: value[indices] for key, value in observations.items()},
+            "action": self.read("action")[indices + 1],
+            "reward": self.read("reward")[indices + 1],
+            "next_observation": {
+                key: value[indices + 1] for key, value in observations.items()
+            },
+            "done": self.read("done")[indices + 1],
+        }
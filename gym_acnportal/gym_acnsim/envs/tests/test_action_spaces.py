@@ -11,6 +11,8 @@ from ..action_spaces import (
     SimAction,
     single_charging_schedule,
     zero_centered_single_charging_schedule,
+    charging_schedule,
+    zero_centered_charging_schedule,
 )
 from ...interfaces import GymTrainedInterface
 
@@ -44,6 +46,19 @@ class TestSimAction(unittest.TestCase):
             self.sim_action.get_schedule(self.interface, array), {"a": [0]}
         )
 
+    def test_get_action_not_implemented(self) -> None:
+        with self.assertRaises(NotImplementedError):
+            self.sim_action.get_action(self.interface, {"a": [0]})
+
+    def test_get_action(self) -> None:
+        sim_action: SimAction = SimAction(
+            self.space_function,
+            self.to_schedule,
+            self.name,
+            lambda interface, schedule: np.array(schedule["a"]),
+        )
+        np.testing.assert_equal(sim_action.get_action(self.interface, {"a": [3]}), [3])
+
 
 class TestSingleChargingSchedule(unittest.TestCase):
     # Some class variables are defined outside of setUpClass so that
@@ -134,6 +149,46 @@ class TestSingleChargingSchedule(unittest.TestCase):
             },
         )
 
+    def test_single_to_action(self) -> None:
+        action: np.ndarray = np.array([self.min_rate + self.offset, self.max_rate])
+        np.testing.assert_allclose(
+            self.sim_action.get_action(
+                self.interface, self.sim_action.get_schedule(self.interface, action)
+            ),
+            action,
+        )
+
+    def test_single_to_action_truncated_and_padded(self) -> None:
+        schedule: Dict[str, List[float]] = self.sim_action.get_schedule(
+            self.interface, np.zeros(2)
+        )
+        np.testing.assert_allclose(
+            self.sim_action.get_action(
+                self.interface, {self.station_ids[0]: schedule[self.station_ids[0]]}
+            ),
+            self.sim_action.get_action(
+                self.interface,
+                {
+                    self.station_ids[0]: schedule[self.station_ids[0]] + [3],
+                    self.station_ids[1]: [0],
+                },
+            ),
+        )
+
+    # noinspection PyMethodMayBeStatic
+    def _float32_action(self) -> SimAction:
+        return single_charging_schedule(np.float32)
+
+    def test_float32_dtype(self) -> None:
+        sim_action: SimAction = self._float32_action()
+        self.assertEqual(sim_action.get_space(self.interface).dtype, np.float32)
+        action: np.ndarray = sim_action.get_action(
+            self.interface,
+            sim_action.get_schedule(self.interface, np.array([1.0, 2.0])),
+        )
+        self.assertEqual(action.dtype, np.float32)
+        np.testing.assert_allclose(action, [1.0, 2.0])
+
     def test_single_error_schedule(self) -> None:
         with self.assertRaises(TypeError):
             _ = self.sim_action.get_schedule(
@@ -161,6 +216,9 @@ class TestZeroCenteredSingleChargingSchedule(TestSingleChargingSchedule):
     def test_correct_on_init_single_name(self) -> None:
         self.assertEqual(self.sim_action.name, "zero-centered single schedule")
 
+    def _float32_action(self) -> SimAction:
+        return zero_centered_single_charging_schedule(np.float32)
+
     def test_single_space_function(self) -> None:
         self._test_space_function_helper(
             self.interface, self.shifted_minimums[0], self.shifted_max
@@ -216,5 +274,104 @@ class TestZeroCenteredSingleChargingSchedule(TestSingleChargingSchedule):
         )
 
 
+class TestChargingSchedule(unittest.TestCase):
+    max_rate: float = 16.0
+    min_rate: float = 6.0
+    horizon: int = 3
+
+    # noinspection PyMissingOrEmptyDocstring
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.sim_action: SimAction = charging_schedule(cls.horizon)
+        cls.station_ids: List[str] = ["T1", "T2"]
+        cls.interface: Any = create_autospec(GymTrainedInterface)
+        cls.interface.station_ids = cls.station_ids
+        cls.interface.max_pilot_signal = lambda station_id: cls.max_rate
+        cls.interface.min_pilot_signal = lambda station_id: cls.min_rate
+        cls.action: np.ndarray = np.array([[0, 1, 2], [3, 4, 5]])
+
+    def test_correct_on_init_name(self) -> None:
+        self.assertEqual(self.sim_action.name, "schedule")
+
+    def test_space_function(self) -> None:
+        out_space: Space = self.sim_action.get_space(self.interface)
+        self.assertEqual(out_space.shape, (len(self.station_ids), self.horizon))
+        np.testing.assert_equal(out_space.low, 0)
+        np.testing.assert_equal(out_space.high, self.max_rate)
+
+    # noinspection PyMethodMayBeStatic
+    def _float32_action(self) -> SimAction:
+        return charging_schedule(self.horizon, np.float32)
+
+    def test_float32_dtype(self) -> None:
+        sim_action: SimAction = self._float32_action()
+        self.assertEqual(sim_action.get_space(self.interface).dtype, np.float32)
+        action: np.ndarray = sim_action.get_action(
+            self.interface, sim_action.get_schedule(self.interface, self.action)
+        )
+        self.assertEqual(action.dtype, np.float32)
+        np.testing.assert_allclose(action, self.action)
+
+    def test_to_schedule(self) -> None:
+        self.assertEqual(
+            self.sim_action.get_schedule(self.interface, self.action),
+            {"T1": [0, 1, 2], "T2": [3, 4, 5]},
+        )
+
+    def test_to_action(self) -> None:
+        np.testing.assert_allclose(
+            self.sim_action.get_action(
+                self.interface,
+                self.sim_action.get_schedule(self.interface, self.action),
+            ),
+            self.action,
+        )
+
+    def test_to_action_truncated_and_padded(self) -> None:
+        action: np.ndarray = self.sim_action.get_action(
+            self.interface, {"T1": [1, 2, 3, 4], "T2": [5]}
+        )
+        zero_action: np.ndarray = self.sim_action.get_action(self.interface, {})
+        self.assertEqual(action.shape, (2, self.horizon))
+        np.testing.assert_allclose(action - zero_action, [[1, 2, 3], [5, 0, 0]])
+
+    def test_to_schedule_wrong_shape(self) -> None:
+        with self.assertRaises(TypeError):
+            self.sim_action.get_schedule(self.interface, np.array([0, 1]))
+        with self.assertRaises(TypeError):
+            self.sim_action.get_schedule(self.interface, np.ones((3, 2)))
+
+
+class TestZeroCenteredChargingSchedule(TestChargingSchedule):
+    # noinspection PyMissingOrEmptyDocstring
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.sim_action: SimAction = zero_centered_charging_schedule(cls.horizon)
+
+    def test_correct_on_init_name(self) -> None:
+        self.assertEqual(self.sim_action.name, "zero-centered schedule")
+
+    def _float32_action(self) -> SimAction:
+        return zero_centered_charging_schedule(self.horizon, np.float32)
+
+    def test_space_function(self) -> None:
+        out_space: Space = self.sim_action.get_space(self.interface)
+        offset: float = (self.max_rate + self.min_rate) / 2
+        self.assertEqual(out_space.shape, (len(self.station_ids), self.horizon))
+        np.testing.assert_equal(out_space.low, -offset)
+        np.testing.assert_equal(out_space.high, self.max_rate - offset)
+
+    def test_to_schedule(self) -> None:
+        offset: float = (self.max_rate + self.min_rate) / 2
+        self.assertEqual(
+            self.sim_action.get_schedule(self.interface, self.action),
+            {
+                "T1": [offset, offset + 1, offset + 2],
+                "T2": [offset + 3, offset + 4, offset + 5],
+            },
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
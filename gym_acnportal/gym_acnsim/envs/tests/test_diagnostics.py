@@ -0,0 +1,124 @@
+# coding=utf-8
+""" Tests for diagnosing the copying and allocation overhead of
+environments.
+"""
+import copy
+import tracemalloc
+import unittest
+from typing import Dict, Tuple, Any
+from unittest.mock import Mock
+
+import numpy as np
+from gym import spaces
+
+from .. import BaseSimEnv, CopyAccounting, DiagnosticsWrapper, base_env
+
+
+class CopyingEnv(BaseSimEnv):
+    """ Environment returning its observation through the copying
+    observation property of BaseSimEnv; episodes last episode_length
+    steps.
+    """
+
+    observation_space = spaces.Box(0, np.inf, shape=(100,))
+    action_space = spaces.Box(-1, 1, shape=(1,))
+
+    def __init__(self, episode_length: int = 2) -> None:
+        super().__init__(None)
+        self.episode_length = episode_length
+        self.count = 0
+
+    def reset(self) -> np.ndarray:
+        self.count = 0
+        self.observation = np.zeros(100)
+        return self.observation
+
+    def step(
+        self, action: np.ndarray
+    ) -> Tuple[np.ndarray, float, bool, Dict[Any, Any]]:
+        self.count += 1
+        self.observation = np.full(100, self.count)
+        return self.observation, 0.0, self.count == self.episode_length, {}
+
+
+class TestCopyAccounting(unittest.TestCase):
+    def test_counts_copies_by_site(self) -> None:
+        env = CopyingEnv()
+        env.observation = np.zeros(100)
+        with CopyAccounting() as accounting:
+            for _ in range(3):
+                _ = env.observation
+            _ = env.done
+        stats = accounting.stats
+        observation_sites = [site for site in stats if ".observation:" in site]
+        self.assertEqual(len(observation_sites), 1)
+        self.assertTrue(observation_sites[0].startswith(base_env.__name__))
+        self.assertEqual(stats[observation_sites[0]]["calls"], 3)
+        self.assertGreaterEqual(stats[observation_sites[0]]["bytes"], 3 * 800)
+        self.assertEqual(accounting.total_calls, 4)
+
+    def test_restores_deepcopy(self) -> None:
+        tracing = tracemalloc.is_tracing()
+        with CopyAccounting():
+            self.assertIsNot(base_env.deepcopy, copy.deepcopy)
+        self.assertIs(base_env.deepcopy, copy.deepcopy)
+        self.assertEqual(tracemalloc.is_tracing(), tracing)
+
+    def test_nested(self) -> None:
+        env = CopyingEnv()
+        with CopyAccounting() as outer:
+            with CopyAccounting() as inner:
+                _ = env.observation
+            self.assertEqual(base_env.deepcopy, outer._deepcopy)
+            _ = env.observation
+        self.assertIs(base_env.deepcopy, copy.deepcopy)
+        self.assertEqual(inner.total_calls, 1)
+        self.assertEqual(outer.total_calls, 1)
+
+    def test_reset(self) -> None:
+        env = CopyingEnv()
+        with CopyAccounting() as accounting:
+            _ = env.observation
+        accounting.reset()
+        self.assertEqual(accounting.stats, {})
+        self.assertEqual(accounting.total_bytes, 0)
+
+
+class TestDiagnosticsWrapper(unittest.TestCase):
+    def test_episode_reports(self) -> None:
+        report_callback = Mock()
+        wrapper = DiagnosticsWrapper(
+            CopyingEnv(), top_allocations=3, report_callback=report_callback
+        )
+        self.addCleanup(wrapper.close)
+        for _ in range(2):
+            wrapper.reset()
+            done = False
+            while not done:
+                _, _, done, _ = wrapper.step(np.zeros(1))
+        self.assertEqual(len(wrapper.episode_reports), 2)
+        self.assertEqual(report_callback.call_count, 2)
+        report = wrapper.episode_reports[1]
+        self.assertEqual(report["episode"], 1)
+        self.assertEqual(report["steps"], 2)
+        # One copy of the observation on reset and on each step.
+        self.assertEqual(report["deepcopy_calls"], 3)
+        self.assertEqual(len(report["step_allocated_bytes"]), 2)
+        self.assertLessEqual(len(report["top_allocations"]), 3)
+
+    def test_unfinished_episode_reported_on_close(self) -> None:
+        wrapper = DiagnosticsWrapper(CopyingEnv())
+        wrapper.reset()
+        wrapper.step(np.zeros(1))
+        wrapper.close()
+        self.assertEqual(len(wrapper.episode_reports), 1)
+        self.assertEqual(wrapper.episode_reports[0]["steps"], 1)
+
+    def test_no_report_before_reset(self) -> None:
+        wrapper = DiagnosticsWrapper(CopyingEnv())
+        wrapper.close()
+        self.assertEqual(wrapper.episode_reports, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
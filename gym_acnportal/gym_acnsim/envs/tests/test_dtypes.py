@@ -0,0 +1,60 @@
+# coding=utf-8
+""" Tests for dtype policies. """
+import unittest
+
+import numpy as np
+from gym.spaces import Box, Discrete
+
+from ..dtypes import DtypePolicy, cast_space
+
+
+class TestDtypePolicy(unittest.TestCase):
+    def test_observation_dtype(self) -> None:
+        policy = DtypePolicy(time_dtype=np.int16)
+        self.assertEqual(policy.observation_dtype("arrivals"), np.int16)
+        self.assertEqual(policy.observation_dtype("timestep"), np.int16)
+        self.assertEqual(policy.observation_dtype("demands"), np.float32)
+
+    def test_custom_time_observations(self) -> None:
+        policy = DtypePolicy(time_observations=["demands"])
+        self.assertEqual(policy.observation_dtype("demands"), np.int32)
+        self.assertEqual(policy.observation_dtype("arrivals"), np.float32)
+
+    def test_action_space(self) -> None:
+        space = DtypePolicy().action_space(Box(low=-16, high=16, shape=(2,)))
+        self.assertEqual(space.dtype, np.float32)
+        np.testing.assert_equal(space.low, [-16, -16])
+
+
+class TestCastSpace(unittest.TestCase):
+    def test_float_infinite_bounds(self) -> None:
+        space = cast_space(
+            Box(low=-np.inf, high=np.inf, shape=(2, 2), dtype="float"), np.float32
+        )
+        self.assertEqual(space.dtype, np.float32)
+        self.assertEqual(space.shape, (2, 2))
+        np.testing.assert_equal(space.high, np.inf)
+
+    def test_integer_bounds(self) -> None:
+        space = cast_space(
+            Box(low=np.array([0.5, -np.inf]), high=np.array([np.inf, 2.5])), np.int16
+        )
+        self.assertEqual(space.dtype, np.int16)
+        np.testing.assert_equal(space.low, [1, np.iinfo(np.int16).min])
+        np.testing.assert_equal(space.high, [np.iinfo(np.int16).max, 2])
+
+    def test_int64_infinite_bounds(self) -> None:
+        space = cast_space(Box(low=0, high=np.inf, shape=(1,)), np.int64)
+        np.testing.assert_equal(space.high, [np.iinfo(np.int64).max])
+
+    def test_same_dtype_unchanged(self) -> None:
+        space = Box(low=0, high=1, shape=(1,), dtype=np.float32)
+        self.assertIs(cast_space(space, np.float32), space)
+
+    def test_non_box_unchanged(self) -> None:
+        space = Discrete(3)
+        self.assertIs(cast_space(space, np.float32), space)
+
+
+if __name__ == "__main__":
+    unittest.main()
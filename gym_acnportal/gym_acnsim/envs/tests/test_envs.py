@@ -1,17 +1,42 @@
 # coding=utf-8
 """ Tests for the base ACN-Sim gym environment. """
 import unittest
+from copy import deepcopy
+from datetime import datetime
 from typing import Dict, Callable
-from unittest.mock import create_autospec, Mock
+from unittest.mock import create_autospec, Mock, patch
 
 import numpy as np
-from acnportal.acnsim import Simulator
+import pytz
+from acnportal.acnsim import (
+    Simulator,
+    EV,
+    Battery,
+    PluginEvent,
+    EventQueue,
+    Current,
+    sites,
+)
 from gym import Space
+from gym.spaces import Box, Discrete
 
-from .. import BaseSimEnv, CustomSimEnv, RebuildingEnv
-from ..action_spaces import SimAction
+from .. import (
+    BaseSimEnv,
+    CustomSimEnv,
+    LazyObservation,
+    RebuildingEnv,
+    make_default_sim_env,
+    make_rebuilding_default_sim_env,
+)
+from .. import base_env
+from ..action_spaces import SimAction, charging_schedule
+from ..custom_envs import _network_signature
+from ..dtypes import DtypePolicy
+from ..normalization import RunningMeanStd
+from .. import observation as obs
 from ..observation import SimObservation
 from ...interfaces import GymTrainingInterface, GymTrainedInterface
+from ...timing import StepTimer
 
 
 class TestBaseSimEnv(unittest.TestCase):
@@ -26,7 +51,7 @@ class TestBaseSimEnv(unittest.TestCase):
 
     def test_correct_on_init(self) -> None:
         self.assertEqual(self.env.interface, self.training_interface)
-        self.assertNotEqual(self.env.prev_interface, self.training_interface)
+        self.assertIs(self.env.prev_interface, self.training_interface)
         self.assertNotEqual(self.env._init_snapshot, self.training_interface)
 
         for attr in ["action", "observation", "reward", "done", "info"]:
@@ -86,9 +111,148 @@ class TestBaseSimEnv(unittest.TestCase):
         # PyCharm inspector flags these references as nonexistent in
         # type 'function' as PyCharm doesn't know these are Mocks.
         self.env.store_previous_state.assert_called_once()
-        self.training_interface.step.assert_called_with(dummy_schedule)
+        self.training_interface.step.assert_called_with(
+            dummy_schedule, infeasibility_mode="reject", step_timer=None
+        )
         self.env.update_state.assert_called_once()
 
+    def test_step_fast_forward_idle(self) -> None:
+        self.env.fast_forward_idle = True
+        self.env.action_to_schedule = lambda: {"a": [1]}
+        self.env.interface.step = create_autospec(self.env.interface.step)
+        self.env.interface.fast_forward = Mock(return_value=3)
+
+        # noinspection PyMissingOrEmptyDocstring
+        def update_state() -> None:
+            self.env.info = {"info": None}
+
+        self.env.update_state = update_state
+
+        _, _, _, info = self.env.step(np.array([1]))
+        self.env.interface.fast_forward.assert_called_once()
+        self.assertEqual(info, {"info": None, "idle_periods_skipped": 3})
+
+    def test_step_no_fast_forward_by_default(self) -> None:
+        self.env.action_to_schedule = lambda: {"a": [1]}
+        self.env.interface.step = create_autospec(self.env.interface.step)
+        self.env.interface.fast_forward = Mock(return_value=3)
+        self.env.update_state = Mock()
+        self.env.step(np.array([1]))
+        self.env.interface.fast_forward.assert_not_called()
+
+    def _multi_period_step_helper(self, step_side_effect=None) -> list:
+        self.env.periods_per_action = 3
+        self.env.action_to_schedule = lambda: {"a": [1, 2, 3, 4], "b": [5, 6, 7, 8]}
+        self.mocked_simulator.iteration = 0
+        self.mocked_simulator.event_queue = Mock()
+        self.mocked_simulator.event_queue.empty.return_value = False
+        self.mocked_simulator.network = Mock()
+        self.mocked_simulator.network.active_station_ids = ["a", "b"]
+        submitted_schedules = []
+
+        # noinspection PyMissingOrEmptyDocstring
+        def interface_step(schedule: Dict[str, list], **kwargs) -> None:
+            submitted_schedules.append(schedule)
+            self.assertEqual(len(self.env.schedule["a"]), 1)
+            self.mocked_simulator.iteration += 1
+            if step_side_effect is not None:
+                step_side_effect()
+
+        # noinspection PyMissingOrEmptyDocstring
+        def update_state() -> None:
+            self.env.reward = 1.0
+            self.env.info = {}
+
+        self.env.interface.step = interface_step
+        self.env.reward_from_state = Mock(return_value=1.0)
+        self.env.update_state = update_state
+        return submitted_schedules
+
+    def test_multi_period_step(self) -> None:
+        submitted_schedules = self._multi_period_step_helper()
+        _, reward, _, info = self.env.step(np.ones((2, 4)))
+        self.assertEqual(
+            submitted_schedules,
+            [
+                {"a": [1, 2, 3, 4], "b": [5, 6, 7, 8]},
+                {"a": [2, 3, 4], "b": [6, 7, 8]},
+                {"a": [3, 4], "b": [7, 8]},
+            ],
+        )
+        self.assertEqual(reward, 3.0)
+        self.assertEqual(info, {"periods_stepped": 3})
+        self.assertEqual(self.env.schedule, {"a": [1, 2, 3, 4], "b": [5, 6, 7, 8]})
+        np.testing.assert_equal(self.env.action, np.ones((2, 4)))
+
+    def test_step_infeasibility_mode(self) -> None:
+        self.env.infeasibility_mode = "scale"
+        self.env.action_to_schedule = lambda: {"a": [1]}
+        self.env.interface.step = create_autospec(self.env.interface.step)
+        self.env.update_state = Mock()
+        self.env.step(np.array([1]))
+        self.env.interface.step.assert_called_once_with(
+            {"a": [1]}, infeasibility_mode="scale", step_timer=None
+        )
+
+    def test_step_timed(self) -> None:
+        step_timer: StepTimer = StepTimer()
+        self.env.step_timer = step_timer
+        self.env.action_to_schedule = lambda: {"a": [1]}
+        self.env.interface.step = create_autospec(self.env.interface.step)
+        self.env.update_state = Mock()
+        self.env.step(np.array([1]))
+        self.env.interface.step.assert_called_once_with(
+            {"a": [1]}, infeasibility_mode="reject", step_timer=step_timer
+        )
+        self.assertEqual(step_timer.steps, 1)
+        self.assertEqual(set(step_timer.stats), {"step", "action_to_schedule"})
+
+    def test_step_timer_disabled(self) -> None:
+        step_timer: StepTimer = StepTimer(enabled=False)
+        self.env.step_timer = step_timer
+        self.env.action_to_schedule = lambda: {"a": [1]}
+        self.env.interface.step = create_autospec(self.env.interface.step)
+        self.env.update_state = Mock()
+        self.env.step(np.array([1]))
+        self.assertEqual(step_timer.steps, 0)
+        self.assertEqual(step_timer.stats, {})
+
+    def test_init_snapshot_copied(self) -> None:
+        other_env = BaseSimEnv(self.training_interface)
+        self.assertIsNot(other_env._init_snapshot, self.env._init_snapshot)
+        self.assertFalse(self.env.memory_report()["init_snapshot_shared"])
+
+    def test_init_snapshot_shared(self) -> None:
+        env = BaseSimEnv(self.training_interface, share_init_snapshot=True)
+        other_env = BaseSimEnv(self.training_interface, share_init_snapshot=True)
+        self.assertIs(other_env._init_snapshot, env._init_snapshot)
+        self.assertIsNot(env._init_snapshot, self.env._init_snapshot)
+
+    def test_unknown_infeasibility_mode_error(self) -> None:
+        with self.assertRaises(ValueError):
+            BaseSimEnv(self.training_interface, infeasibility_mode="ignore")
+
+    def test_multi_period_step_stops_on_active_change(self) -> None:
+        # noinspection PyMissingOrEmptyDocstring
+        def unplug() -> None:
+            self.mocked_simulator.network.active_station_ids = ["a"]
+
+        submitted_schedules = self._multi_period_step_helper(unplug)
+        _, reward, _, info = self.env.step(np.ones((2, 4)))
+        self.assertEqual(len(submitted_schedules), 1)
+        self.assertEqual(reward, 1.0)
+        self.assertEqual(info, {"periods_stepped": 1})
+
+    def test_multi_period_step_stops_when_done(self) -> None:
+        # noinspection PyMissingOrEmptyDocstring
+        def finish() -> None:
+            self.mocked_simulator.event_queue.empty.return_value = True
+
+        submitted_schedules = self._multi_period_step_helper(finish)
+        _, _, _, info = self.env.step(np.ones((2, 4)))
+        self.assertEqual(len(submitted_schedules), 1)
+        self.assertEqual(info, {"periods_stepped": 1})
+
     def test_reset(self) -> None:
         self.env.interface = GymTrainingInterface(self.mocked_simulator)
         self.env.prev_interface = GymTrainingInterface(self.mocked_simulator)
@@ -188,6 +352,28 @@ class TestCustomSimEnv(TestBaseSimEnv):
     def test_reward_from_state(self) -> None:
         self.assertEqual(self.env.reward_from_state(), 42 + 1337)
 
+    def test_update_state_timed(self) -> None:
+        step_timer: StepTimer = StepTimer()
+        self.env.step_timer = step_timer
+        self.env.done_from_state = Mock(return_value=False)
+        self.env.update_state()
+        np.testing.assert_equal(self.env.observation["dummy_obs_1"], np.eye(3))
+        self.assertEqual(self.env.reward, 42 + 1337)
+        stats = step_timer.stats
+        self.assertEqual(
+            set(stats),
+            {
+                "observation",
+                "observation.dummy_obs_1",
+                "observation.dummy_obs_2",
+                "reward",
+                "reward.<lambda>",
+                "done",
+                "info",
+            },
+        )
+        self.assertEqual(stats["reward.<lambda>"]["calls"], 2)
+
 
 class TestRebuildingEnvNoGenFunc(TestCustomSimEnv):
     # noinspection PyMissingOrEmptyDocstring
@@ -201,6 +387,13 @@ class TestRebuildingEnvNoGenFunc(TestCustomSimEnv):
             [self.reward_function1, self.reward_function2],
         )
 
+    def test_no_episode_key(self) -> None:
+        self.env.observation_from_state = lambda: np.eye(2)
+        self.env.reset()
+        self.assertIsNone(self.env.episode_key)
+        self.env.reset(seed=7)
+        self.assertIsNone(self.env.episode_seed_sequence)
+
     def test_double_none_error(self) -> None:
         with self.assertRaises(TypeError):
             self.env: RebuildingEnv = RebuildingEnv(
@@ -257,5 +450,902 @@ class TestRebuildingEnv(TestCustomSimEnv):
         np.testing.assert_equal(observation, np.eye(2))
 
 
+class TestRebuildingEnvSeeded(TestCustomSimEnv):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        super().setUp()
+        self.env: RebuildingEnv = self._make_env(seed=42)
+        # The interface is generated by the environment, so the
+        # inherited tests should reference the generated interface.
+        self.training_interface = self.env.interface
+
+    def _make_env(self, seed=None) -> RebuildingEnv:
+        # noinspection PyMissingOrEmptyDocstring
+        def interface_generating_function(
+            rng: np.random.Generator,
+        ) -> GymTrainingInterface:
+            interface = GymTrainingInterface(self.mocked_simulator)
+            interface.tracking_value = int(rng.integers(1e9))
+            return interface
+
+        return RebuildingEnv(
+            None,
+            [self.observation_object1, self.observation_object2],
+            self.action_object,
+            [self.reward_function1, self.reward_function2],
+            interface_generating_function,
+            seed=seed,
+        )
+
+    def _reset_tracking_values(self, env: RebuildingEnv, num_resets: int) -> list:
+        tracking_values = []
+        for _ in range(num_resets):
+            env.reset()
+            tracking_values.append(env.interface.tracking_value)
+        return tracking_values
+
+    def test_correct_on_init(self) -> None:
+        super().test_correct_on_init()
+        self.assertIsNotNone(self.env.episode_key)
+
+    def test_reset(self) -> None:
+        self.env.observation_from_state = lambda: np.eye(2)
+        observation = self.env.reset()
+        self.assertEqual(
+            self.env.prev_interface.tracking_value, self.env.interface.tracking_value
+        )
+        self.assertEqual(
+            self.env._init_snapshot.tracking_value, self.env.interface.tracking_value
+        )
+        np.testing.assert_equal(observation, np.eye(2))
+
+    def test_same_seed_reproducible(self) -> None:
+        other_env: RebuildingEnv = self._make_env(seed=42)
+        self.assertEqual(
+            self.env.interface.tracking_value, other_env.interface.tracking_value
+        )
+        self.assertEqual(
+            self._reset_tracking_values(self.env, 3),
+            self._reset_tracking_values(other_env, 3),
+        )
+
+    def test_episodes_differ(self) -> None:
+        tracking_values = self._reset_tracking_values(self.env, 3)
+        self.assertEqual(len(set(tracking_values)), 3)
+
+    def test_different_seeds_differ(self) -> None:
+        other_env: RebuildingEnv = self._make_env(seed=43)
+        self.assertNotEqual(
+            self._reset_tracking_values(self.env, 3),
+            self._reset_tracking_values(other_env, 3),
+        )
+
+    def test_reset_with_seed(self) -> None:
+        self.env.reset(seed=7)
+        first_value = self.env.interface.tracking_value
+        first_key = self.env.episode_key
+        self._reset_tracking_values(self.env, 2)
+        self.env.reset(seed=7)
+        self.assertEqual(self.env.interface.tracking_value, first_value)
+        self.assertEqual(self.env.episode_key, first_key)
+
+    def test_reset_positional_return_info(self) -> None:
+        self.env.observation_from_state = lambda: np.eye(2)
+        observation, info = self.env.reset(True)
+        np.testing.assert_equal(observation, np.eye(2))
+        self.assertEqual(info, {})
+        with self.assertRaises(TypeError):
+            # noinspection PyArgumentList
+            self.env.reset(False, 7)
+
+    def test_seed_equals_reset_with_seed(self) -> None:
+        other_env: RebuildingEnv = self._make_env()
+        other_env.seed(7)
+        other_env.reset()
+        self.env.reset(seed=7)
+        self.assertEqual(
+            self.env.interface.tracking_value, other_env.interface.tracking_value
+        )
+
+    def test_spawned_seed_sequences(self) -> None:
+        child_sequences = np.random.SeedSequence(0).spawn(2)
+        env1: RebuildingEnv = self._make_env(seed=child_sequences[0])
+        env2: RebuildingEnv = self._make_env(seed=child_sequences[1])
+        self.assertNotEqual(env1.episode_key, env2.episode_key)
+        self.assertNotEqual(
+            env1.interface.tracking_value, env2.interface.tracking_value
+        )
+
+    def test_keyword_only_rng(self) -> None:
+        # noinspection PyMissingOrEmptyDocstring
+        def interface_generating_function(*, rng: np.random.Generator):
+            interface = GymTrainingInterface(self.mocked_simulator)
+            interface.tracking_value = int(rng.integers(1e9))
+            return interface
+
+        env = RebuildingEnv(
+            None,
+            [self.observation_object1],
+            self.action_object,
+            [],
+            interface_generating_function,
+            seed=42,
+        )
+        other_env: RebuildingEnv = self._make_env(seed=42)
+        self.assertEqual(
+            env.interface.tracking_value, other_env.interface.tracking_value
+        )
+
+    def test_positional_default_not_passed_rng(self) -> None:
+        # noinspection PyMissingOrEmptyDocstring
+        def interface_generating_function(tracking_value: int = 3):
+            interface = GymTrainingInterface(self.mocked_simulator)
+            interface.tracking_value = tracking_value
+            return interface
+
+        env = RebuildingEnv(
+            None,
+            [self.observation_object1],
+            self.action_object,
+            [],
+            interface_generating_function,
+            seed=42,
+        )
+        env.reset()
+        self.assertEqual(env.interface.tracking_value, 3)
+
+
+def _simple_interface() -> GymTrainingInterface:
+    """ Return an interface to a Simulator with one EV plugged in. """
+    network = sites.simple_acn(["EVSE-001", "EVSE-002"], aggregate_cap=32 * 208 / 1000)
+    ev = EV(0, 10, 3, "EVSE-001", "EV-001", Battery(100, 0, 100))
+    simulator = Simulator(
+        network,
+        None,
+        EventQueue([PluginEvent(0, ev)]),
+        pytz.timezone("America/Los_Angeles").localize(datetime(2018, 9, 5)),
+        period=5,
+        verbose=False,
+    )
+    return GymTrainingInterface(simulator)
+
+
+class TestEnvMemory(unittest.TestCase):
+    def test_memory_report(self) -> None:
+        env = make_default_sim_env(_simple_interface(), share_init_snapshot=True)
+        env.reset()
+        report = env.memory_report()
+        self.assertTrue(report["init_snapshot_shared"])
+        # The previous interface is the live interface.
+        self.assertEqual(report["prev_interface"], 0)
+        self.assertGreater(report["interface"], 0)
+        self.assertGreater(report["init_snapshot"], 0)
+        self.assertEqual(report["total"], report["interface"] + report["step_state"])
+
+    def test_memory_report_unshared(self) -> None:
+        env = make_default_sim_env(_simple_interface())
+        env.reset()
+        report = env.memory_report()
+        self.assertFalse(report["init_snapshot_shared"])
+        self.assertEqual(
+            report["total"],
+            report["interface"] + report["init_snapshot"] + report["step_state"],
+        )
+
+    def test_envs_share_init_snapshot(self) -> None:
+        interface = _simple_interface()
+        env1 = make_default_sim_env(interface, share_init_snapshot=True)
+        env2 = make_default_sim_env(interface, share_init_snapshot=True)
+        self.assertIs(env1._init_snapshot, env2._init_snapshot)
+        env1.reset()
+        env2.reset()
+        self.assertIsNot(env1.interface, env2.interface)
+        self.assertIsNot(env1.interface, env1._init_snapshot)
+
+    def test_init_snapshot_of_advanced_interface(self) -> None:
+        interface = _simple_interface()
+        env1 = make_default_sim_env(interface)
+        interface._simulator._iteration = 3
+        env2 = make_default_sim_env(interface)
+        self.assertIsNot(env1._init_snapshot, env2._init_snapshot)
+        self.assertEqual(env1._init_snapshot.current_time, 0)
+        self.assertEqual(env2._init_snapshot.current_time, 3)
+
+    def test_rebuilding_env_fixed_scenario_copied_once(self) -> None:
+        env = make_default_sim_env(_simple_interface())
+        with patch.object(base_env, "deepcopy", wraps=deepcopy) as deepcopy_mock:
+            rebuilding_env = RebuildingEnv.from_custom_sim_env(env)
+        self.assertEqual(
+            [call[0][0] for call in deepcopy_mock.call_args_list], [env.interface]
+        )
+        init_snapshot = rebuilding_env._init_snapshot
+        rebuilding_env.reset()
+        self.assertIs(rebuilding_env._init_snapshot, init_snapshot)
+        self.assertIsNot(rebuilding_env.interface, init_snapshot)
+
+    def test_rebuilding_env_memory_report(self) -> None:
+        env = make_rebuilding_default_sim_env(lambda: _simple_interface())
+        env.reset()
+        report = env.memory_report()
+        self.assertFalse(report["init_snapshot_shared"])
+        self.assertEqual(report["prev_interface"], 0)
+        self.assertEqual(
+            report["total"],
+            report["interface"] + report["init_snapshot"] + report["step_state"],
+        )
+
+
+class TestMultiPeriodDefaultEnv(unittest.TestCase):
+    def test_steps_several_periods_per_action(self) -> None:
+        env = make_default_sim_env(_simple_interface(), periods_per_action=3)
+        self.assertEqual(env.action_space.shape, (2, 3))
+        env.reset()
+        periods_stepped = [
+            env.step(np.zeros(env.action_space.shape))[3]["periods_stepped"]
+            for _ in range(2)
+        ]
+        self.assertGreater(max(periods_stepped), 1)
+
+    def test_history_one_frame_per_period(self) -> None:
+        length = 4
+        env = CustomSimEnv(
+            _simple_interface(),
+            [obs.history_observation(obs.timestep_observation(), length)],
+            charging_schedule(3),
+            [],
+            periods_per_action=3,
+        )
+        observed_times = [env.interface.current_time]
+        env.reset()
+        for _ in range(3):
+            observation, _, done, _ = env.step(np.zeros(env.action_space.shape))
+            current_time = env.interface.current_time
+            observed_times.append(current_time)
+            # Each period holds the timestep last observed at or before it.
+            expected = [
+                max(
+                    [time for time in observed_times if time <= period],
+                    default=observed_times[0],
+                )
+                + 1
+                for period in range(current_time - length + 1, current_time + 1)
+            ]
+            np.testing.assert_equal(
+                observation["timestep history"], np.reshape(expected, (length, 1))
+            )
+            if done:
+                break
+
+    def test_rebuilding_env_action_space(self) -> None:
+        env = make_rebuilding_default_sim_env(
+            lambda: _simple_interface(), periods_per_action=3
+        )
+        self.assertEqual(env.action_space.shape, (2, 3))
+
+
+class TestFlatObservations(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.env = make_default_sim_env(self.interface, flatten_observations=True)
+
+    def test_observation_space(self) -> None:
+        space = self.env.observation_space
+        self.assertIsInstance(space, Box)
+        self.assertEqual(space.dtype, np.float32)
+        dict_space = make_default_sim_env(self.interface).observation_space
+        sizes = [
+            int(np.prod(subspace.shape)) for subspace in dict_space.spaces.values()
+        ]
+        self.assertEqual(space.shape, (sum(sizes),))
+        self.assertEqual(
+            sum(
+                observation_slice.stop - observation_slice.start
+                for observation_slice in self.env.observation_slices.values()
+            ),
+            sum(sizes),
+        )
+        np.testing.assert_equal(space.low[self.env.observation_slices["timestep"]], [0])
+
+    def test_observation_matches_dict_observation(self) -> None:
+        dict_env = make_default_sim_env(self.interface)
+        flat_observation = self.env.reset()
+        dict_observation = dict_env.reset()
+        self.assertEqual(flat_observation.dtype, np.float32)
+        unflattened = self.env.unflatten_observation(flat_observation)
+        self.assertEqual(set(unflattened), set(dict_observation))
+        for name, observation in dict_observation.items():
+            np.testing.assert_allclose(
+                unflattened[name], np.reshape(observation, unflattened[name].shape)
+            )
+
+    def test_reset_observation_not_reused(self) -> None:
+        observation = self.env.reset()
+        self.assertIsNot(observation, self.env._observation_buffer)
+        self.assertIs(self.env.observation_from_state(), self.env._observation_buffer)
+
+    def test_unflatten_batch(self) -> None:
+        batch = np.stack([self.env.reset()] * 3)
+        unflattened = self.env.unflatten_observation(batch)
+        self.assertEqual(
+            unflattened["constraint matrix"].shape,
+            (3,) + self.env.observation_shapes["constraint matrix"],
+        )
+
+    def test_non_box_space_error(self) -> None:
+        observation_object = SimObservation(
+            lambda interface: Discrete(2), lambda interface: 0, "discrete"
+        )
+        with self.assertRaises(TypeError):
+            CustomSimEnv(
+                self.interface,
+                [observation_object],
+                self.env.action_object,
+                [],
+                flatten_observations=True,
+            )
+
+    def test_rebuild_with_fewer_observations(self) -> None:
+        env = make_default_sim_env(
+            self.interface, flatten_observations=True, cache_spaces=False
+        )
+        env.consumed_keys = frozenset({"arrivals", "timestep"})
+        observation = env.reset()
+        num_stations = len(self.interface.station_ids)
+        self.assertEqual(
+            env.observation_slices,
+            {
+                "arrivals": slice(0, num_stations),
+                "timestep": slice(num_stations, num_stations + 1),
+            },
+        )
+        self.assertEqual(set(env.observation_shapes), {"arrivals", "timestep"})
+        self.assertEqual(observation.shape, (num_stations + 1,))
+        self.assertEqual(
+            set(env.unflatten_observation(observation)), {"arrivals", "timestep"}
+        )
+
+    def test_from_custom_sim_env(self) -> None:
+        rebuilding_env = RebuildingEnv.from_custom_sim_env(self.env)
+        self.assertTrue(rebuilding_env.flatten_observations)
+        self.assertEqual(rebuilding_env.reset().shape, self.env.observation_space.shape)
+
+
+class TestReusedObservationBuffers(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.env = make_default_sim_env(self.interface, reuse_observation_buffers=True)
+
+    def test_observation_matches_allocated_observation(self) -> None:
+        observation = self.env.reset()
+        expected_observation = make_default_sim_env(self.interface).reset()
+        self.assertEqual(set(observation), set(expected_observation))
+        for name, expected in expected_observation.items():
+            np.testing.assert_equal(
+                observation[name], np.reshape(expected, observation[name].shape)
+            )
+
+    def test_buffers_reused(self) -> None:
+        observation = self.env.reset()
+        for name, buffer in observation.items():
+            self.assertIs(buffer, self.env._observation_buffers[name])
+            self.assertIs(self.env.observation[name], buffer)
+        next_observation = self.env.observation_from_state()
+        self.assertIs(next_observation["arrivals"], observation["arrivals"])
+
+    def test_flat_buffers_are_views(self) -> None:
+        env = make_default_sim_env(
+            self.interface, flatten_observations=True, reuse_observation_buffers=True
+        )
+        observation = env.reset()
+        self.assertIs(observation, env._observation_buffer)
+        self.assertIs(env._observation_buffers["arrivals"].base, observation)
+
+
+class TestDtypePolicy(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.env = make_default_sim_env(self.interface, dtype_policy=DtypePolicy())
+
+    def _assert_observation_dtypes(self, env: CustomSimEnv) -> None:
+        observation = env.reset()
+        for name, space in env.observation_space.spaces.items():
+            self.assertEqual(observation[name].dtype, space.dtype)
+            self.assertTrue(space.contains(np.reshape(observation[name], space.shape)))
+
+    def test_default_policy_spaces(self) -> None:
+        spaces = self.env.observation_space.spaces
+        for name in ("arrivals", "departures", "timestep"):
+            self.assertEqual(spaces[name].dtype, np.int32)
+            self.assertEqual(spaces[name].high[0], np.iinfo(np.int32).max)
+        for name in ("demands", "constraint matrix", "magnitudes", "phases"):
+            self.assertEqual(spaces[name].dtype, np.float32)
+        self.assertEqual(self.env.action_space.dtype, np.float32)
+
+    def test_default_factories_keep_float64_spaces(self) -> None:
+        for env in (
+            make_default_sim_env(self.interface),
+            make_rebuilding_default_sim_env(lambda: _simple_interface()),
+        ):
+            self.assertIsNone(env.dtype_policy)
+            for space in env.observation_space.spaces.values():
+                self.assertEqual(space.dtype, np.float64)
+            self.assertEqual(env.action_space.dtype, np.float64)
+            for observation in env.reset().values():
+                self.assertEqual(np.asarray(observation).dtype, np.float64)
+
+    def test_observations_match_spaces(self) -> None:
+        self._assert_observation_dtypes(self.env)
+        self._assert_observation_dtypes(
+            make_default_sim_env(
+                self.interface,
+                reuse_observation_buffers=True,
+                dtype_policy=DtypePolicy(),
+            )
+        )
+
+    def test_observations_match_float64_observations(self) -> None:
+        observation = self.env.reset()
+        float64_env = make_default_sim_env(self.interface)
+        self.assertEqual(float64_env.observation_space["arrivals"].dtype, np.float64)
+        for name, expected in float64_env.reset().items():
+            np.testing.assert_allclose(observation[name], expected, rtol=1e-6)
+
+    def test_flat_observations(self) -> None:
+        env = make_default_sim_env(
+            self.interface,
+            flatten_observations=True,
+            dtype_policy=DtypePolicy(float_dtype=np.float64),
+        )
+        self.assertEqual(env.observation_space.dtype, np.float64)
+        self.assertEqual(env.reset().dtype, np.float64)
+
+    def test_step_float32_action(self) -> None:
+        self.env.reset()
+        observation, _, _, _ = self.env.step(
+            np.zeros(self.env.action_space.shape, dtype=np.float32)
+        )
+        self.assertEqual(observation["timestep"].dtype, np.int32)
+
+    def test_from_custom_sim_env(self) -> None:
+        rebuilding_env = RebuildingEnv.from_custom_sim_env(self.env)
+        self.assertIs(rebuilding_env.dtype_policy, self.env.dtype_policy)
+        self.assertEqual(rebuilding_env.action_space.dtype, np.float32)
+
+
+class TestStaticObservations(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.default_env = make_default_sim_env(self.interface)
+        self.env = CustomSimEnv(
+            self.interface,
+            [
+                obs.arrival_observation(),
+                obs.timestep_observation(),
+                obs.constraint_matrix_coo_observation(),
+            ],
+            self.default_env.action_object,
+            [],
+            static_observations=["constraint matrix coo"],
+        )
+
+    def test_spaces(self) -> None:
+        self.assertEqual(
+            set(self.env.observation_space.spaces), {"arrivals", "timestep"}
+        )
+        self.assertEqual(
+            set(self.env.static_observation_space.spaces), {"constraint matrix coo"}
+        )
+
+    def test_reset_info(self) -> None:
+        observation, info = self.env.reset(return_info=True)
+        self.assertNotIn("constraint matrix coo", observation)
+        static_observation = info["static_observation"]["constraint matrix coo"]
+        self.assertIs(
+            static_observation, self.env.static_observation["constraint matrix coo"]
+        )
+        dense = self.default_env.reset()["constraint matrix"]
+        np.testing.assert_equal(static_observation[:, 2], dense[np.nonzero(dense)])
+
+    def test_reset_without_static_observations(self) -> None:
+        observation, info = self.default_env.reset(return_info=True)
+        self.assertEqual(info, {})
+        self.assertIn("constraint matrix", observation)
+
+    def test_flat_observations(self) -> None:
+        env = CustomSimEnv(
+            self.interface,
+            self.env.observation_objects,
+            self.env.action_object,
+            [],
+            flatten_observations=True,
+            static_observations=["constraint matrix coo"],
+        )
+        self.assertEqual(set(env.observation_slices), {"arrivals", "timestep"})
+        self.assertEqual(env.reset().shape, env.observation_space.shape)
+
+    def test_unknown_name_error(self) -> None:
+        with self.assertRaises(ValueError):
+            make_default_sim_env(self.interface, static_observations=["unknown"])
+
+    def test_rebuilding_env(self) -> None:
+        rebuilding_env = RebuildingEnv.from_custom_sim_env(
+            self.env, lambda: _simple_interface()
+        )
+        self.assertEqual(
+            rebuilding_env.static_observations, self.env.static_observations
+        )
+        _, info = rebuilding_env.reset(return_info=True)
+        self.assertIn("constraint matrix coo", info["static_observation"])
+
+
+class TestLazyObservations(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.env = make_default_sim_env(
+            self.interface, lazy_observations=True, dtype_policy=DtypePolicy()
+        )
+        self.observation_objects = {
+            observation_object.name: observation_object
+            for observation_object in self.env.observation_objects
+        }
+
+    def test_observation_computed_on_access(self) -> None:
+        observation = self.env.reset()
+        self.assertIsInstance(observation, LazyObservation)
+        self.assertEqual(observation.computed_keys, [])
+        self.assertEqual(set(observation), set(self.env.observation_space.spaces))
+        arrivals = observation["arrivals"]
+        self.assertIs(observation["arrivals"], arrivals)
+        self.assertEqual(observation.computed_keys, ["arrivals"])
+        self.assertEqual(arrivals.dtype, np.int32)
+
+    def test_materialize_matches_eager_observation(self) -> None:
+        observation = self.env.reset().materialize()
+        expected_observation = make_default_sim_env(self.interface).reset()
+        self.assertEqual(set(observation), set(expected_observation))
+        for name, expected in expected_observation.items():
+            np.testing.assert_equal(observation[name], expected)
+
+    def test_only_accessed_observations_computed(self) -> None:
+        obs_function = Mock(return_value=np.zeros(1))
+        env = CustomSimEnv(
+            self.interface,
+            [
+                self.observation_objects["arrivals"],
+                SimObservation(lambda _: Box(0, 1, shape=(1,)), obs_function, "mock"),
+            ],
+            self.env.action_object,
+            [],
+            lazy_observations=True,
+        )
+        env.reset()["arrivals"]
+        obs_function.assert_not_called()
+
+    def test_stale_observation_error(self) -> None:
+        observation = self.env.reset()
+        observation["arrivals"]
+        self.env.observation_from_state()
+        self.assertIsNotNone(observation["arrivals"])
+        with self.assertRaises(RuntimeError):
+            _ = observation["departures"]
+
+    def test_deepcopy_materialized(self) -> None:
+        observation = self.env.reset()
+        copied = deepcopy(observation)
+        self.assertIsInstance(copied, dict)
+        self.assertEqual(set(copied), set(observation))
+        self.assertIsNot(copied["arrivals"], observation["arrivals"])
+
+    def test_unknown_key_error(self) -> None:
+        with self.assertRaises(KeyError):
+            _ = self.env.reset()["unknown"]
+
+    def test_flatten_error(self) -> None:
+        with self.assertRaises(ValueError):
+            make_default_sim_env(
+                self.interface, lazy_observations=True, flatten_observations=True
+            )
+
+    def test_timed(self) -> None:
+        step_timer = StepTimer()
+        env = make_default_sim_env(
+            self.interface, lazy_observations=True, step_timer=step_timer
+        )
+        env.reset()["timestep"]
+        self.assertEqual(
+            [phase for phase in step_timer.stats if phase.startswith("observation.")],
+            ["observation.timestep"],
+        )
+
+
+class TestConsumedKeys(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+
+    def test_unconsumed_observations_dropped(self) -> None:
+        env = make_default_sim_env(
+            self.interface, consumed_keys=["arrivals", "timestep"]
+        )
+        self.assertEqual(set(env.observation_space.spaces), {"arrivals", "timestep"})
+        self.assertEqual(set(env.reset()), {"arrivals", "timestep"})
+
+    def test_flat_observations(self) -> None:
+        env = make_default_sim_env(
+            self.interface, consumed_keys=["timestep"], flatten_observations=True
+        )
+        self.assertEqual(env.observation_space.shape, (1,))
+
+    def test_unknown_key_error(self) -> None:
+        with self.assertRaises(ValueError):
+            make_default_sim_env(self.interface, consumed_keys=["unknown"])
+
+    def test_from_custom_sim_env(self) -> None:
+        env = make_default_sim_env(self.interface, consumed_keys=["timestep"])
+        rebuilding_env = RebuildingEnv.from_custom_sim_env(env)
+        self.assertEqual(rebuilding_env.consumed_keys, frozenset(["timestep"]))
+        self.assertEqual(set(rebuilding_env.reset()), {"timestep"})
+
+
+class TestSpaceCache(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.space_calls = 0
+        timestep_observation = obs.timestep_observation()
+
+        # noinspection PyMissingOrEmptyDocstring
+        def space_function(interface: GymTrainedInterface) -> Space:
+            self.space_calls += 1
+            return timestep_observation.get_space(interface)
+
+        self.observation_object = SimObservation(
+            space_function, timestep_observation.get_obs, "timestep"
+        )
+        self.action_object = make_default_sim_env(_simple_interface()).action_object
+
+    def _env(self, **kwargs) -> RebuildingEnv:
+        return RebuildingEnv(
+            _simple_interface(),
+            [self.observation_object],
+            self.action_object,
+            [],
+            interface_generating_function=_simple_interface,
+            **kwargs,
+        )
+
+    def test_spaces_reused_across_resets(self) -> None:
+        env = self._env()
+        observation_space = env.observation_space
+        action_space = env.action_space
+        env.reset()
+        env.reset()
+        self.assertIs(env.observation_space, observation_space)
+        self.assertIs(env.action_space, action_space)
+        self.assertEqual(self.space_calls, 1)
+
+    def test_cache_disabled(self) -> None:
+        env = self._env(cache_spaces=False)
+        env.reset()
+        env.reset()
+        self.assertEqual(self.space_calls, 3)
+
+    def test_simulator_without_network_not_cached(self) -> None:
+        interface = GymTrainedInterface(create_autospec(Simulator))
+        self.assertIsNone(_network_signature(interface))
+
+    def test_network_signature_error_raised(self) -> None:
+        env = self._env()
+        interface = _simple_interface()
+        interface.network_signature = Mock(side_effect=AttributeError)
+        with self.assertRaises(AttributeError):
+            env.interface = interface
+
+    def test_spaces_rebuilt_for_new_network(self) -> None:
+        env = self._env()
+        interface = _simple_interface()
+        interface._simulator.network.add_constraint(
+            Current(["EVSE-001"]), 16 * 208 / 1000, name="EVSE-001 cap"
+        )
+        env.interface = interface
+        self.assertEqual(self.space_calls, 2)
+
+    def test_static_observations_recomputed(self) -> None:
+        env = RebuildingEnv(
+            _simple_interface(),
+            [self.observation_object],
+            self.action_object,
+            [],
+            interface_generating_function=_simple_interface,
+            static_observations=["timestep"],
+        )
+        static_observation = env.static_observation["timestep"]
+        _, info = env.reset(return_info=True)
+        self.assertIsNot(info["static_observation"]["timestep"], static_observation)
+        self.assertEqual(self.space_calls, 1)
+
+
+class TestNormalization(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface = _simple_interface()
+        self.env = make_default_sim_env(
+            self.interface,
+            flatten_observations=True,
+            normalize_observations=True,
+            normalize_reward=True,
+        )
+
+    def test_observation_space(self) -> None:
+        np.testing.assert_equal(self.env.observation_space.low, -10)
+        np.testing.assert_equal(self.env.observation_space.high, 10)
+        self.assertEqual(
+            self.env.observation_rms.shape, self.env.observation_space.shape
+        )
+
+    def test_unclipped_observation_space(self) -> None:
+        env = make_default_sim_env(
+            self.interface,
+            flatten_observations=True,
+            normalize_observations=True,
+            normalization_clip=None,
+        )
+        np.testing.assert_equal(env.observation_space.high, np.inf)
+
+    def test_observations_normalized(self) -> None:
+        raw = make_default_sim_env(self.interface, flatten_observations=True).reset()
+        observation = self.env.reset()
+        self.assertEqual(self.env.observation_rms.count, 1)
+        np.testing.assert_allclose(
+            observation,
+            self.env.observation_rms.normalize(raw.astype(float)),
+            rtol=1e-6,
+        )
+        self.assertTrue(self.env.observation_space.contains(observation))
+
+    def test_requires_flat_observations_error(self) -> None:
+        with self.assertRaises(ValueError):
+            make_default_sim_env(self.interface, normalize_observations=True)
+
+    def test_reward_normalized(self) -> None:
+        env = CustomSimEnv(
+            self.interface,
+            [obs.timestep_observation()],
+            self.env.action_object,
+            [lambda _: 2.0],
+            normalize_reward=True,
+            reward_discount=0.5,
+        )
+        env.reset()
+        self.assertEqual(env.reward_from_state(), 2.0)
+        action = np.zeros(env.action_space.shape)
+        rewards = [env.step(action)[1] for _ in range(3)]
+        # Discounted returns are 2, 3, and 3.5.
+        np.testing.assert_allclose(
+            rewards[-1], 2 / np.sqrt(np.var([2, 3, 3.5]) + 1e-8)
+        )
+        self.assertEqual(env.reward, rewards[-1])
+        self.assertEqual(env.reward_rms.count, 3)
+        env.interface = _simple_interface()
+        self.assertEqual(env._discounted_return, 0)
+
+    def test_multi_period_reward_normalized_once_per_step(self) -> None:
+        interface = _simple_interface()
+        interface._simulator.max_recompute = 1
+        reward_calls = []
+
+        # noinspection PyMissingOrEmptyDocstring
+        def reward_function(_: BaseSimEnv) -> float:
+            reward_calls.append(None)
+            return 2.0
+
+        env = CustomSimEnv(
+            interface,
+            [obs.timestep_observation()],
+            charging_schedule(3),
+            [reward_function],
+            periods_per_action=3,
+            normalize_reward=True,
+            normalization_clip=None,
+            reward_discount=0.5,
+        )
+        env.reset()
+        action = np.zeros(env.action_space.shape)
+        raw_rewards = []
+        rewards = []
+        for _ in range(2):
+            num_reward_calls = len(reward_calls)
+            rewards.append(env.step(action)[1])
+            # One reward per simulator step, summed before normalizing.
+            raw_rewards.append(2.0 * (len(reward_calls) - num_reward_calls))
+        self.assertGreater(max(raw_rewards), 2.0)
+        self.assertEqual(env.reward_rms.count, 2)
+        returns = [raw_rewards[0], raw_rewards[0] * 0.5 + raw_rewards[1]]
+        self.assertEqual(env._discounted_return, returns[-1])
+        np.testing.assert_allclose(
+            rewards[-1], raw_rewards[-1] / np.sqrt(np.var(returns) + 1e-8)
+        )
+
+    def test_freeze_normalization(self) -> None:
+        self.env.reset()
+        self.env.freeze_normalization()
+        self.env.reset()
+        self.env.step(np.zeros(self.env.action_space.shape))
+        self.assertEqual(self.env.observation_rms.count, 1)
+        self.assertEqual(self.env.reward_rms.count, 0)
+        self.env.freeze_normalization(False)
+        self.env.reset()
+        self.assertEqual(self.env.observation_rms.count, 2)
+
+    def test_statistics_updated_once_per_transition(self) -> None:
+        self.env.reset()
+        self.env.observation_from_state()
+        self.env.observation_from_state()
+        self.assertEqual(self.env.observation_rms.count, 1)
+        self.env.step(np.zeros(self.env.action_space.shape))
+        self.assertEqual(self.env.observation_rms.count, 2)
+        self.env.observation_from_state()
+        self.assertEqual(self.env.observation_rms.count, 2)
+
+    def test_rebuilding_env_reset_updates_statistics(self) -> None:
+        env = RebuildingEnv.from_custom_sim_env(self.env, lambda: _simple_interface())
+        env.reset()
+        env.observation_from_state()
+        self.assertEqual(env.observation_rms.count, 1)
+
+    def test_set_normalization_state(self) -> None:
+        self.env.reset()
+        self.env.step(np.zeros(self.env.action_space.shape))
+        state = self.env.normalization_state()
+        self.assertIsNot(state["observation_rms"], self.env.observation_rms)
+        env = make_default_sim_env(
+            _simple_interface(),
+            flatten_observations=True,
+            normalize_observations=True,
+            normalize_reward=True,
+        )
+        env.freeze_normalization()
+        env.set_normalization_state(**state)
+        for name in ("observation_rms", "reward_rms"):
+            rms = getattr(env, name)
+            self.assertIsNot(rms, getattr(self.env, name))
+            self.assertEqual(rms.count, getattr(self.env, name).count)
+            np.testing.assert_equal(rms.mean, getattr(self.env, name).mean)
+            self.assertTrue(rms.frozen)
+        raw = make_default_sim_env(
+            _simple_interface(), flatten_observations=True
+        ).reset()
+        np.testing.assert_allclose(
+            env.reset(),
+            state["observation_rms"].normalize(raw.astype(float), clip=10),
+            rtol=1e-6,
+        )
+        self.assertEqual(env.observation_rms.count, state["observation_rms"].count)
+
+    def test_set_normalization_state_errors(self) -> None:
+        with self.assertRaises(ValueError):
+            self.env.set_normalization_state(observation_rms=RunningMeanStd((2,)))
+        env = make_default_sim_env(self.interface, flatten_observations=True)
+        with self.assertRaises(ValueError):
+            env.set_normalization_state(**self.env.normalization_state())
+
+    def test_statistics_kept_across_resets(self) -> None:
+        observation_rms = self.env.observation_rms
+        self.env.reset()
+        self.env.reset()
+        self.assertIs(self.env.observation_rms, observation_rms)
+        self.assertEqual(observation_rms.count, 2)
+
+    def test_from_custom_sim_env(self) -> None:
+        rebuilding_env = RebuildingEnv.from_custom_sim_env(self.env)
+        self.assertTrue(rebuilding_env.normalize_observations)
+        self.assertTrue(rebuilding_env.normalize_reward)
+        self.assertEqual(rebuilding_env.normalization_clip, 10)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,86 @@
+# coding=utf-8
+""" Tests for running normalization statistics. """
+import unittest
+
+import numpy as np
+
+from ..normalization import RunningMeanStd
+
+
+class TestRunningMeanStd(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.samples = np.random.default_rng(0).normal(5, 3, size=(100, 3))
+
+    def test_initial_statistics(self) -> None:
+        rms = RunningMeanStd((3,))
+        np.testing.assert_equal(rms.mean, np.zeros(3))
+        np.testing.assert_equal(rms.var, np.ones(3))
+        np.testing.assert_allclose(rms.normalize(self.samples[0]), self.samples[0])
+
+    def test_update_samples(self) -> None:
+        rms = RunningMeanStd((3,))
+        for sample in self.samples:
+            rms.update(sample)
+        self.assertEqual(rms.count, 100)
+        np.testing.assert_allclose(rms.mean, self.samples.mean(axis=0))
+        np.testing.assert_allclose(rms.var, self.samples.var(axis=0))
+        np.testing.assert_allclose(rms.std, np.sqrt(self.samples.var(axis=0)))
+
+    def test_update_batch(self) -> None:
+        rms = RunningMeanStd((3,))
+        rms.update(self.samples[:40])
+        rms.update(self.samples[40:])
+        np.testing.assert_allclose(rms.mean, self.samples.mean(axis=0))
+        np.testing.assert_allclose(rms.var, self.samples.var(axis=0))
+
+    def test_update_shape_error(self) -> None:
+        with self.assertRaises(ValueError):
+            RunningMeanStd((3,)).update(np.zeros(2))
+
+    def test_scalar_statistics(self) -> None:
+        rms = RunningMeanStd()
+        for sample in self.samples[:, 0]:
+            rms.update(float(sample))
+        np.testing.assert_allclose(rms.mean, self.samples[:, 0].mean())
+        np.testing.assert_allclose(rms.var, self.samples[:, 0].var())
+
+    def test_merge(self) -> None:
+        rms = RunningMeanStd((3,))
+        other = RunningMeanStd((3,))
+        rms.update(self.samples[:30])
+        other.update(self.samples[30:])
+        rms.merge(other)
+        self.assertEqual(rms.count, 100)
+        np.testing.assert_allclose(rms.mean, self.samples.mean(axis=0))
+        np.testing.assert_allclose(rms.var, self.samples.var(axis=0))
+
+    def test_merge_shape_error(self) -> None:
+        with self.assertRaises(ValueError):
+            RunningMeanStd((3,)).merge(RunningMeanStd((2,)))
+
+    def test_frozen(self) -> None:
+        rms = RunningMeanStd((3,))
+        rms.update(self.samples)
+        rms.frozen = True
+        rms.update(self.samples[0])
+        self.assertEqual(rms.count, 100)
+
+    def test_normalize_in_place(self) -> None:
+        rms = RunningMeanStd((3,))
+        rms.update(self.samples)
+        x = self.samples[0].astype(np.float32)
+        expected = (self.samples[0] - rms.mean) / rms.std
+        self.assertIs(rms.normalize(x, out=x), x)
+        np.testing.assert_allclose(x, expected, rtol=1e-6)
+
+    def test_normalize_clip(self) -> None:
+        rms = RunningMeanStd((3,))
+        rms.update(self.samples)
+        np.testing.assert_equal(
+            rms.normalize(np.full(3, 1000.0), clip=5), np.full(3, 5.0)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,12 @@
 import unittest
 from collections import namedtuple
 from typing import Any, Callable, Optional
-from unittest.mock import create_autospec
+from unittest.mock import create_autospec, Mock
 
 import numpy as np
 from acnportal.acnsim import EV
 from gym import Space
+from gym.spaces import Box, Discrete
 
 from .. import observation as obs
 from ...interfaces import GymTrainedInterface
@@ -41,6 +42,37 @@ class TestSimObservation(unittest.TestCase):
             self.sim_observation.get_obs(self.interface), np.array([0, 0])
         )
 
+    def test_get_obs_out_without_out_function(self) -> None:
+        out = np.ones(2)
+        self.assertIs(self.sim_observation.get_obs(self.interface, out=out), out)
+        np.testing.assert_equal(out, [0, 0])
+
+    def test_get_obs_out_function(self) -> None:
+        out_function = Mock()
+        sim_observation = obs.SimObservation(
+            self.space_function, self.obs_function, self.name, out_function
+        )
+        out = np.ones(2)
+        self.assertIs(sim_observation.get_obs(self.interface, out=out), out)
+        out_function.assert_called_once_with(self.interface, out)
+
+
+def _assert_out_matches_obs(
+    test_case: unittest.TestCase,
+    sim_observation: obs.SimObservation,
+    interface: GymTrainedInterface,
+) -> None:
+    """ Assert that writing sim_observation's observation into a
+    preallocated array of its space's shape matches the observation it
+    allocates.
+    """
+    space: Space = sim_observation.get_space(interface)
+    out = np.full(space.shape, -1, dtype=space.dtype)
+    test_case.assertIs(sim_observation.get_obs(interface, out=out), out)
+    np.testing.assert_equal(
+        out, np.reshape(sim_observation.get_obs(interface), out.shape)
+    )
+
 
 class TestEVObservationClass(unittest.TestCase):
     # noinspection PyMissingOrEmptyDocstring
@@ -87,6 +119,11 @@ class TestEVObservationClass(unittest.TestCase):
             return
         self.assertEqual(self.sim_observation.name, self.obs_name)
 
+    def test_get_obs_out(self) -> None:
+        if self.sim_observation is None:
+            return
+        _assert_out_matches_obs(self, self.sim_observation, self.interface)
+
 
 class TestArrivalObservation(TestEVObservationClass):
     # noinspection PyMissingOrEmptyDocstring
@@ -102,6 +139,16 @@ class TestArrivalObservation(TestEVObservationClass):
             np.array([self.ev1.arrival + 1, 0, self.ev2.arrival + 1]),
         )
 
+    def test_integer_dtype(self) -> None:
+        sim_observation = obs.arrival_observation(np.int32)
+        self.assertEqual(sim_observation.get_space(self.interface).dtype, np.int32)
+        observation = sim_observation.get_obs(self.interface)
+        self.assertEqual(observation.dtype, np.int32)
+        np.testing.assert_equal(
+            observation, np.array([self.ev1.arrival + 1, 0, self.ev2.arrival + 1])
+        )
+        _assert_out_matches_obs(self, sim_observation, self.interface)
+
 
 class TestDepartureObservation(TestEVObservationClass):
     # noinspection PyMissingOrEmptyDocstring
@@ -135,6 +182,192 @@ class TestDemandObservation(TestEVObservationClass):
         )
 
 
+class TestActiveEVObservation(TestEVObservationClass):
+    # noinspection PyMissingOrEmptyDocstring
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.active_ev_observation = obs.active_ev_observation(4)
+        cls.expected_rows = np.array(
+            [
+                [
+                    1,
+                    1,
+                    cls.ev1.arrival + 1,
+                    cls.ev1.departure + 1,
+                    cls.remaining_amp_periods1 + 1,
+                ],
+                [
+                    1,
+                    3,
+                    cls.ev2.arrival + 1,
+                    cls.ev2.departure + 1,
+                    cls.remaining_amp_periods2 + 1,
+                ],
+            ]
+        )
+
+    def test_active_ev_space_function(self) -> None:
+        out_space: Space = self.active_ev_observation.get_space(self.interface)
+        self.assertEqual(out_space.shape, (4, len(obs.ACTIVE_EV_FEATURES)))
+        self.assertEqual(out_space.dtype, "float")
+
+    def test_active_ev_observation(self) -> None:
+        observation = self.active_ev_observation.get_obs(self.interface)
+        self.assertEqual(self.active_ev_observation.name, "active evs")
+        np.testing.assert_equal(observation[:2], self.expected_rows)
+        np.testing.assert_equal(observation[2:], 0)
+
+    def test_active_ev_observation_truncated(self) -> None:
+        np.testing.assert_equal(
+            obs.active_ev_observation(1).get_obs(self.interface),
+            self.expected_rows[:1],
+        )
+
+    def test_active_ev_get_obs_out(self) -> None:
+        _assert_out_matches_obs(self, self.active_ev_observation, self.interface)
+        _assert_out_matches_obs(
+            self, obs.active_ev_observation(3, np.int32), self.interface
+        )
+
+
+class TestArrivalForecastObservation(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface: Any = create_autospec(GymTrainedInterface)
+        self.interface.upcoming_plugins.return_value = [
+            (0, 10),
+            (3, 20),
+            (1, 5),
+            (3, 30),
+            (8, 40),
+        ]
+        self.interface.current_time = 0
+        self.observation = obs.arrival_forecast_observation(4)
+
+    def test_arrival_forecast_space_function(self) -> None:
+        out_space: Space = self.observation.get_space(self.interface)
+        self.assertEqual(out_space.shape, (4, len(obs.ARRIVAL_FORECAST_FEATURES)))
+        self.assertEqual(out_space.dtype, "float")
+
+    def test_arrival_forecast_observation(self) -> None:
+        self.assertEqual(self.observation.name, "arrival forecast")
+        # Plugins at timestep 0 are processed with those at timestep 1.
+        np.testing.assert_equal(
+            self.observation.get_obs(self.interface),
+            [[2, 15], [0, 0], [2, 50], [0, 0]],
+        )
+
+    def test_arrival_forecast_advances(self) -> None:
+        self.observation.get_obs(self.interface)
+        self.interface.current_time = 2
+        np.testing.assert_equal(
+            self.observation.get_obs(self.interface),
+            [[2, 50], [0, 0], [0, 0], [0, 0]],
+        )
+        self.interface.current_time = 5
+        np.testing.assert_equal(
+            self.observation.get_obs(self.interface),
+            [[0, 0], [0, 0], [1, 40], [0, 0]],
+        )
+        self.interface.upcoming_plugins.assert_called_once()
+
+    def test_arrival_forecast_new_event_queue(self) -> None:
+        self.observation.get_obs(self.interface)
+        self.interface.current_time = 2
+        self.observation.get_obs(self.interface)
+        self.interface.event_queue = Mock()
+        self.interface.upcoming_plugins.return_value = [(4, 10)]
+        np.testing.assert_equal(
+            self.observation.get_obs(self.interface),
+            [[0, 0], [1, 10], [0, 0], [0, 0]],
+        )
+        self.assertEqual(self.interface.upcoming_plugins.call_count, 2)
+
+    def test_arrival_forecast_per_observation_object(self) -> None:
+        self.observation.get_obs(self.interface)
+        other_observation = obs.arrival_forecast_observation(4)
+        other_observation.get_obs(self.interface)
+        self.assertEqual(self.interface.upcoming_plugins.call_count, 2)
+
+    def test_arrival_forecast_get_obs_out(self) -> None:
+        _assert_out_matches_obs(self, self.observation, self.interface)
+        _assert_out_matches_obs(
+            self, obs.arrival_forecast_observation(2, np.float32), self.interface
+        )
+
+
+class TestHistoryObservation(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        self.interface: Any = create_autospec(GymTrainedInterface)
+        self.interface.current_time = 0
+        self.frame_observation = obs.SimObservation(
+            lambda interface: Box(low=0, high=np.inf, shape=(2,)),
+            lambda interface: np.array(
+                [interface.current_time, 2 * interface.current_time]
+            ),
+            "frame",
+        )
+        self.observation = obs.history_observation(self.frame_observation, 3)
+
+    def _observe_at(self, timestep: int) -> np.ndarray:
+        self.interface.current_time = timestep
+        return self.observation.get_obs(self.interface)
+
+    def test_history_space_function(self) -> None:
+        out_space: Space = self.observation.get_space(self.interface)
+        self.assertEqual(out_space.shape, (3, 2))
+        self.assertEqual(self.observation.name, "frame history")
+
+    def test_history_space_function_not_box_error(self) -> None:
+        observation = obs.history_observation(
+            obs.SimObservation(lambda interface: Discrete(2), Mock(), "discrete"), 3
+        )
+        with self.assertRaises(TypeError):
+            observation.get_space(self.interface)
+
+    def test_history_observation(self) -> None:
+        np.testing.assert_equal(self._observe_at(1), [[1, 2], [1, 2], [1, 2]])
+        np.testing.assert_equal(self._observe_at(2), [[1, 2], [1, 2], [2, 4]])
+        for timestep in range(3, 6):
+            self._observe_at(timestep)
+        np.testing.assert_equal(self._observe_at(6), [[4, 8], [5, 10], [6, 12]])
+
+    def test_history_same_timestep_replaces_frame(self) -> None:
+        self._observe_at(1)
+        self._observe_at(2)
+        np.testing.assert_equal(self._observe_at(2), [[1, 2], [1, 2], [2, 4]])
+
+    def test_history_per_interface(self) -> None:
+        self._observe_at(1)
+        self._observe_at(2)
+        interface: Any = create_autospec(GymTrainedInterface)
+        interface.current_time = 7
+        np.testing.assert_equal(
+            self.observation.get_obs(interface), [[7, 14], [7, 14], [7, 14]]
+        )
+
+    def test_history_time_jump_holds_frames(self) -> None:
+        self._observe_at(1)
+        np.testing.assert_equal(self._observe_at(3), [[1, 2], [1, 2], [3, 6]])
+        np.testing.assert_equal(self._observe_at(4), [[1, 2], [3, 6], [4, 8]])
+        np.testing.assert_equal(self._observe_at(10), [[4, 8], [4, 8], [10, 20]])
+
+    def test_history_per_observation_object(self) -> None:
+        other_observation = obs.history_observation(self.frame_observation, 3)
+        self._observe_at(1)
+        self._observe_at(2)
+        np.testing.assert_equal(
+            other_observation.get_obs(self.interface), [[2, 4], [2, 4], [2, 4]]
+        )
+
+    def test_history_get_obs_out(self) -> None:
+        self._observe_at(1)
+        self.interface.current_time = 2
+        _assert_out_matches_obs(self, self.observation, self.interface)
+
+
 class TestConstraintObservation(unittest.TestCase):
     # Some class variables are defined outside of setUpClass so that
     # the code inspector knows that inherited classes have these
@@ -165,6 +398,11 @@ class TestConstraintObservation(unittest.TestCase):
             return
         self.assertEqual(self.sim_observation.name, self.obs_name)
 
+    def test_get_obs_out(self) -> None:
+        if self.sim_observation is None:
+            return
+        _assert_out_matches_obs(self, self.sim_observation, self.interface)
+
 
 class TestConstraintMatrixObservation(TestConstraintObservation):
     # noinspection PyMissingOrEmptyDocstring
@@ -185,6 +423,14 @@ class TestConstraintMatrixObservation(TestConstraintObservation):
             self.sim_observation.get_obs(self.interface), self.constraint_matrix
         )
 
+    def test_float32_dtype(self) -> None:
+        sim_observation = obs.constraint_matrix_observation(np.float32)
+        self.assertEqual(sim_observation.get_space(self.interface).dtype, np.float32)
+        observation = sim_observation.get_obs(self.interface)
+        self.assertEqual(observation.dtype, np.float32)
+        np.testing.assert_equal(observation, self.constraint_matrix)
+        _assert_out_matches_obs(self, sim_observation, self.interface)
+
 
 class TestMagnitudesObservation(TestConstraintObservation):
     # noinspection PyMissingOrEmptyDocstring
@@ -206,6 +452,41 @@ class TestMagnitudesObservation(TestConstraintObservation):
         )
 
 
+class TestConstraintMatrixCOOObservation(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.interface = create_autospec(GymTrainedInterface)
+        cls.constraint_matrix = np.array([[1.0, 0, 2], [0, 0, -1]])
+        cls.interface.get_constraints = lambda: namedtuple(
+            "Constraint", ["constraint_matrix"]
+        )(cls.constraint_matrix)
+        cls.sim_observation = obs.constraint_matrix_coo_observation()
+
+    def test_space_function(self) -> None:
+        out_space: Space = self.sim_observation.get_space(self.interface)
+        self.assertEqual(out_space.shape, (3, 3))
+        self.assertEqual(out_space.dtype, "float")
+
+    def test_correct_on_init_name(self) -> None:
+        self.assertEqual(self.sim_observation.name, "constraint matrix coo")
+
+    def test_constraint_matrix_coo_observation(self) -> None:
+        observation = self.sim_observation.get_obs(self.interface)
+        np.testing.assert_equal(observation, [[0, 0, 1], [0, 2, 2], [1, 2, -1]])
+        dense = np.zeros_like(self.constraint_matrix)
+        dense[observation[:, 0].astype(int), observation[:, 1].astype(int)] = (
+            observation[:, 2]
+        )
+        np.testing.assert_equal(dense, self.constraint_matrix)
+
+    def test_get_obs_out(self) -> None:
+        _assert_out_matches_obs(self, self.sim_observation, self.interface)
+        _assert_out_matches_obs(
+            self, obs.constraint_matrix_coo_observation(np.float32), self.interface
+        )
+
+
 class TestPhasesObservation(unittest.TestCase):
     # noinspection PyMissingOrEmptyDocstring
     @classmethod
@@ -241,6 +522,9 @@ class TestPhasesObservation(unittest.TestCase):
             self.phases
         )
 
+    def test_get_obs_out(self) -> None:
+        _assert_out_matches_obs(self, self.sim_observation, self.interface)
+
 
 class TestTimestepObservation(unittest.TestCase):
     # noinspection PyMissingOrEmptyDocstring
@@ -269,6 +553,17 @@ class TestTimestepObservation(unittest.TestCase):
             self.interface.current_time + 1,
         )
 
+    def test_get_obs_out(self) -> None:
+        _assert_out_matches_obs(self, self.sim_observation, self.interface)
+
+    def test_integer_dtype(self) -> None:
+        sim_observation = obs.timestep_observation(np.int16)
+        self.assertEqual(sim_observation.get_space(self.interface).dtype, np.int16)
+        observation = sim_observation.get_obs(self.interface)
+        self.assertEqual(observation.dtype, np.int16)
+        np.testing.assert_equal(observation, self.interface.current_time + 1)
+        _assert_out_matches_obs(self, sim_observation, self.interface)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,181 @@
+# coding=utf-8
+""" Tests for recording environment trajectories. """
+import os
+import tempfile
+import unittest
+from typing import Dict, Tuple, Any
+
+import gym
+import numpy as np
+from gym import spaces
+
+from .. import TrajectoryRecorder, TrajectoryReader
+
+
+class CountingEnv(gym.Env):
+    """ Environment whose observations count the steps taken in the
+    current episode; episodes last episode_length steps.
+    """
+
+    def __init__(self, episode_length: int = 3) -> None:
+        self.episode_length = episode_length
+        self.observation_space = spaces.Dict(
+            {
+                "count": spaces.Box(0, np.inf, shape=(2,)),
+                "matrix": spaces.Box(-np.inf, np.inf, shape=(2, 3)),
+            }
+        )
+        self.action_space = spaces.Box(-1, 1, shape=(2,))
+        self.count = 0
+
+    def _observation(self) -> Dict[str, np.ndarray]:
+        return {
+            "count": np.full(2, self.count),
+            "matrix": self.count * np.ones((2, 3)),
+        }
+
+    def reset(self, **kwargs) -> Any:
+        self.count = 0
+        if kwargs.get("return_info"):
+            return self._observation(), {"count": self.count}
+        return self._observation()
+
+    def step(
+        self, action: np.ndarray
+    ) -> Tuple[Dict[str, np.ndarray], float, bool, Dict[Any, Any]]:
+        self.count += 1
+        return (
+            self._observation(),
+            float(self.count),
+            self.count == self.episode_length,
+            {},
+        )
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+    # noinspection PyMissingOrEmptyDocstring
+    def setUp(self) -> None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = os.path.join(temporary_directory.name, "recording")
+
+    def _recorder_helper(self, **kwargs) -> TrajectoryRecorder:
+        recorder = TrajectoryRecorder(CountingEnv(), self.directory, **kwargs)
+        self.addCleanup(recorder.close)
+        return recorder
+
+    def _run_episodes(self, recorder: TrajectoryRecorder, episodes: int) -> None:
+        for _ in range(episodes):
+            recorder.reset()
+            done = False
+            while not done:
+                _, _, done, _ = recorder.step(np.array([0.5, -0.5]))
+
+    def test_invalid_chunk_size(self) -> None:
+        with self.assertRaises(ValueError):
+            TrajectoryRecorder(CountingEnv(), self.directory, chunk_size=0)
+
+    def test_invalid_flush_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            TrajectoryRecorder(CountingEnv(), self.directory, flush_interval=0)
+
+    def test_non_empty_directory_error(self) -> None:
+        self._recorder_helper().reset()
+        self.assertEqual(len(TrajectoryReader(self.directory)), 0)
+        with self.assertRaises(ValueError):
+            TrajectoryRecorder(CountingEnv(), self.directory)
+
+    def test_reset_return_info(self) -> None:
+        recorder = self._recorder_helper()
+        observation, info = recorder.reset(return_info=True)
+        self.assertEqual(info, {"count": 0})
+        recorder.flush()
+        np.testing.assert_equal(
+            TrajectoryReader(self.directory).read("observation.count")[0],
+            observation["count"],
+        )
+
+    def test_non_dict_observation_space_error(self) -> None:
+        env = CountingEnv()
+        env.observation_space = spaces.Box(0, 1, shape=(2,))
+        recorder = TrajectoryRecorder(env, self.directory)
+        self.addCleanup(recorder.close)
+        with self.assertRaises(TypeError):
+            recorder.reset()
+
+    def test_observation_shape_error(self) -> None:
+        recorder = self._recorder_helper()
+        recorder.env.observation_space.spaces["count"] = spaces.Box(
+            0, np.inf, shape=(3,)
+        )
+        with self.assertRaises(ValueError):
+            recorder.reset()
+
+    def test_record_across_chunks(self) -> None:
+        recorder = self._recorder_helper(chunk_size=3)
+        self._run_episodes(recorder, 2)
+        recorder.flush()
+        self.assertEqual(recorder.num_rows, 8)
+
+        reader = TrajectoryReader(self.directory)
+        self.assertEqual(len(reader), 8)
+        self.assertEqual(reader.metadata["chunk_rows"], [3, 3, 2])
+        self.assertEqual(reader.observation_keys, ["count", "matrix"])
+        np.testing.assert_equal(
+            reader.read("observation.count")[:, 0], [0, 1, 2, 3, 0, 1, 2, 3]
+        )
+        self.assertEqual(reader.read("observation.matrix").shape, (8, 2, 3))
+        self.assertEqual(reader.read("observation.count").dtype, np.float32)
+        np.testing.assert_equal(reader.read("reward"), [0, 1, 2, 3, 0, 1, 2, 3])
+        np.testing.assert_equal(reader.read("first"), [1, 0, 0, 0, 1, 0, 0, 0])
+        np.testing.assert_equal(reader.read("done"), [0, 0, 0, 1, 0, 0, 0, 1])
+        np.testing.assert_equal(reader.read("action")[0], [0, 0])
+        np.testing.assert_equal(reader.read("action")[1], [0.5, -0.5])
+
+    def test_read_partially_written(self) -> None:
+        recorder = self._recorder_helper(chunk_size=100, flush_interval=2)
+        recorder.reset()
+        recorder.step(np.zeros(2))
+        recorder.step(np.zeros(2))
+        recorder.writer._flush_queue.join()
+        reader = TrajectoryReader(self.directory)
+        self.assertEqual(len(reader), 2)
+        np.testing.assert_equal(reader.read("reward"), [0, 1])
+
+        recorder.flush()
+        reader.refresh()
+        self.assertEqual(len(reader), 3)
+
+    def test_transitions(self) -> None:
+        recorder = self._recorder_helper(chunk_size=5)
+        self._run_episodes(recorder, 2)
+        recorder.close()
+
+        transitions = TrajectoryReader(self.directory).transitions()
+        np.testing.assert_equal(
+            transitions["observation"]["count"][:, 0], [0, 1, 2, 0, 1, 2]
+        )
+        np.testing.assert_equal(
+            transitions["next_observation"]["count"][:, 0], [1, 2, 3, 1, 2, 3]
+        )
+        np.testing.assert_equal(transitions["reward"], [1, 2, 3, 1, 2, 3])
+        np.testing.assert_equal(transitions["done"], [0, 0, 1, 0, 0, 1])
+        self.assertEqual(transitions["action"].shape, (6, 2))
+
+    def test_read_unknown_column(self) -> None:
+        recorder = self._recorder_helper()
+        recorder.reset()
+        recorder.flush()
+        with self.assertRaises(KeyError):
+            TrajectoryReader(self.directory).read("unknown")
+
+    def test_close_stops_flush_thread(self) -> None:
+        recorder = self._recorder_helper()
+        recorder.reset()
+        recorder.close()
+        self.assertFalse(recorder.writer._flush_thread.is_alive())
+        self.assertEqual(len(TrajectoryReader(self.directory)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,11 +6,17 @@ Simulator.
 """
 import warnings
 from copy import deepcopy
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Any
 
 import numpy as np
 
-from acnportal.acnsim import Interface
+from acnportal.acnsim import Interface, PluginEvent, EventQueue
+
+from .timing import StepTimer, _timed
+
+# Ways of handling infeasible schedules submitted to
+# GymTrainingInterface.step. See GymTrainedInterface.make_feasible.
+INFEASIBILITY_MODES: Tuple[str, ...] = ("reject", "clip", "scale", "project")
 
 
 class GymTrainedInterface(Interface):
@@ -84,6 +90,69 @@ class GymTrainedInterface(Interface):
         """
         return deepcopy(self._simulator.charging_rates)
 
+    @property
+    def event_queue(self) -> EventQueue:
+        """ Return the event queue of the simulation. Each simulation
+        (including a copy of one) has its own event queue, so its
+        identity distinguishes scenarios (see
+        arrival_forecast_observation). Do not modify it.
+
+        Returns:
+            EventQueue: The Simulator's event queue.
+        """
+        return self._simulator.event_queue
+
+    def upcoming_plugins(self) -> List[Tuple[int, float]]:
+        """ Return the timestamp and requested energy, in amp periods,
+        of each EV plugin event remaining in the event queue, in no
+        particular order. Scans the whole event queue.
+
+        Returns:
+            List[Tuple[int, float]]: A (timestamp, requested energy)
+                pair for each remaining plugin event.
+        """
+        return [
+            (
+                timestamp,
+                self._convert_to_amp_periods(
+                    event.ev.requested_energy, event.ev.station_id
+                ),
+            )
+            for timestamp, event in self._simulator.event_queue.queue
+            if isinstance(event, PluginEvent)
+        ]
+
+    def network_signature(self) -> Tuple[Any, ...]:
+        """ Return a hashable signature of the charging network: its
+        station ids, constraint matrix, number of phases, the pilot
+        limits and allowable pilots of each station, and the
+        simulator's max_recompute.
+
+        The builtin observation and action spaces depend on the
+        interface only through these, so environments reuse their
+        spaces while the signature of their interface is unchanged (see
+        CustomSimEnv).
+
+        Returns:
+            Tuple[Any, ...]: The signature.
+        """
+        # noinspection PyProtectedMember
+        infrastructure_info = self._infrastructure_info()
+        constraint_matrix: np.ndarray = infrastructure_info.constraint_matrix
+        return (
+            tuple(infrastructure_info.station_ids),
+            constraint_matrix.shape,
+            constraint_matrix.tobytes(),
+            infrastructure_info.phases.shape,
+            np.asarray(infrastructure_info.max_pilot, dtype=float).tobytes(),
+            np.asarray(infrastructure_info.min_pilot, dtype=float).tobytes(),
+            tuple(
+                np.asarray(allowable_pilots, dtype=float).tobytes()
+                for allowable_pilots in infrastructure_info.allowable_pilots
+            ),
+            self._simulator.max_recompute,
+        )
+
     def is_feasible_evse(self, load_currents: Dict[str, List[float]]) -> bool:
         """
         Return if each EVSE in load_currents can accept the pilots
@@ -158,6 +227,102 @@ class GymTrainedInterface(Interface):
 
         return constraints_satisfied and evse_satisfied
 
+    def is_feasible_batch(
+        self,
+        schedules: np.ndarray,
+        linear: bool = False,
+        violation_tolerance: Optional[float] = None,
+        relative_tolerance: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """ Vectorized version of is_feasible for many candidate
+        schedules at once. Network constraints are checked with a single
+        batched matrix product against the constraint matrix, and EVSE
+        pilot limits with vectorized bound checks.
+
+        Args:
+            schedules (np.ndarray): Array of shape (candidates, stations,
+                periods), where stations are in the order of
+                station_ids (see schedule_to_matrix).
+            linear (bool): See Interface.is_feasible.
+            violation_tolerance (float): See Interface.is_feasible.
+            relative_tolerance (float): See Interface.is_feasible.
+
+        Returns:
+            np.ndarray: Boolean array of shape (candidates,); True for
+                each feasible candidate.
+            np.ndarray: Array of shape (candidates,) with the total
+                violation of each candidate in amps, i.e. the sum over
+                constraints and periods of the aggregate current above
+                each limit (ignoring tolerances), plus the sum of the
+                distances of each pilot to the set of pilots allowed by
+                its EVSE.
+
+        Raises:
+            ValueError: If schedules does not have shape (candidates,
+                stations, periods).
+        """
+        network = self._simulator.network
+        schedules = np.asarray(schedules, dtype=float)
+        if len(schedules.shape) != 3 or schedules.shape[1] != len(self.station_ids):
+            raise ValueError(
+                f"Expected schedules of shape (candidates, "
+                f"{len(self.station_ids)}, periods). Got shape = "
+                f"{schedules.shape}."
+            )
+        if violation_tolerance is None:
+            violation_tolerance = network.violation_tolerance
+        if relative_tolerance is None:
+            relative_tolerance = network.relative_tolerance
+
+        # Network constraints.
+        network_violations: np.ndarray = np.zeros(schedules.shape[0])
+        network_satisfied: np.ndarray = np.ones(schedules.shape[0], dtype=bool)
+        if len(network.magnitudes):
+            if linear:
+                aggregate_currents: np.ndarray = np.abs(
+                    network.constraint_matrix @ schedules
+                )
+            else:
+                phase_angles: Dict[str, float] = network.phase_angles
+                angle_coefficients: np.ndarray = np.exp(
+                    1j
+                    * np.deg2rad(
+                        [phase_angles[station_id] for station_id in self.station_ids]
+                    )
+                )
+                aggregate_currents: np.ndarray = np.abs(
+                    network.constraint_matrix
+                    @ (schedules * angle_coefficients[:, np.newaxis])
+                )
+            magnitudes: np.ndarray = network.magnitudes[:, np.newaxis]
+            excess_currents: np.ndarray = aggregate_currents - magnitudes
+            network_satisfied = np.all(
+                excess_currents
+                <= np.maximum(violation_tolerance, magnitudes * relative_tolerance),
+                axis=(1, 2),
+            )
+            network_violations = np.maximum(excess_currents, 0).sum(axis=(1, 2))
+
+        # EVSE pilot limits.
+        _, range_highs, range_lows = self._pilot_bounds()
+        evse_violations: np.ndarray = np.where(
+            schedules == 0,
+            0,
+            np.maximum(range_lows[:, np.newaxis] - schedules, 0)
+            + np.maximum(schedules - range_highs[:, np.newaxis], 0),
+        )
+        for i in np.flatnonzero(~network.is_continuous):
+            allowable: np.ndarray = np.union1d(network.allowable_rates[i], [0])
+            evse_violations[:, i, :] = np.abs(
+                schedules[:, i, :, np.newaxis] - allowable
+            ).min(axis=-1)
+        total_evse_violations: np.ndarray = evse_violations.sum(axis=(1, 2))
+
+        return (
+            network_satisfied & (total_evse_violations == 0),
+            network_violations + total_evse_violations,
+        )
+
     def last_energy_delivered(self) -> float:
         """ Return the actual energy delivered in the last period, in
         amp-periods.
@@ -170,6 +335,243 @@ class GymTrainedInterface(Interface):
         """
         return sum([ev.current_charging_rate for ev in self.active_evs])
 
+    def schedule_to_matrix(self, load_currents: Dict[str, List[float]]) -> np.ndarray:
+        """ Convert a schedule to a matrix with one row per station in
+        the network (in the order of station_ids) and one column per
+        period. Stations not in the schedule are given pilots of 0.
+
+        Args:
+            load_currents (Dict[str, List[number]]): Dictionary mapping
+                load_ids to schedules of charging rates.
+
+        Returns:
+            np.ndarray: The schedule as a (stations, periods) matrix.
+        """
+        schedule_length: int = (
+            len(next(iter(load_currents.values()))) if len(load_currents) > 0 else 0
+        )
+        schedule_matrix: np.ndarray = np.zeros(
+            (len(self.station_ids), schedule_length)
+        )
+        for i, station_id in enumerate(self.station_ids):
+            if station_id in load_currents:
+                schedule_matrix[i] = load_currents[station_id]
+        return schedule_matrix
+
+    def _pilot_bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Return vectors of the lowest and highest allowable pilot
+        signal of each station (in the order of station_ids), and of
+        the lower end of each station's allowable pilot range. The
+        lowest allowable pilot is never above 0, as a 0 pilot is always
+        allowed.
+        """
+        network = self._simulator.network
+        range_lows: np.ndarray = np.array(
+            [min(allowable_rates) for allowable_rates in network.allowable_rates],
+            dtype=float,
+        )
+        range_highs: np.ndarray = np.array(
+            [max(allowable_rates) for allowable_rates in network.allowable_rates],
+            dtype=float,
+        )
+        return np.minimum(range_lows, 0), range_highs, range_lows
+
+    def _snap_to_allowable_pilots(
+        self, schedule_matrix: np.ndarray, round_down: bool
+    ) -> np.ndarray:
+        """ Move each pilot in schedule_matrix onto the set of pilots its
+        EVSE allows. Pilots between 0 and a positive minimum rate, and
+        pilots of EVSEs with finite allowable rates, are moved to the
+        nearest allowable pilot, or to the nearest allowable pilot of
+        smaller magnitude if round_down is True. Rounding down never
+        increases any aggregate current under the linearized network
+        constraints.
+        """
+        network = self._simulator.network
+        _, _, min_pilots = self._pilot_bounds()
+        min_pilots = min_pilots[:, np.newaxis]
+        snapped: np.ndarray = schedule_matrix.copy()
+        in_deadband: np.ndarray = (
+            (snapped > 0) & (snapped < min_pilots) & network.is_continuous[:, None]
+        )
+        if round_down:
+            snapped[in_deadband] = 0
+        else:
+            round_up: np.ndarray = in_deadband & (snapped >= min_pilots / 2)
+            snapped = np.where(round_up, min_pilots, snapped)
+            snapped[in_deadband & ~round_up] = 0
+        for i in np.flatnonzero(~network.is_continuous):
+            allowable: np.ndarray = np.union1d(network.allowable_rates[i], [0])
+            if round_down:
+                indices: np.ndarray = (
+                    np.searchsorted(allowable, snapped[i], side="right") - 1
+                )
+                snapped[i] = allowable[np.clip(indices, 0, len(allowable) - 1)]
+                # Negative pilots round towards zero.
+                snapped[i] = np.where(schedule_matrix[i] < 0, 0, snapped[i])
+            else:
+                snapped[i] = allowable[
+                    np.abs(snapped[i][:, np.newaxis] - allowable).argmin(axis=1)
+                ]
+        return snapped
+
+    def _clip_matrix(self, schedule_matrix: np.ndarray) -> np.ndarray:
+        """ Clip each pilot in schedule_matrix to its EVSE's bounds, then
+        move it to the nearest pilot its EVSE allows. Every pilot of the
+        result is allowed by its EVSE; the network constraints may still
+        be violated.
+        """
+        lower, upper, _ = self._pilot_bounds()
+        return self._snap_to_allowable_pilots(
+            np.clip(schedule_matrix, lower[:, np.newaxis], upper[:, np.newaxis]),
+            round_down=False,
+        )
+
+    def _scale_to_constraints(
+        self, schedule_matrix: np.ndarray, linear: bool
+    ) -> np.ndarray:
+        """ Scale each station's pilots in schedule_matrix down by the
+        smallest ratio of magnitude to aggregate current over the
+        violated constraints it contributes to, computing aggregate
+        currents with the phasor or, if linear, the linearized network
+        constraints, then round pilots down to pilots their EVSE allows.
+        """
+        network = self._simulator.network
+        aggregate_currents: np.ndarray = np.abs(
+            network.constraint_current(schedule_matrix, linear=linear)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios: np.ndarray = np.where(
+                aggregate_currents > network.magnitudes[:, np.newaxis],
+                network.magnitudes[:, np.newaxis] / aggregate_currents,
+                1,
+            )
+        # Scale each station by the smallest ratio over the constraints
+        # it contributes to.
+        station_ratios: np.ndarray = np.where(
+            (network.constraint_matrix != 0)[:, :, np.newaxis],
+            ratios[:, np.newaxis, :],
+            1,
+        ).min(axis=0)
+        return self._snap_to_allowable_pilots(
+            schedule_matrix * station_ratios, round_down=True
+        )
+
+    def _scale_matrix(self, schedule_matrix: np.ndarray) -> np.ndarray:
+        """ Scale pilots in schedule_matrix, which should be within their
+        EVSEs' bounds (e.g. the output of _clip_matrix), down to satisfy
+        the network constraints, rounding them down to pilots their EVSE
+        allows. No pilot increases in magnitude.
+
+        Pilots are first scaled under the phasor constraints. As
+        rounding down after scaling can increase phasor aggregate
+        currents, if the result is infeasible, pilots are instead scaled
+        under the linearized constraints, which are conservative, so the
+        result always satisfies the network constraints.
+        """
+        network = self._simulator.network
+        if not len(network.magnitudes) or not schedule_matrix.size:
+            return self._snap_to_allowable_pilots(schedule_matrix, round_down=True)
+        scaled: np.ndarray = self._scale_to_constraints(schedule_matrix, linear=False)
+        if network.is_feasible(scaled):
+            return scaled
+        return self._scale_to_constraints(schedule_matrix, linear=True)
+
+    def _project_matrix(
+        self, schedule_matrix: np.ndarray, iterations: int = 50
+    ) -> np.ndarray:
+        """ Clip pilots in schedule_matrix to their EVSEs' bounds, then
+        approximately project them onto the set satisfying the
+        linearized network constraints, reducing only pilots that
+        contribute to violated constraints.
+
+        The projection stops after at most iterations iterations, so it
+        may not be feasible; it is finished with _scale_matrix, so the
+        result always satisfies the network constraints and every pilot
+        is allowed by its EVSE, but pilots may be reduced more than by
+        an exact projection.
+        """
+        network = self._simulator.network
+        lower, upper, _ = self._pilot_bounds()
+        lower, upper = lower[:, np.newaxis], upper[:, np.newaxis]
+        projected: np.ndarray = np.clip(schedule_matrix, lower, upper)
+        if len(network.magnitudes) and projected.size:
+            constraint_matrix: np.ndarray = np.abs(network.constraint_matrix)
+            magnitudes: np.ndarray = network.magnitudes[:, np.newaxis]
+            row_norms: np.ndarray = (constraint_matrix ** 2).sum(axis=1)[:, None]
+            row_norms[row_norms == 0] = 1
+            # Simultaneous projection onto the violated halfspaces of the
+            # linearized constraints, alternated with projection onto the
+            # EVSE bounds. All periods are projected at once.
+            for _ in range(iterations):
+                violations: np.ndarray = np.maximum(
+                    constraint_matrix @ np.abs(projected) - magnitudes, 0
+                )
+                num_violated: np.ndarray = (violations > 0).sum(axis=0)
+                if not num_violated.any():
+                    break
+                step: np.ndarray = constraint_matrix.T @ (violations / row_norms)
+                projected = np.clip(
+                    projected - np.sign(projected) * step / np.maximum(num_violated, 1),
+                    lower,
+                    upper,
+                )
+        # The projection is approximate, so finish by scaling, which
+        # guarantees feasibility.
+        return self._scale_matrix(projected)
+
+    def make_feasible(
+        self, load_currents: Dict[str, List[float]], mode: str = "scale"
+    ) -> Dict[str, List[float]]:
+        """ Return a modified copy of load_currents that satisfies more
+        of the network's constraints. All computations are vectorized
+        over stations and periods. Modes are:
+
+        - "clip": Clip each pilot to its EVSE's bounds, and move pilots
+          not allowed by the EVSE to the nearest allowed pilot. The
+          network constraints may still be violated.
+        - "scale": Clip, then scale each station's pilots down by the
+          largest factor that satisfies every network constraint the
+          station contributes to, then round pilots not allowed by
+          their EVSE down to an allowed pilot.
+        - "project": Clip to EVSE bounds, then approximately project the
+          schedule onto the set satisfying the linearized network
+          constraints (which reduces pilots that contribute to violated
+          constraints rather than all pilots), then "scale".
+        - "reject": Return load_currents unchanged.
+
+        Args:
+            load_currents (Dict[str, List[number]]): Dictionary mapping
+                load_ids to schedules of charging rates.
+            mode (str): One of INFEASIBILITY_MODES.
+
+        Returns:
+            Dict[str, List[number]]: The modified schedule, with the same
+                keys as load_currents.
+
+        Raises:
+            ValueError: If mode is not one of INFEASIBILITY_MODES.
+        """
+        if mode not in INFEASIBILITY_MODES:
+            raise ValueError(
+                f"Unknown infeasibility mode {mode}. Expected one of "
+                f"{INFEASIBILITY_MODES}."
+            )
+        if mode == "reject" or len(load_currents) == 0:
+            return load_currents
+        schedule_matrix: np.ndarray = self.schedule_to_matrix(load_currents)
+        if mode == "clip":
+            schedule_matrix = self._clip_matrix(schedule_matrix)
+        elif mode == "scale":
+            schedule_matrix = self._scale_matrix(self._clip_matrix(schedule_matrix))
+        else:
+            schedule_matrix = self._project_matrix(schedule_matrix)
+        return {
+            station_id: schedule_matrix[i].tolist()
+            for i, station_id in enumerate(self.station_ids)
+            if station_id in load_currents
+        }
+
     # TODO: Docs and typing for this function.
     def current_constraint_currents(self, input_schedule: object) -> object:
         """
@@ -194,18 +596,32 @@ class GymTrainingInterface(GymTrainedInterface):
     """
 
     def step(
-        self, new_schedule: Dict[str, List[float]], force_feasibility: bool = True
+        self,
+        new_schedule: Dict[str, List[float]],
+        force_feasibility: bool = True,
+        infeasibility_mode: str = "reject",
+        step_timer: Optional[StepTimer] = None,
     ) -> Tuple[bool, bool]:
         """ Step the simulation using the input new_schedule until the
         simulator requires a new charging schedule. If the provided
-        schedule is infeasible, steps the simulation only if
-        `force_feasibility` is `False`, otherwise doesn't step the
-        simulation.
+        schedule is infeasible and `force_feasibility` is `True`, the
+        schedule is handled according to `infeasibility_mode`: with
+        "reject", the simulation is not stepped; with any other mode,
+        the schedule is made feasible with make_feasible and the
+        simulation is stepped with the modified schedule. If
+        `force_feasibility` is `False`, the simulation is stepped with
+        the provided schedule.
 
         Args:
             new_schedule (Dict[str, List[float]]): Dictionary mapping
             station ids to a schedule of pilot signals.
             force_feasibility (bool): If True, do not allow an
+                infeasible schedule to be applied as is.
+            infeasibility_mode (str): One of INFEASIBILITY_MODES. See
+                GymTrainedInterface.make_feasible.
+            step_timer (StepTimer): If given, the feasibility check
+                (and enforcement) and the Simulator step are timed as
+                the phases "feasibility" and "simulator_step".
 
         Returns:
             bool: True if the simulation is completed
@@ -235,7 +651,40 @@ class GymTrainingInterface(GymTrainedInterface):
                 f"updated with zeros."
             )
 
-        schedule_is_feasible = self.is_feasible(new_schedule)
-        if force_feasibility and not schedule_is_feasible:
-            return self._simulator.event_queue.empty(), schedule_is_feasible
-        return self._simulator.step(new_schedule), schedule_is_feasible
+        with _timed(step_timer, "feasibility"):
+            schedule_is_feasible = self.is_feasible(new_schedule)
+            if force_feasibility and not schedule_is_feasible:
+                if infeasibility_mode == "reject":
+                    return self._simulator.event_queue.empty(), schedule_is_feasible
+                new_schedule = self.make_feasible(new_schedule, mode=infeasibility_mode)
+        with _timed(step_timer, "simulator_step"):
+            return self._simulator.step(new_schedule), schedule_is_feasible
+
+    def fast_forward(self) -> int:
+        """ Advance the simulation through idle periods, i.e. periods in
+        which no EV that is not finished charging is plugged in. While
+        the simulation is idle, the simulator is stepped with a schedule
+        of zeros until the next event that requires a new schedule (or
+        until the simulation is done), regardless of the simulator's
+        `max_recompute` parameter.
+
+        Returns:
+            int: The number of periods skipped.
+        """
+        start_time: int = self.current_time
+        max_recompute: Optional[int] = self._simulator.max_recompute
+        idle_schedule: Dict[str, List[float]] = {
+            station_id: [0] for station_id in self.station_ids
+        }
+        # With max_recompute set to None, the simulator steps until an
+        # event requires a new schedule.
+        self._simulator.max_recompute = None
+        try:
+            while not self.is_done and len(self.active_station_ids) == 0:
+                iteration: int = self.current_time
+                self._simulator.step(idle_schedule)
+                if self.current_time == iteration:
+                    break
+        finally:
+            self._simulator.max_recompute = max_recompute
+        return self.current_time - start_time
@@ -7,10 +7,21 @@ from typing import Any, Dict, List
 from unittest.mock import create_autospec, Mock, patch
 
 import numpy as np
-from acnportal.acnsim import EV, EventQueue, FiniteRatesEVSE, EVSE, DeadbandEVSE
+from acnportal.acnsim import (
+    EV,
+    EventQueue,
+    FiniteRatesEVSE,
+    EVSE,
+    DeadbandEVSE,
+    Current,
+    PluginEvent,
+    sites,
+)
+from acnportal.acnsim.network import ChargingNetwork
 from acnportal.acnsim.tests.test_interface import TestInterface
 
 from ..interfaces import GymTrainedInterface, GymTrainingInterface
+from ..timing import StepTimer
 
 
 class TestGymTrainedInterface(TestInterface):
@@ -52,6 +63,37 @@ class TestGymTrainedInterface(TestInterface):
         self.simulator.charging_rates = np.eye(2)
         np.testing.assert_equal(self.interface.charging_rates, np.eye(2))
 
+    def test_event_queue(self) -> None:
+        self.simulator.event_queue = EventQueue([])
+        self.assertIs(self.interface.event_queue, self.simulator.event_queue)
+
+    def test_upcoming_plugins(self) -> None:
+        ev: Any = create_autospec(EV)
+        ev.station_id = "PS-001"
+        ev.requested_energy = 10
+        unplug_event: Any = Mock(timestamp=2)
+        self.simulator.event_queue = EventQueue(
+            [Mock(spec=PluginEvent, timestamp=3, ev=ev), unplug_event]
+        )
+        with patch.object(
+            self.interface, "_convert_to_amp_periods", return_value=50
+        ) as convert:
+            self.assertEqual(self.interface.upcoming_plugins(), [(3, 50)])
+        convert.assert_called_once_with(10, "PS-001")
+
+    def test_network_signature(self) -> None:
+        self.simulator.max_recompute = 1
+        signature = self.interface.network_signature()
+        self.assertEqual(hash(signature), hash(self.interface.network_signature()))
+        self.simulator.max_recompute = 2
+        self.assertNotEqual(signature, self.interface.network_signature())
+
+    def test_network_signature_constraint_change(self) -> None:
+        self.simulator.max_recompute = 1
+        signature = self.interface.network_signature()
+        self.network.add_constraint(Current(["PS-001", "PS-002"]), 10, name="C5")
+        self.assertNotEqual(signature, self.interface.network_signature())
+
     def test_is_feasible_evse_key_error(self) -> None:
         with self.assertRaises(KeyError):
             self.interface.is_feasible_evse({"PS-001": [1], "PS-000": [0]})
@@ -128,6 +170,132 @@ class TestGymTrainedInterface(TestInterface):
         self.simulator.get_active_evs.return_value = [ev1, ev2]
         self.assertEqual(self.interface.last_energy_delivered(), 48)
 
+    def test_schedule_to_matrix(self) -> None:
+        np.testing.assert_equal(
+            self.interface.schedule_to_matrix({"PS-002": [1, 2], "PS-004": [3, 4]}),
+            np.array([[0, 0], [0, 0], [1, 2], [3, 4]]),
+        )
+
+    def _feasibility_network_helper(self) -> Dict[str, List[float]]:
+        self.network = ChargingNetwork()
+        self.network.register_evse(EVSE("A"), 208, 0)
+        self.network.register_evse(EVSE("B"), 208, 0)
+        self.network.register_evse(DeadbandEVSE("C"), 208, 0)
+        self.network.register_evse(FiniteRatesEVSE("D", [8, 16, 24, 32]), 208, 0)
+        self.network.add_constraint(Current(["A", "B"]), 40, "AB")
+        self.network.add_constraint(Current(["C", "D"]), 20, "CD")
+        self.simulator.network = self.network
+        return {"A": [32, 10], "B": [16, 10], "C": [3, 40], "D": [13, 30]}
+
+    def _assert_network_feasible(self, schedule: Dict[str, List[float]]) -> None:
+        self.assertTrue(
+            self.network.is_feasible(self.interface.schedule_to_matrix(schedule))
+        )
+
+    def test_make_feasible_clip(self) -> None:
+        schedule = self._feasibility_network_helper()
+        clipped = self.interface.make_feasible(schedule, mode="clip")
+        self.assertEqual(
+            clipped,
+            {"A": [32, 10], "B": [16, 10], "C": [6, 40], "D": [16, 32]},
+        )
+        self.assertTrue(self.interface.is_feasible_evse(clipped))
+
+    def test_make_feasible_scale(self) -> None:
+        schedule = self._feasibility_network_helper()
+        scaled = self.interface.make_feasible(schedule, mode="scale")
+        self._assert_network_feasible(scaled)
+        self.assertTrue(self.interface.is_feasible_evse(scaled))
+        # Stations are scaled by the ratio of the violated constraint
+        # they contribute to; unviolated constraints are not scaled.
+        np.testing.assert_allclose(scaled["A"], [32 * 40 / 48, 10])
+        np.testing.assert_allclose(scaled["B"], [16 * 40 / 48, 10])
+
+    def test_make_feasible_project(self) -> None:
+        schedule = self._feasibility_network_helper()
+        projected = self.interface.make_feasible(schedule, mode="project")
+        self._assert_network_feasible(projected)
+        self.assertTrue(self.interface.is_feasible_evse(projected))
+        # The projection removes the same current from each station
+        # contributing to a violated constraint.
+        np.testing.assert_allclose(projected["A"], [28, 10])
+        np.testing.assert_allclose(projected["B"], [12, 10])
+
+    def test_is_feasible_batch(self) -> None:
+        schedule = self._feasibility_network_helper()
+        candidates = [
+            schedule,
+            self.interface.make_feasible(schedule, mode="clip"),
+            self.interface.make_feasible(schedule, mode="scale"),
+            {"A": [0, 0], "B": [0, 0], "C": [0, 0], "D": [0, 0]},
+        ]
+        schedules: np.ndarray = np.array(
+            [self.interface.schedule_to_matrix(candidate) for candidate in candidates]
+        )
+        feasible, violations = self.interface.is_feasible_batch(schedules)
+        np.testing.assert_equal(
+            feasible,
+            [self.interface.is_feasible(candidate) for candidate in candidates],
+        )
+        np.testing.assert_equal(feasible, [False, False, True, True])
+        # Candidate 0: AB is 8 A over in period 0 and CD is 50 A over in
+        # period 1; C's 3 A pilot is 3 A from the deadband; D's pilots
+        # are 3 A and 2 A from allowed pilots. Candidate 1 only violates
+        # the network constraints.
+        np.testing.assert_allclose(violations, [8 + 50 + 3 + 3 + 2, 8 + 2 + 52, 0, 0])
+
+    def test_is_feasible_batch_linear(self) -> None:
+        self._feasibility_network_helper()
+        schedules: np.ndarray = np.zeros((3, 4, 1))
+        schedules[1, :2, 0] = [30, 10]
+        schedules[2, :2, 0] = [30, 11]
+        feasible, violations = self.interface.is_feasible_batch(
+            schedules, linear=True
+        )
+        np.testing.assert_equal(feasible, [True, True, False])
+        np.testing.assert_allclose(violations, [0, 0, 1])
+
+    def test_is_feasible_batch_three_phase(self) -> None:
+        # Delta-connected three-phase constraints have negative
+        # coefficients, so the linear check must not take their absolute
+        # values.
+        network: ChargingNetwork = sites.caltech_acn()
+        self.simulator.network = network
+        max_pilots: np.ndarray = np.array(
+            [
+                self.interface.max_pilot_signal(station_id)
+                for station_id in self.interface.station_ids
+            ]
+        )
+        rng = np.random.default_rng(0)
+        fractions: np.ndarray = np.linspace(0.05, 1, 20)[:, np.newaxis]
+        schedules: np.ndarray = (
+            (rng.random((20, len(max_pilots))) < fractions) * max_pilots
+        )[:, :, np.newaxis]
+        for linear in (True, False):
+            feasible, _ = self.interface.is_feasible_batch(schedules, linear=linear)
+            expected = [
+                network.is_feasible(schedule, linear=linear) for schedule in schedules
+            ]
+            np.testing.assert_equal(feasible, expected)
+            self.assertTrue(any(expected))
+            self.assertFalse(all(expected))
+
+    def test_is_feasible_batch_shape_error(self) -> None:
+        with self.assertRaises(ValueError):
+            self.interface.is_feasible_batch(np.zeros((4, 2)))
+
+    def test_make_feasible_reject(self) -> None:
+        schedule = self._feasibility_network_helper()
+        self.assertEqual(
+            self.interface.make_feasible(schedule, mode="reject"), schedule
+        )
+
+    def test_make_feasible_unknown_mode(self) -> None:
+        schedule = self._feasibility_network_helper()
+        with self.assertRaises(ValueError):
+            self.interface.make_feasible(schedule, mode="ignore")
+
     @patch("acnportal.acnsim.ChargingNetwork.constraint_current", return_value=4 - 3j)
     def test_current_constraint_currents(self, mocked_constraint_current) -> None:
         self.assertEqual(self.interface.current_constraint_currents({}), 5)
@@ -187,6 +355,20 @@ class TestGymTrainingInterface(TestGymTrainedInterface):
         mocked_is_feasible.assert_called_once_with(schedule)
         self.simulator.step.assert_called_once_with(schedule)
 
+    @patch(
+        "gym_acnportal.gym_acnsim.GymTrainingInterface.is_feasible", return_value=False
+    )
+    def test_step_infeasible_schedule_made_feasible(self, mocked_is_feasible) -> None:
+        schedule: Dict[str, List[float]] = self._step_helper()
+        feasible_schedule: Dict[str, List[float]] = {"PS-001": [0, 0]}
+        self.interface.make_feasible = Mock(return_value=feasible_schedule)
+        self.assertEqual(
+            self.interface.step(schedule, infeasibility_mode="clip"), (True, False)
+        )
+        mocked_is_feasible.assert_called_once_with(schedule)
+        self.interface.make_feasible.assert_called_once_with(schedule, mode="clip")
+        self.simulator.step.assert_called_once_with(feasible_schedule)
+
     @patch(
         "gym_acnportal.gym_acnsim.GymTrainingInterface.is_feasible", return_value=False
     )
@@ -201,6 +383,75 @@ class TestGymTrainingInterface(TestGymTrainedInterface):
         mocked_is_feasible.assert_called_once_with(schedule)
         self.simulator.step.assert_called_once_with(schedule)
 
+    @patch(
+        "gym_acnportal.gym_acnsim.GymTrainingInterface.is_feasible", return_value=True
+    )
+    def test_step_timed(self, mocked_is_feasible) -> None:
+        schedule: Dict[str, List[float]] = self._step_helper()
+        step_timer: StepTimer = StepTimer()
+        self.interface.step(schedule, step_timer=step_timer)
+        stats = step_timer.stats
+        self.assertEqual(set(stats), {"feasibility", "simulator_step"})
+        self.assertEqual(stats["feasibility"]["calls"], 1)
+        self.assertEqual(stats["simulator_step"]["calls"], 1)
+
+    @patch(
+        "gym_acnportal.gym_acnsim.GymTrainingInterface.is_feasible", return_value=False
+    )
+    def test_step_timed_rejected(self, mocked_is_feasible) -> None:
+        schedule: Dict[str, List[float]] = self._step_helper()
+        step_timer: StepTimer = StepTimer()
+        self.interface.step(schedule, step_timer=step_timer)
+        self.assertEqual(set(step_timer.stats), {"feasibility"})
+
+    def _fast_forward_helper(self) -> None:
+        self.simulator.iteration = 0
+        event_queue: EventQueue = EventQueue()
+        event_queue.empty = create_autospec(event_queue.empty)
+        event_queue.empty.return_value = False
+        self.simulator.event_queue = event_queue
+
+    def _plugin_helper(self) -> None:
+        ev: Any = create_autospec(EV)
+        ev.station_id = "PS-001"
+        ev.fully_charged = False
+        self.network.plugin(ev)
+
+    def test_fast_forward_idle(self) -> None:
+        self._fast_forward_helper()
+
+        # noinspection PyUnusedLocal
+        def step_side_effect(schedule: Dict[str, List[float]]) -> bool:
+            self.assertIsNone(self.simulator.max_recompute)
+            self.simulator.iteration = 7
+            self._plugin_helper()
+            return False
+
+        self.simulator.step.side_effect = step_side_effect
+        self.assertEqual(self.interface.fast_forward(), 7)
+        self.simulator.step.assert_called_once_with(
+            {station_id: [0] for station_id in self.interface.station_ids}
+        )
+        self.assertEqual(self.simulator.max_recompute, 2)
+
+    def test_fast_forward_active_evs(self) -> None:
+        self._fast_forward_helper()
+        self._plugin_helper()
+        self.assertEqual(self.interface.fast_forward(), 0)
+        self.simulator.step.assert_not_called()
+
+    def test_fast_forward_done(self) -> None:
+        self._fast_forward_helper()
+        self.simulator.event_queue.empty.return_value = True
+        self.assertEqual(self.interface.fast_forward(), 0)
+        self.simulator.step.assert_not_called()
+
+    def test_fast_forward_no_progress(self) -> None:
+        self._fast_forward_helper()
+        self.assertEqual(self.interface.fast_forward(), 0)
+        self.simulator.step.assert_called_once()
+        self.assertEqual(self.simulator.max_recompute, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
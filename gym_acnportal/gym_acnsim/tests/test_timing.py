@@ -0,0 +1,80 @@
+# coding=utf-8
+""" Tests for timing the phases of environment steps. """
+import unittest
+from unittest.mock import Mock, patch
+
+from ..timing import StepTimer, _timed, _NULL_CONTEXT
+
+
+class TestStepTimer(unittest.TestCase):
+    def test_time_phase(self) -> None:
+        step_timer = StepTimer()
+        for _ in range(3):
+            with step_timer.time("phase"):
+                pass
+        step_timer.end_step()
+        stats = step_timer.stats["phase"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertGreaterEqual(stats["total_ns"], 0)
+        self.assertEqual(stats["mean_ns"], stats["total_ns"] / 3)
+        self.assertEqual(stats["per_step_ns"], stats["total_ns"])
+
+    def test_phase_timer_reused(self) -> None:
+        step_timer = StepTimer()
+        self.assertIs(step_timer.time("phase"), step_timer.time("phase"))
+
+    def test_disabled(self) -> None:
+        step_timer = StepTimer(enabled=False)
+        self.assertIs(step_timer.time("phase"), _NULL_CONTEXT)
+        step_timer.end_step()
+        self.assertEqual(step_timer.steps, 0)
+        self.assertEqual(step_timer.stats, {})
+
+    def test_timed_without_timer(self) -> None:
+        self.assertIs(_timed(None, "phase"), _NULL_CONTEXT)
+        self.assertIs(_timed(StepTimer(enabled=False), "phase"), _NULL_CONTEXT)
+
+    def test_report_interval(self) -> None:
+        report_callback = Mock()
+        step_timer = StepTimer(report_interval=2, report_callback=report_callback)
+        with step_timer.time("phase"):
+            pass
+        step_timer.end_step()
+        report_callback.assert_not_called()
+        step_timer.end_step()
+        report_callback.assert_called_once()
+        self.assertEqual(report_callback.call_args[0][0]["phase"]["calls"], 1)
+        self.assertEqual(step_timer.reports, [report_callback.call_args[0][0]])
+
+    def test_report_interval_without_callback(self) -> None:
+        step_timer = StepTimer(report_interval=1)
+        with step_timer.time("phase"):
+            pass
+        with patch("builtins.print") as print_mock:
+            step_timer.end_step()
+            step_timer.end_step()
+        print_mock.assert_not_called()
+        self.assertEqual(len(step_timer.reports), 2)
+        self.assertEqual(step_timer.reports[1]["phase"]["calls"], 1)
+
+    def test_reset(self) -> None:
+        step_timer = StepTimer()
+        with step_timer.time("phase"):
+            pass
+        step_timer.end_step()
+        step_timer.reset()
+        self.assertEqual(step_timer.steps, 0)
+        self.assertEqual(step_timer.stats, {})
+
+    def test_format_stats(self) -> None:
+        step_timer = StepTimer()
+        with step_timer.time("phase"):
+            pass
+        step_timer.end_step()
+        lines = step_timer.format_stats().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("phase"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+# coding=utf-8
+"""
+Low-overhead timing of the phases of an environment step, e.g.
+converting the action to a schedule, checking feasibility, stepping
+the Simulator, and computing each observation and reward.
+"""
+from time import perf_counter_ns
+from typing import Optional, Dict, List, Callable
+
+
+class _NullContext:
+    """ Context manager that does nothing; returned by timing helpers
+    when timing is disabled so that no objects are allocated.
+    """
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_) -> None:
+        return None
+
+
+_NULL_CONTEXT: _NullContext = _NullContext()
+
+
+class _PhaseTimer:
+    """ Context manager adding the time spent in its block to a phase
+    of a StepTimer. One instance is reused for each phase.
+    """
+
+    __slots__ = ("_accumulator", "_start")
+
+    def __init__(self, accumulator: List[int]) -> None:
+        self._accumulator = accumulator
+        self._start = 0
+
+    def __enter__(self) -> None:
+        self._start = perf_counter_ns()
+
+    def __exit__(self, *_) -> None:
+        self._accumulator[0] += perf_counter_ns() - self._start
+        self._accumulator[1] += 1
+
+
+class StepTimer:
+    """ Accumulates the time spent in each phase of environment steps,
+    in nanoseconds, using perf_counter_ns.
+
+    Environments and interfaces time their phases with the _timed
+    helper, which costs a single comparison when the environment has
+    no StepTimer or the StepTimer is disabled.
+
+    Phases timed by the builtin environments and interfaces:
+        step: The whole of BaseSimEnv.step.
+        action_to_schedule: Converting the action to a schedule.
+        feasibility: Checking (and, if the infeasibility mode is not
+            "reject", enforcing) the feasibility of the schedule.
+        simulator_step: Simulator.step.
+        observation.<name>: Computing each observation of a
+            CustomSimEnv.
+        reward.<name>: Each reward function of a CustomSimEnv.
+        done: Computing done.
+        info: Constructing info.
+
+    Args:
+        enabled (bool): If False, no phases are timed.
+        report_interval (int): If given, stats are added to reports (and
+            passed to report_callback) every report_interval steps.
+        report_callback (Callable[[Dict[str, Dict[str, float]]], None]):
+            Optional function called with stats every report_interval
+            steps.
+    """
+
+    enabled: bool
+    report_interval: Optional[int]
+    report_callback: Optional[Callable[[Dict[str, Dict[str, float]]], None]]
+    reports: List[Dict[str, Dict[str, float]]]
+    steps: int
+    _accumulators: Dict[str, List[int]]
+    _phase_timers: Dict[str, _PhaseTimer]
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        report_interval: Optional[int] = None,
+        report_callback: Optional[
+            Callable[[Dict[str, Dict[str, float]]], None]
+        ] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.report_interval = report_interval
+        self.report_callback = report_callback
+        self.reports = []
+        self.reset()
+
+    def reset(self) -> None:
+        """ Clear all accumulated times.
+
+        Returns:
+            None
+        """
+        self.steps = 0
+        self._accumulators = {}
+        self._phase_timers = {}
+
+    def time(self, phase: str) -> object:
+        """ Return a context manager that adds the time spent in its
+        block to phase.
+
+        Args:
+            phase (str): Name of the phase.
+
+        Returns:
+            object: A context manager.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        phase_timer: Optional[_PhaseTimer] = self._phase_timers.get(phase)
+        if phase_timer is None:
+            accumulator: List[int] = [0, 0]
+            self._accumulators[phase] = accumulator
+            phase_timer = _PhaseTimer(accumulator)
+            self._phase_timers[phase] = phase_timer
+        return phase_timer
+
+    def end_step(self) -> None:
+        """ Count a step, adding stats to reports (and passing them to
+        report_callback) if report_interval steps have passed since the
+        last report.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        self.steps += 1
+        if self.report_interval and not self.steps % self.report_interval:
+            report: Dict[str, Dict[str, float]] = self.stats
+            self.reports.append(report)
+            if self.report_callback is not None:
+                self.report_callback(report)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """ Return the accumulated time of each phase.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Dict mapping each phase to a
+                dict with keys total_ns (total time spent in the phase),
+                calls (number of times the phase was timed), mean_ns
+                (mean time per call), and per_step_ns (mean time per
+                step).
+        """
+        return {
+            phase: {
+                "total_ns": total_ns,
+                "calls": calls,
+                "mean_ns": total_ns / calls if calls else 0.0,
+                "per_step_ns": total_ns / self.steps if self.steps else 0.0,
+            }
+            for phase, (total_ns, calls) in self._accumulators.items()
+        }
+
+    def format_stats(self) -> str:
+        """ Return stats as a table, with phases ordered by total time.
+
+        Returns:
+            str: The formatted table.
+        """
+        lines: List[str] = [
+            f"{'phase':<40}{'calls':>10}{'mean (us)':>12}{'per step (us)':>15}"
+        ]
+        for phase, phase_stats in sorted(
+            self.stats.items(), key=lambda item: -item[1]["total_ns"]
+        ):
+            lines.append(
+                f"{phase:<40}{phase_stats['calls']:>10}"
+                f"{phase_stats['mean_ns'] / 1000:>12.1f}"
+                f"{phase_stats['per_step_ns'] / 1000:>15.1f}"
+            )
+        return "\n".join(lines)
+
+
+def _timed(step_timer: Optional[StepTimer], phase: str) -> object:
+    """ Return a context manager timing phase with step_timer, or a
+    shared context manager that does nothing if step_timer is None or
+    disabled.
+    """
+    if step_timer is None or not step_timer.enabled:
+        return _NULL_CONTEXT
+    return step_timer.time(phase)
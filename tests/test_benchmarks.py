@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+Tests for comparing benchmark results against a baseline.
+"""
+import importlib.util
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, List
+
+_BENCHMARK_ENVS_PATH: str = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "benchmark_envs.py",
+)
+_spec = importlib.util.spec_from_file_location("benchmark_envs", _BENCHMARK_ENVS_PATH)
+benchmark_envs = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmark_envs)
+
+
+def _case(
+    name: str,
+    steps_per_second: float = 1000.0,
+    step_p99_us: float = 500.0,
+    memory_bytes: int = 2 ** 20,
+) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "steps_per_second": steps_per_second,
+        "step_p50_us": 200.0,
+        "step_p99_us": step_p99_us,
+        "memory_bytes": memory_bytes,
+    }
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self) -> None:
+        self.baseline: List[Dict[str, Any]] = [_case("default/caltech/96")]
+
+    def test_within_threshold(self) -> None:
+        results = [
+            _case(
+                "default/caltech/96",
+                steps_per_second=950.0,
+                step_p99_us=540.0,
+                memory_bytes=int(1.05 * 2 ** 20),
+            )
+        ]
+        self.assertEqual(benchmark_envs.compare(results, self.baseline, 0.1), [])
+
+    def test_improvements_not_regressions(self) -> None:
+        results = [
+            _case(
+                "default/caltech/96",
+                steps_per_second=2000.0,
+                step_p99_us=100.0,
+                memory_bytes=2 ** 19,
+            )
+        ]
+        self.assertEqual(benchmark_envs.compare(results, self.baseline, 0.1), [])
+
+    def test_steps_per_second_regression(self) -> None:
+        results = [_case("default/caltech/96", steps_per_second=800.0)]
+        regressions = benchmark_envs.compare(results, self.baseline, 0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(
+            regressions[0].startswith("default/caltech/96: steps_per_second")
+        )
+        self.assertIn("-20.0%", regressions[0])
+
+    def test_latency_and_memory_regressions(self) -> None:
+        results = [
+            _case(
+                "default/caltech/96",
+                step_p99_us=600.0,
+                memory_bytes=int(1.5 * 2 ** 20),
+            )
+        ]
+        regressions = benchmark_envs.compare(results, self.baseline, 0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("step_p99_us", regressions[0])
+        self.assertIn("memory_bytes", regressions[1])
+
+    def test_threshold(self) -> None:
+        results = [_case("default/caltech/96", steps_per_second=800.0)]
+        self.assertEqual(benchmark_envs.compare(results, self.baseline, 0.25), [])
+
+    def test_cases_missing_from_baseline_ignored(self) -> None:
+        results = [_case("rebuilding/caltech/96", steps_per_second=1.0)]
+        self.assertEqual(benchmark_envs.compare(results, self.baseline, 0.1), [])
+
+
+class TestResultsFile(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        results = [
+            _case("default/caltech/96"),
+            _case("rebuilding/caltech/96", steps_per_second=500.0),
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "results.json")
+            benchmark_envs.write_results(path, results)
+            loaded = benchmark_envs.load_results(path)
+        self.assertEqual(loaded, results)
+        self.assertEqual(benchmark_envs.compare(results, loaded, 0.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
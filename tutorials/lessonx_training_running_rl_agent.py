@@ -23,7 +23,6 @@ run this tutorial.
 """
 
 import os
-import random
 from copy import deepcopy
 from datetime import datetime
 from typing import List, Callable, Optional, Dict, Any
@@ -72,7 +71,14 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
 # scenario. We'll start by defining a function which generates random
 # plugins for a single EVSE.
 def random_plugin(
-    num, time_limit, evse, laxity_ratio=1 / 2, max_rate=32, voltage=208, period=1
+    num,
+    time_limit,
+    evse,
+    rng,
+    laxity_ratio=1 / 2,
+    max_rate=32,
+    voltage=208,
+    period=1,
 ) -> List[events.Event]:
     """ Returns a list of num random plugin events occurring anytime
     from time 0 to time_limit. Each plugin has a random arrival and
@@ -89,6 +95,8 @@ def random_plugin(
         num (int): Number of random plugin
         time_limit (int):
         evse (str):
+        rng (np.random.Generator): Source of randomness for arrival
+            and departure times.
         laxity_ratio (float):
         max_rate (float):
         voltage (float):
@@ -98,7 +106,7 @@ def random_plugin(
     times = []
     i = 0
     while i < 2 * num:
-        random_timestep = random.randint(0, time_limit)
+        random_timestep = int(rng.integers(0, time_limit + 1))
         if random_timestep not in times:
             times.append(random_timestep)
             i += 1
@@ -129,9 +137,13 @@ def random_plugin(
 # Since the above event generation is stochastic, we'll want to
 # completely rebuild the simulation each time the environment is
 # reset, so that the next simulation has a new event queue. As such,
-# we will define a simulation generating function.
+# we will define a simulation generating function. All randomness is
+# drawn from the numpy Generator passed in, so that the environment can
+# seed each episode reproducibly (see RebuildingEnv.seed).
 def _random_sim_builder(
-    algorithm: Optional[BaseAlgorithm], interface_type: type
+    algorithm: Optional[BaseAlgorithm],
+    interface_type: type,
+    rng: np.random.Generator,
 ) -> Simulator:
     timezone = pytz.timezone("America/Los_Angeles")
     start = timezone.localize(datetime(2018, 9, 5))
@@ -143,7 +155,7 @@ def _random_sim_builder(
     )
     event_list = []
     for station_id in cn.station_ids:
-        event_list.extend(random_plugin(10, 100, station_id))
+        event_list.extend(random_plugin(10, 100, station_id, rng))
     event_queue = events.EventQueue(event_list)
 
     # Simulation to be wrapped
@@ -158,14 +170,14 @@ def _random_sim_builder(
     )
 
 
-def interface_generating_function() -> Interface:
+def interface_generating_function(rng: np.random.Generator) -> Interface:
     """
     Initializes a simulation with random events on a 1 phase, 1
     constraint ACN (simple_acn), with 1 EVSE
     """
     schedule_rl = None
     # Simulation to be wrapped
-    sim = _random_sim_builder(schedule_rl, GymTrainingInterface)
+    sim = _random_sim_builder(schedule_rl, GymTrainingInterface, rng)
     return sim.generate_interface(GymTrainingInterface)
 
 
@@ -208,13 +220,15 @@ def interface_generating_function() -> Interface:
 # `gym_acnsim` package provides `'default-rebuilding-acnsim-v0'`,
 # a registered gym environment that provides this functionality. To
 # make this environment, we need to input as a `kwarg` the
-# `sim_gen_func` we defined earlier.
+# `sim_gen_func` we defined earlier. Passing a seed makes the sequence
+# of generated simulations reproducible.
 vec_env = DummyVecEnv(
     [
         lambda: FlattenObservation(
             gym.make(
                 "default-rebuilding-acnsim-v0",
                 interface_generating_function=interface_generating_function,
+                seed=0,
             )
         )
     ]
@@ -394,7 +408,9 @@ class GymTrainedAlgorithmVectorized(BaseAlgorithm):
 
 
 evaluation_algorithm = GymTrainedAlgorithmVectorized()
-evaluation_simulation = _random_sim_builder(evaluation_algorithm, GymTrainedInterface)
+evaluation_simulation = _random_sim_builder(
+    evaluation_algorithm, GymTrainedInterface, np.random.default_rng(1)
+)
 edf_simulation = deepcopy(evaluation_simulation)
 rr_simulation = deepcopy(evaluation_simulation)
 edf_simulation.update_scheduler(SortedSchedulingAlgo(earliest_deadline_first))